@@ -0,0 +1,202 @@
+"""批量处理：多个12345 / 安薪在线文件（或zip压缩包）按文件名中的日期配对，各期生成的结果打包为zip
+
+文件名中包含“安薪”或“anxin”的是安薪在线文件，包含“12345”的是12345文件；
+日期取文件名（zip中为完整路径）中的YYYYMMDD（也可以写作YYYY-MM-DD、YYYY_MM_DD）。
+每个日期需要一个12345文件；某个日期没有安薪在线文件时，使用唯一一个不带日期的安薪在线文件
+"""
+import io
+import os
+import re
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+
+excel_suffixes = (".xlsx", ".xls")
+date_pattern = re.compile(r"(?<!\d)(20\d{2})[-_.]?(\d{2})[-_.]?(\d{2})(?!\d)")
+
+# 跨期统计表的列：表头 -> 数据看板中的键
+period_statistic_columns = {
+    "线索总数": "xiansuo_count",
+    "12345线索": "xiansuo_12345_count",
+    "部平台线索": "xiansuo_bupingtai_count",
+    "再次投诉": "zaicitousu_count",
+    "建筑领域线索": "jianshe_project_count",
+    "建筑领域涉及人数": "jianshe_renshu",
+    "建筑领域涉及金额": "jianshe_jine",
+    "非建领域线索": "feijian_project_count",
+    "非建领域涉及人数": "feijian_renshu",
+    "非建领域涉及金额": "feijian_jine",
+    "安薪在线预警": "axzx_yvjing_count",
+}
+
+
+class BatchInputError(ValueError):
+    """上传的文件无法配对，异常信息直接返回给前端"""
+
+
+def file_date(name):
+    """文件名中的日期（YYYYMMDD），没有合法日期时返回None"""
+    for match in date_pattern.finditer(name):
+        date = "".join(match.groups())
+        try:
+            datetime.strptime(date, "%Y%m%d")
+        except ValueError:
+            continue
+        return date
+    return None
+
+
+def file_kind(name):
+    """文件属于哪个数据源：12345、安薪，无法识别时返回None"""
+    base = os.path.basename(name)
+    if "安薪" in base or "anxin" in base.lower():
+        return "安薪"
+    if "12345" in base:
+        return "12345"
+    return None
+
+
+def zip_member_name(info):
+    """zip中的文件名；没有设置UTF-8标志时依次尝试UTF-8（Info-ZIP等）和GBK（Windows压缩软件）解码"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        raw = info.filename.encode("cp437")
+    except UnicodeEncodeError:
+        return info.filename
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def zip_excel_files(content):
+    """读取zip中的Excel文件，返回[(路径, 内容)]，跳过目录、隐藏文件和__MACOSX"""
+    files = []
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile as e:
+        raise BatchInputError(f"无法读取zip文件: {e}")
+    with archive:
+        for info in archive.infolist():
+            name = zip_member_name(info)
+            parts = name.replace("\\", "/").split("/")
+            if info.is_dir() or "__MACOSX" in parts or parts[-1].startswith((".", "~$")):
+                continue
+            if name.lower().endswith(excel_suffixes):
+                files.append((name, archive.read(info)))
+    return files
+
+
+def expand_batch_files(files):
+    """展开上传文件中的zip压缩包，返回所有Excel文件[(名称, 内容)]"""
+    expanded = []
+    for name, content in files:
+        if name.lower().endswith(".zip"):
+            expanded.extend(zip_excel_files(content))
+        elif name.lower().endswith(excel_suffixes):
+            expanded.append((name, content))
+        else:
+            raise BatchInputError(f"不支持的文件类型: {name}，请上传Excel文件或zip压缩包")
+    return expanded
+
+
+def pair_batch_files(files):
+    """按日期配对12345和安薪在线文件，返回按日期排序的[{date, name_12345, content_12345, name_anxin, content_anxin}]"""
+    by_date = {"12345": {}, "安薪": {}}
+    undated_anxin = []
+    errors = []
+    for name, content in files:
+        kind = file_kind(name)
+        date = file_date(name)
+        if kind is None:
+            errors.append(f"无法识别数据源（文件名需包含12345或安薪）: {name}")
+        elif date is None and kind == "安薪":
+            undated_anxin.append((name, content))
+        elif date is None:
+            errors.append(f"无法从文件名识别日期: {name}")
+        elif date in by_date[kind]:
+            errors.append(f"{date}有多个{kind}文件: {by_date[kind][date][0]}, {name}")
+        else:
+            by_date[kind][date] = (name, content)
+
+    pairs = []
+    for date, (name_12345, content_12345) in sorted(by_date["12345"].items()):
+        if date in by_date["安薪"]:
+            name_anxin, content_anxin = by_date["安薪"][date]
+        elif len(undated_anxin) == 1:
+            name_anxin, content_anxin = undated_anxin[0]
+        else:
+            errors.append(f"{date}没有对应的安薪在线文件" if not undated_anxin
+                          else f"{date}没有对应的安薪在线文件，且有多个不带日期的安薪在线文件")
+            continue
+        pairs.append({"date": date, "name_12345": name_12345, "content_12345": content_12345,
+                      "name_anxin": name_anxin, "content_anxin": content_anxin})
+    for date in sorted(set(by_date["安薪"]) - set(by_date["12345"])):
+        errors.append(f"{date}只有安薪在线文件，没有12345文件: {by_date['安薪'][date][0]}")
+    if errors:
+        raise BatchInputError("；".join(errors))
+    if not pairs:
+        raise BatchInputError("没有可处理的文件")
+    return pairs
+
+
+def batch_statistics_frames(results):
+    """生成跨期统计：各期主要指标一行一期，各区域线索数一列一期
+
+    results为[{date, dashboard, error}]，处理失败的期在各期汇总中只填写错误信息
+    """
+    period_rows = []
+    district_columns = {}
+    for result in results:
+        row = {"日期": result["date"]}
+        dashboard = result.get("dashboard")
+        if dashboard is not None:
+            row.update({label: dashboard.get(key) for label, key in period_statistic_columns.items()})
+            district_columns[result["date"]] = dashboard.get("district_counts") or {}
+        row["处理结果"] = result.get("error") or "成功"
+        period_rows.append(row)
+    periods_df = pd.DataFrame(period_rows, columns=["日期", *period_statistic_columns, "处理结果"])
+
+    districts_df = pd.DataFrame(district_columns).fillna(0).astype(int)
+    districts_df.index.name = "区域"
+    if not districts_df.empty:
+        districts_df["合计"] = districts_df.sum(axis=1)
+    return periods_df, districts_df.reset_index()
+
+
+def build_batch_zip(entries):
+    """把[(文件名, 内容)]打包为zip；xlsx本身已经压缩，直接存储"""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return output.getvalue()
+
+
+class PeriodGate:
+    """批量处理中一期的顺序控制：各期的处理流程并行执行，只有读取上一期数量和写入线索库按日期顺序进行
+
+    处理流程在生成基本情况前调用wait()，取得事件循环所在进程在更早的各期写入线索库（或失败）后给出的决定：
+    (True, 上一期线索数量)继续处理，(False, None)表示该期已命中结果缓存，不必继续；写入线索库后调用release()。
+    decisions和stored为queue.Queue和threading.Event（线程执行器）或对应的Manager代理（进程池）
+    """
+
+    def __init__(self, decisions, stored):
+        self.decisions = decisions
+        self.stored = stored
+
+    def wait(self):
+        return self.decisions.get()
+
+    def decide(self, proceed, previous_counts=None):
+        self.decisions.put((proceed, previous_counts))
+
+    def release(self):
+        self.stored.set()
+
+    def wait_released(self):
+        self.stored.wait()
@@ -0,0 +1,74 @@
+"""批量处理命令行：不启动Web服务，直接在本机用多个进程重新生成多期报表
+
+python batch_cli.py 数据目录/ -o 结果.zip
+python batch_cli.py 2024年3月.zip -o 结果.zip --workers 4
+python batch_cli.py 12345_20240301.xlsx 12345_20240302.xlsx 安薪在线.xlsx -o 结果.zip
+
+文件按文件名中的日期配对（规则见batch.py），结果与POST /batch/接口相同：
+每期一个“YYYYMMDD劳动监察线索汇总和统计.xlsx”和跨期统计表
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+
+def collect_files(paths):
+    """读取命令行给出的文件，目录中的Excel文件和zip压缩包递归读取，返回[(名称, 内容)]"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith((".xlsx", ".xls", ".zip")) and not name.startswith((".", "~$")):
+                        full_path = os.path.join(root, name)
+                        with open(full_path, "rb") as f:
+                            files.append((os.path.relpath(full_path, path), f.read()))
+        else:
+            with open(path, "rb") as f:
+                files.append((os.path.basename(path), f.read()))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量处理多期12345 / 安薪在线文件")
+    parser.add_argument("paths", nargs="+", help="Excel文件、zip压缩包或包含它们的目录")
+    parser.add_argument("-o", "--output", required=True, help="输出的zip文件")
+    parser.add_argument("--workers", type=int, default=None, help="并行处理的进程数，默认为CPU核数")
+    args = parser.parse_args()
+    if args.workers:
+        os.environ["PIPELINE_WORKERS"] = str(args.workers)
+
+    # 执行器的进程数在导入时读取环境变量
+    import main as app_main
+    from batch import BatchInputError, expand_batch_files, pair_batch_files
+
+    try:
+        pairs = pair_batch_files(expand_batch_files(collect_files(args.paths)))
+    except BatchInputError as e:
+        print(f"无法配对输入文件: {e}")
+        sys.exit(2)
+    for pair in pairs:
+        print(f"{pair['date']}: {pair['name_12345']} + {pair['name_anxin']}")
+
+    started_at = time.perf_counter()
+    try:
+        results = asyncio.run(app_main.run_batch(pairs, min(app_main.pipeline_workers, len(pairs))))
+        archive = app_main.build_batch_archive(results)
+    finally:
+        app_main.shutdown_pipeline_executor()
+        app_main.shutdown_progress_queue()
+    with open(args.output, "wb") as f:
+        f.write(archive)
+
+    failed = [result for result in results if result["error"] is not None]
+    print(f"已处理{len(results)}期，失败{len(failed)}期，耗时{time.perf_counter() - started_at:.1f}s，结果已保存到{args.output}")
+    for result in failed:
+        print(f"  {result['date']}: {result['error']}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
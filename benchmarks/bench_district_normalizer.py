@@ -0,0 +1,57 @@
+"""区域名称标准化性能基准
+
+对比逐行apply(process_12345_district)与去重后整列解析的normalize_district_column，
+在仓库根目录运行：python -m benchmarks.bench_district_normalizer --rows 500000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from main import mapping_config, normalize_district_column, process_12345_district, process_anxin_district
+
+
+def make_district_series(rows, seed=0):
+    """生成重复少量原始区域写法的区域列，模拟12345与安薪在线导出数据"""
+    rng = random.Random(seed)
+    mappings = mapping_config.tables
+    raw_values = list(mappings.district_mapping) + mappings.valid_districts
+    raw_values += [f"宜昌市{district}" for district in mappings.valid_districts]
+    raw_values += [f"宜昌市-{district}-某某街道" for district in mappings.valid_districts]
+    return pd.Series([rng.choice(raw_values) for _ in range(rows)], dtype=object)
+
+
+def time_call(func, repeat):
+    """返回多次执行中的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="区域名称标准化性能基准")
+    parser.add_argument("--rows", type=int, default=200000, help="区域列行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    series = make_district_series(args.rows)
+    print(f"行数: {args.rows}, 不同原始值: {series.nunique()}")
+
+    for name, resolver in (("12345", process_12345_district), ("安薪在线", process_anxin_district)):
+        apply_time = time_call(lambda: series.apply(resolver), args.repeat)
+        normalize_time = time_call(lambda: normalize_district_column(series, resolver), args.repeat)
+        # 两种方式的结果必须一致
+        expected = series.apply(resolver).tolist()
+        actual = normalize_district_column(series, resolver).tolist()
+        assert expected == actual, f"{name}区域标准化结果不一致"
+        print(f"{name}: 逐行apply {apply_time * 1000:.1f}ms, "
+              f"normalize_district_column {normalize_time * 1000:.1f}ms, "
+              f"加速 {apply_time / normalize_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
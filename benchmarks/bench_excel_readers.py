@@ -0,0 +1,58 @@
+"""Excel读取引擎性能基准
+
+在生成的12345 / 安薪在线工作簿上对比：
+  - 原方式：pd.read_excel默认openpyxl引擎读取全部列
+  - openpyxl只读模式 + usecols + 指定dtype
+  - calamine + usecols + 指定dtype（需安装python-calamine）
+在仓库根目录运行：python -m benchmarks.bench_excel_readers --rows 20000
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from main import (read_upload_excel, calamine_available, required_columns_12345, required_columns_anxin,
+                  text_dtypes_12345, text_dtypes_anxin)
+from benchmarks.fixtures import make_12345_frame, make_anxin_frame, workbook_bytes
+
+
+def time_call(func, repeat):
+    """返回多次执行中的最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel读取引擎性能基准")
+    parser.add_argument("--rows", type=int, default=20000, help="12345数据行数")
+    parser.add_argument("--anxin-rows", type=int, default=None, help="安薪在线数据行数，默认为12345行数的1/5")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    anxin_rows = args.anxin_rows or max(args.rows // 5, 1)
+    fixtures = [
+        ("12345", make_12345_frame(args.rows), required_columns_12345, text_dtypes_12345),
+        ("安薪在线", make_anxin_frame(anxin_rows), required_columns_anxin, text_dtypes_anxin),
+    ]
+
+    engines = ["openpyxl"] + (["calamine"] if calamine_available() else [])
+    if not calamine_available():
+        print("未安装python-calamine，跳过calamine引擎")
+
+    for name, frame, columns, dtypes in fixtures:
+        content = workbook_bytes(frame)
+        print(f"{name}: {len(frame)}行, {len(frame.columns)}列, {len(content) / 1024 / 1024:.1f}MB")
+        baseline = time_call(lambda: pd.read_excel(io.BytesIO(content)), args.repeat)
+        print(f"  pd.read_excel（全部列）: {baseline:.2f}s")
+        for engine in engines:
+            elapsed = time_call(lambda: read_upload_excel(content, columns, dtypes, engine=engine), args.repeat)
+            print(f"  read_upload_excel({engine}): {elapsed:.2f}s, 加速 {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""处理流程性能基准套件
+
+生成指定规模（默认1千、1万、10万行，可加100万行）的合成12345 / 安薪在线工作簿，分别计时各阶段：
+读取Excel（read_upload_excel）、generate_summary_table、generate_basic_info、generate_statistics_table、
+导出Excel（write_summary_workbook），以及端到端的POST /process_files/请求。
+结果保存为JSON，--compare与之前保存的结果逐项比较，耗时增加超过阈值时标记为退化。
+
+在仓库根目录运行：
+python -m benchmarks.bench_pipeline --sizes 1000,10000,100000 --output benchmarks/results/baseline.json
+python -m benchmarks.bench_pipeline --sizes 1000,10000,100000 --compare benchmarks/results/baseline.json
+只比较两次已保存的结果：
+python -m benchmarks.bench_pipeline --load benchmarks/results/new.json --compare benchmarks/results/baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# 基准测试不使用结果缓存、解析缓存和线索库，每次都完整处理；可以通过环境变量覆盖
+os.environ.setdefault("RESULT_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("FRAME_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("CLUE_STORE_PATH", "")
+
+import pandas as pd  # noqa: E402
+
+from main import (app, generate_summary_table, normalize_numeric_columns, generate_basic_info,  # noqa: E402
+                  generate_statistics_table, write_summary_workbook, read_upload_excel, resolve_excel_engine,
+                  required_columns_12345, required_columns_anxin, text_dtypes_12345, text_dtypes_anxin,
+                  streaming_mode, streaming_threshold_bytes)
+from benchmarks.fixtures import make_12345_frame, make_anxin_frame, save_workbook  # noqa: E402
+
+# 各阶段的名称，按处理顺序排列
+stage_names = ["read_excel", "generate_summary_table", "generate_basic_info", "generate_statistics_table",
+               "export", "end_to_end"]
+# 结果文件格式版本
+result_format_version = 1
+# 基准日期，写入基本情况和文件名
+benchmark_date = "20240101"
+
+
+def fixture_paths(rows, anxin_rows, seed, directory):
+    """生成（或复用已生成的）测试工作簿，返回两个文件的路径"""
+    os.makedirs(directory, exist_ok=True)
+    path_12345 = os.path.join(directory, f"12345_{rows}_{seed}.xlsx")
+    path_anxin = os.path.join(directory, f"anxin_{anxin_rows}_{seed}.xlsx")
+    for path, make, count in ((path_12345, make_12345_frame, rows), (path_anxin, make_anxin_frame, anxin_rows)):
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            # 先写入临时文件，中断时不会留下不完整的测试文件
+            tmp_path = f"{path}.tmp"
+            save_workbook(make(count, seed=seed), tmp_path)
+            os.replace(tmp_path, path)
+            print(f"  已生成{os.path.basename(path)}（{time.perf_counter() - start:.1f}s）")
+    return path_12345, path_anxin
+
+
+def timed(func):
+    """执行func，返回(返回值, 耗时秒数)"""
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+
+def run_stages(content_12345, content_anxin):
+    """依次执行各处理阶段，返回{阶段: 耗时}"""
+    timings = {}
+
+    def read_both():
+        df_12345, _ = read_upload_excel(content_12345, required_columns_12345, text_dtypes_12345)
+        df_anxin, _ = read_upload_excel(content_anxin, required_columns_anxin, text_dtypes_anxin)
+        return df_12345, df_anxin
+
+    (df_12345, df_anxin), timings["read_excel"] = timed(read_both)
+    summary_df, timings["generate_summary_table"] = timed(
+        lambda: normalize_numeric_columns(generate_summary_table(df_12345, df_anxin)))
+    (basic_info, _), timings["generate_basic_info"] = timed(lambda: generate_basic_info(summary_df, benchmark_date))
+    stats_df, timings["generate_statistics_table"] = timed(lambda: generate_statistics_table(summary_df, basic_info))
+    _, timings["export"] = timed(lambda: write_summary_workbook(io.BytesIO(), summary_df, stats_df))
+    return timings
+
+
+def run_end_to_end(client, content_12345, content_anxin):
+    """提交一次POST /process_files/请求，返回耗时"""
+    def request():
+        response = client.post("/process_files/", files={
+            "file_12345": ("12345.xlsx", content_12345),
+            "file_anxin": ("anxin.xlsx", content_anxin),
+        })
+        response.raise_for_status()
+    _, elapsed = timed(request)
+    return elapsed
+
+
+def git_commit():
+    """当前的git提交，不在git仓库中时返回None"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    """按规模运行各阶段和端到端请求，返回结果字典"""
+    from fastapi.testclient import TestClient
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {
+        "format_version": result_format_version,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    with TestClient(app) as client:
+        warmed_up = args.skip_http
+        for rows in sizes:
+            anxin_rows = max(rows // 5, 1)
+            print(f"规模 {rows}行（安薪在线{anxin_rows}行）")
+            path_12345, path_anxin = fixture_paths(rows, anxin_rows, args.seed, args.fixture_dir)
+            with open(path_12345, "rb") as f:
+                content_12345 = f.read()
+            with open(path_anxin, "rb") as f:
+                content_anxin = f.read()
+
+            if not warmed_up:
+                # 第一次请求包含启动工作进程和导入模块的时间，不计入结果
+                run_end_to_end(client, content_12345, content_anxin)
+                warmed_up = True
+
+            runs = {name: [] for name in stage_names}
+            for _ in range(args.repeat):
+                for name, elapsed in run_stages(content_12345, content_anxin).items():
+                    runs[name].append(elapsed)
+                if not args.skip_http:
+                    runs["end_to_end"].append(run_end_to_end(client, content_12345, content_anxin))
+
+            total_bytes = len(content_12345) + len(content_anxin)
+            results["sizes"][str(rows)] = {
+                "rows_12345": rows,
+                "rows_anxin": anxin_rows,
+                "bytes_12345": len(content_12345),
+                "bytes_anxin": len(content_anxin),
+                "excel_engine": resolve_excel_engine(content_12345),
+                # 端到端请求在文件较大时走流式处理
+                "end_to_end_streaming": streaming_mode == "always" or (
+                    streaming_mode == "auto" and total_bytes >= streaming_threshold_bytes),
+                "stages": {name: {"best": min(values), "runs": values} for name, values in runs.items() if values},
+            }
+            for name, values in runs.items():
+                if values:
+                    print(f"  {name:<28}{min(values):>10.3f}s")
+    return results
+
+
+def compare_results(current, baseline, threshold, min_seconds):
+    """逐个规模、阶段比较最短耗时，打印对比表，返回退化的(规模, 阶段)列表
+
+    耗时增加超过threshold（比例）且绝对值增加超过min_seconds时视为退化，避免小规模下的抖动误报
+    """
+    regressions = []
+    print(f"对比基准: {baseline.get('git_commit')}（{baseline.get('created_at')}） -> "
+          f"{current.get('git_commit')}（{current.get('created_at')}）")
+    print(f"{'规模':>10}  {'阶段':<28}{'基准(s)':>10}{'本次(s)':>10}{'变化':>9}")
+    for size, entry in current["sizes"].items():
+        baseline_entry = baseline.get("sizes", {}).get(size)
+        if baseline_entry is None:
+            print(f"{size:>10}  基准中没有此规模，跳过")
+            continue
+        for name in stage_names:
+            if name not in entry["stages"] or name not in baseline_entry["stages"]:
+                continue
+            before = baseline_entry["stages"][name]["best"]
+            after = entry["stages"][name]["best"]
+            change = (after - before) / before if before > 0 else 0.0
+            regressed = change > threshold and after - before > min_seconds
+            if regressed:
+                regressions.append((size, name))
+            print(f"{size:>10}  {name:<28}{before:>10.3f}{after:>10.3f}{change:>+9.0%}{'  退化' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理流程性能基准套件")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="12345数据行数，逗号分隔，例如1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模的重复次数，取最短耗时")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument("--fixture-dir", default=os.path.join(tempfile.gettempdir(), "jiancha-bench-fixtures"),
+                        help="生成的测试工作簿目录，相同规模和种子的文件会被复用")
+    parser.add_argument("--skip-http", action="store_true", help="不计时端到端的/process_files/请求")
+    parser.add_argument("--output", default=None,
+                        help="结果JSON文件，默认为benchmarks/results/<时间>.json")
+    parser.add_argument("--load", default=None, help="不运行基准，直接读取已保存的结果（与--compare一起使用）")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果JSON比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="耗时增加超过该比例时视为退化")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="耗时增加的绝对值不超过该秒数时不视为退化")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退化时以退出码1结束")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load, encoding="utf-8") as f:
+            results = json.load(f)
+    else:
+        results = run_suite(args)
+        output = args.output or os.path.join("benchmarks", "results",
+                                             f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到{output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"发现{len(regressions)}项退化")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""汇总表列类型的内存占用对比
+
+在合成的12345 / 安薪在线数据上生成汇总表，对比每列按summary_schema转换前（全部为object）和转换后的内存占用，
+在仓库根目录运行：python -m benchmarks.bench_summary_schema --rows 200000
+"""
+import argparse
+
+from main import (generate_summary_table, normalize_numeric_columns, memory_report, summary_schema,
+                  summary_text_dtype)
+from benchmarks.fixtures import make_12345_frame, make_anxin_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总表列类型的内存占用对比")
+    parser.add_argument("--rows", type=int, default=200000, help="12345数据行数")
+    parser.add_argument("--anxin-rows", type=int, default=None, help="安薪在线数据行数，默认为12345行数的1/5")
+    args = parser.parse_args()
+
+    anxin_rows = args.anxin_rows or max(args.rows // 5, 1)
+    summary_df = normalize_numeric_columns(generate_summary_table(
+        make_12345_frame(args.rows, with_extra_columns=False), make_anxin_frame(anxin_rows, with_extra_columns=False)))
+    typed = memory_report(summary_df)
+    untyped = memory_report(summary_df.astype({column: object for column in summary_schema if column in summary_df}))
+
+    print(f"汇总表: {len(summary_df)}行, {len(summary_df.columns)}列, 文本列类型: {summary_text_dtype()}")
+    print(f"{'列':<16}{'类型':<16}{'object(MB)':>12}{'转换后(MB)':>12}")
+    for column in untyped:
+        print(f"{column:<16}{str(summary_df[column].dtype):<16}"
+              f"{untyped[column] / 1024 / 1024:>12.2f}{typed[column] / 1024 / 1024:>12.2f}")
+    before, after = sum(untyped.values()), sum(typed.values())
+    print(f"总计: {before / 1024 / 1024:.1f}MB -> {after / 1024 / 1024:.1f}MB，减少 {1 - after / before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""基准测试用的合成12345 / 安薪在线数据
+
+列名来自main.py中的required_columns_12345 / required_columns_anxin，
+区域写法来自区域映射配置（config/mappings.json）中的district_mapping和valid_districts
+"""
+import io
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from main import mapping_config, required_columns_12345, required_columns_anxin
+
+valid_districts = mapping_config.tables.valid_districts
+# 12345原始区域写法：简称、全称以及带市级前缀的写法
+raw_districts_12345 = (list(mapping_config.tables.district_mapping) + valid_districts
+                       + [f"宜昌市{district}" for district in valid_districts])
+# 安薪在线区域写法：'宜昌市-区县'或'宜昌市-区县-乡镇'
+raw_districts_anxin = ([f"宜昌市-{district}" for district in valid_districts]
+                       + [f"宜昌市-{district}-某某街道" for district in valid_districts]
+                       + [f"宜昌市-{name}-某某镇" for name in ("长阳土家族自治县", "五峰土家族自治县")])
+
+event_sources = ["部平台", "12345/热线", "12345/网站", "12345/微信", "信访"]
+fields = ["建筑", "非建"]
+industries_construction = ["房屋建筑", "市政", "水利", "交通", "园林绿化"]
+industries_other = ["制造业", "餐饮", "批发零售", "居民服务", "教育"]
+project_natures = ["政府投资项目", "国企投资项目", "社会投资项目", None]
+warning_types = ["工资未按时发放", "专户未开设", "实名制考勤异常", "维权公示牌未设置"]
+warning_states = ["待处理", "处理中", "已处理"]
+# 导出文件中通常还带有大量与汇总无关的列
+extra_columns = [f"备注{index}" for index in range(1, 11)]
+
+
+def make_12345_frame(rows, seed=0, with_extra_columns=True):
+    """生成指定行数的12345数据"""
+    rng = np.random.default_rng(seed)
+    project_ids = rng.integers(0, max(rows // 5, 1), rows)
+    people = rng.integers(0, 60, rows)
+    df = pd.DataFrame({
+        "序号": np.arange(1, rows + 1),
+        "流水号": [f"YC{index:010d}" for index in rng.integers(0, 10 ** 10, rows)],
+        "紧急程度": rng.choice(["一般", "紧急"], rows),
+        "事件来源": rng.choice(event_sources, rows),
+        "诉求人": [f"诉求人{index}" for index in rng.integers(0, max(rows // 2, 1), rows)],
+        "诉求人电话": [f"138{index:08d}" for index in rng.integers(0, max(rows // 2, 1), rows)],
+        "诉求标题": rng.choice(["讨要工资", "拖欠农民工工资", "工程款纠纷"], rows),
+        "诉求内容": [f"反映某某项目{index}拖欠{count}名工人工资，请求协调解决。" for index, count in zip(project_ids, people)],
+        "所属区域": rng.choice(raw_districts_12345, rows),
+        "所涉领域": rng.choice(fields, rows, p=[0.6, 0.4]),
+        "是否涉稳": rng.choice(["否", "是"], rows, p=[0.95, 0.05]),
+        "所涉行业": rng.choice(industries_construction + industries_other, rows),
+        "所涉项目（企业）": [f"某某项目{index}" for index in project_ids],
+        "项目性质": rng.choice(np.array(project_natures, dtype=object), rows),
+        "是否在监管系统中": rng.choice(["是", "否"], rows),
+        "项目状态": rng.choice(["在建", "完工", "停工"], rows),
+        "建设单位": [f"建设单位{index}" for index in project_ids % 997],
+        "总包单位": [f"总包单位{index}" for index in project_ids % 499],
+        "涉及人数": people,
+        "涉及金额": rng.integers(0, 500, rows) * 1000,
+        "是否再次投诉": rng.choice(["否", "是"], rows, p=[0.8, 0.2]),
+    }, columns=required_columns_12345)
+    if with_extra_columns:
+        for column in extra_columns:
+            df[column] = "无关内容"
+    return df
+
+
+def make_anxin_frame(rows, seed=0, with_extra_columns=True):
+    """生成指定行数的安薪在线预警数据"""
+    rng = np.random.default_rng(seed + 1)
+    project_ids = rng.integers(0, max(rows // 3, 1), rows)
+    df = pd.DataFrame({
+        "项目名称": [f"某某项目{index}" for index in project_ids],
+        "行业": rng.choice(industries_construction, rows),
+        "建设单位": [f"建设单位{index}" for index in project_ids % 997],
+        "施工单位": [f"施工单位{index}" for index in project_ids % 499],
+        "项目经理": [f"项目经理{index}" for index in project_ids % 211],
+        "联系电话": [f"139{index:08d}" for index in project_ids],
+        "区域": rng.choice(raw_districts_anxin, rows),
+        "预警类型": rng.choice(warning_types, rows),
+        "预警原因": rng.choice(["超过发薪日未发放工资", "未按规定开设工资专用账户", "考勤记录缺失"], rows),
+        "预警时间": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "状态": rng.choice(warning_states, rows),
+        "预警天数": rng.integers(1, 90, rows),
+    }, columns=required_columns_anxin)
+    if with_extra_columns:
+        for column in extra_columns:
+            df[column] = "无关内容"
+    return df
+
+
+def workbook_bytes(df):
+    """将数据写入xlsx，返回文件内容"""
+    output = io.BytesIO()
+    df.to_excel(output, index=False, engine="openpyxl")
+    return output.getvalue()
+
+
+def save_workbook(df, path, chunk_rows=50000):
+    """以openpyxl只写模式把数据写入xlsx文件，比DataFrame.to_excel快，适合生成百万行的测试文件"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append([str(column) for column in df.columns])
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
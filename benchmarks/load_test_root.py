@@ -0,0 +1,92 @@
+"""首页延迟负载测试
+
+先空闲探测一段时间"/"的响应延迟，再并发提交N个大文件处理请求，
+处理期间持续探测"/"，对比两个阶段的延迟分布。
+需要先启动服务（uvicorn main:app --port 4406），在仓库根目录运行：
+python -m benchmarks.load_test_root --uploads 4 --rows 50000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.fixtures import make_12345_frame, make_anxin_frame, workbook_bytes
+
+
+def summarize(name, latencies):
+    """打印延迟分布（毫秒）"""
+    if not latencies:
+        print(f"{name}: 无数据")
+        return
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name}: 请求数 {len(latencies)}, p50 {statistics.median(latencies):.1f}ms, "
+          f"p95 {p95:.1f}ms, 最大 {latencies[-1]:.1f}ms")
+
+
+async def probe_root(client, stop_event, interval):
+    """持续请求"/"直到stop_event被设置，返回每次请求的延迟"""
+    latencies = []
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def upload(client, file_12345, file_anxin):
+    """提交一次文件处理请求，返回状态码（请求失败时为异常信息）和耗时"""
+    start = time.perf_counter()
+    try:
+        response = await client.post("/process_files/", files={
+            "file_12345": ("12345.xlsx", file_12345),
+            "file_anxin": ("anxin.xlsx", file_anxin),
+        })
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = f"{type(e).__name__}: {e}"
+    return status, time.perf_counter() - start
+
+
+async def run(args):
+    print(f"生成测试文件: 12345数据{args.rows}行, 安薪在线数据{args.rows // 5}行")
+    file_12345 = workbook_bytes(make_12345_frame(args.rows))
+    file_anxin = workbook_bytes(make_anxin_frame(max(args.rows // 5, 1)))
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        # 空闲阶段
+        stop_event = asyncio.Event()
+        probe = asyncio.create_task(probe_root(client, stop_event, args.interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop_event.set()
+        idle_latencies = await probe
+
+        # 负载阶段：并发提交处理请求
+        stop_event = asyncio.Event()
+        probe = asyncio.create_task(probe_root(client, stop_event, args.interval))
+        results = await asyncio.gather(*[upload(client, file_12345, file_anxin) for _ in range(args.uploads)])
+        stop_event.set()
+        load_latencies = await probe
+
+    summarize("空闲时 /", idle_latencies)
+    summarize(f"{args.uploads}个处理请求进行中 /", load_latencies)
+    for index, (status, elapsed) in enumerate(results, start=1):
+        print(f"处理请求{index}: 状态 {status}, 耗时 {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理大文件时首页延迟负载测试")
+    parser.add_argument("--url", default="http://127.0.0.1:4406", help="服务地址")
+    parser.add_argument("--uploads", type=int, default=4, help="并发处理请求数")
+    parser.add_argument("--rows", type=int, default=50000, help="12345数据行数")
+    parser.add_argument("--interval", type=float, default=0.1, help="探测间隔（秒）")
+    parser.add_argument("--idle-seconds", type=float, default=3.0, help="空闲阶段探测时长（秒）")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
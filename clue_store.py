@@ -0,0 +1,326 @@
+"""线索库：把每期处理后的汇总表行保存到本地SQLite文件，用于计算与上一期的变化"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+
+import pandas as pd
+
+
+schema = """
+CREATE TABLE IF NOT EXISTS periods (
+    period TEXT PRIMARY KEY,
+    xiansuo_count INTEGER NOT NULL,
+    xiansuo_bupingtai_count INTEGER NOT NULL,
+    xiansuo_12345_count INTEGER NOT NULL,
+    anxin_count INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clues (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    first_period TEXT NOT NULL,
+    last_period TEXT NOT NULL,
+    district TEXT,
+    event_source TEXT,
+    field TEXT,
+    data TEXT NOT NULL,
+    phone_key TEXT,
+    project_key TEXT,
+    UNIQUE (source, dedup_key)
+);
+CREATE INDEX IF NOT EXISTS clues_first_period ON clues (first_period);
+CREATE INDEX IF NOT EXISTS clues_last_period ON clues (last_period);
+"""
+
+# 重复投诉查询使用的索引，建在phone_key、project_key列添加之后
+key_indexes = """
+CREATE INDEX IF NOT EXISTS clues_phone_key ON clues (phone_key, first_period) WHERE phone_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS clues_project_key ON clues (project_key, first_period) WHERE project_key IS NOT NULL;
+"""
+
+# 一人多诉、多人一诉的投诉次数阈值
+repeat_threshold = 3
+
+# 视为未填写的项目（企业）名称
+blank_project_names = {"", "-", "--", "无", "不详", "未知"}
+
+# 数据源：12345热线/部平台等按流水号去重，安薪在线按(项目名称, 预警时间, 预警类型)去重
+source_12345 = "12345"
+source_anxin = "安薪在线"
+
+
+def text_values(series):
+    """转换为去掉首尾空格的文本，空值为空字符串"""
+    return series.astype("string").str.strip().fillna("")
+
+
+# 不属于原始数据的列：重新生成的序号、项目关联编号（只在整体处理且开启项目关联时存在）
+derived_columns = {"序号", "关联编号"}
+
+
+def content_columns(summary_df):
+    """缺少流水号时构成去重键的列：汇总表中来自上传文件的列，不含序号、关联编号和以下划线开头的缓存列"""
+    return [column for column in summary_df.columns
+            if column not in derived_columns and not str(column).startswith("_")]
+
+
+def dedup_keys(summary_df, is_anxin):
+    """生成每行的去重键；12345数据缺少流水号时用来自上传文件的各列内容代替
+
+    行的顺序、整体处理或流式处理、是否开启项目关联都不影响去重键
+    """
+    if is_anxin:
+        parts = [text_values(summary_df[column]) for column in ("所涉项目（企业）", "预警时间", "预警类型")]
+        return parts[0].str.cat(parts[1:], sep="\x1f")
+    serial = text_values(summary_df["流水号"]).astype(object)
+    missing = (serial == "").to_numpy()
+    if missing.any():
+        row_text = summary_df.loc[missing, content_columns(summary_df)].astype("string").fillna("").agg(
+            "\x1f".join, axis=1)
+        serial[missing] = ("row:" + row_text).to_numpy()
+    return serial
+
+
+def normalize_phone(series):
+    """电话号码只保留数字，去掉+86/0086国家码；空值或没有数字时为None"""
+    digits = series.astype("string").str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+    digits = digits.str.replace(r"^(?:0086|86)(?=1\d{10}$)", "", regex=True)
+    return digits.astype(object).where(digits.fillna("") != "", None)
+
+
+def normalize_project_name(series):
+    """项目（企业）名称做全角半角统一（NFKC）、去掉空白并转为小写；未填写时为None"""
+    names = series.astype("string").map(lambda name: unicodedata.normalize("NFKC", name), na_action="ignore")
+    names = names.str.replace(r"\s+", "", regex=True).str.lower()
+    return names.astype(object).where(names.notna() & ~names.isin(blank_project_names), None)
+
+
+def complaint_keys(summary_df):
+    """本批投诉线索中出现的电话键集合和项目键集合"""
+    complaints = summary_df[summary_df["事件来源"] != "安薪在线"]
+    phone_keys = {key for key in normalize_phone(complaints["诉求人电话"]) if key is not None}
+    project_keys = {key for key in normalize_project_name(complaints["所涉项目（企业）"]) if key is not None}
+    return phone_keys, project_keys
+
+
+def row_records(summary_df, columns):
+    """把汇总表行转换为JSON文本，空值保存为null"""
+    values = summary_df[columns].astype(object).where(summary_df[columns].notna(), None)
+    return [json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str)
+            for row in values.itertuples(index=False, name=None)]
+
+
+class ClueStore:
+    """按期保存线索的SQLite库，多个工作进程可以同时打开同一个文件（WAL模式）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.initialized = False
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def connect(self):
+        """每个线程使用自己的连接，首次连接时建表"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self.initialized:
+                conn.executescript(schema)
+                self.migrate(conn)
+                conn.executescript(key_indexes)
+                self.initialized = True
+            self.local.conn = conn
+        return conn
+
+    def migrate(self, conn):
+        """为旧版本的线索库添加电话、项目名称键列，并根据保存的行内容补全
+
+        多个线程或进程可能同时首次打开旧的线索库：在BEGIN IMMEDIATE事务中重新检查列，
+        后获得写锁的连接看到已经添加的列后直接返回
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(clues)")}
+        if "phone_key" in columns and "project_key" in columns:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(clues)")}
+            if "phone_key" in columns and "project_key" in columns:
+                return
+            for column in ("phone_key", "project_key"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE clues ADD COLUMN {column} TEXT")
+            rows = conn.execute("SELECT id, data FROM clues WHERE source = ?", (source_12345,)).fetchall()
+            if rows:
+                ids = [row[0] for row in rows]
+                data = pd.DataFrame([json.loads(row[1]) for row in rows])
+                phones = normalize_phone(data.get("诉求人电话", pd.Series([None] * len(rows))))
+                projects = normalize_project_name(data.get("所涉项目（企业）", pd.Series([None] * len(rows))))
+                conn.executemany("UPDATE clues SET phone_key = ?, project_key = ? WHERE id = ?",
+                                 zip(phones, projects, ids))
+
+    def previous_period_counts(self, period):
+        """返回早于period的最近一期的线索数量，没有历史数据时返回None"""
+        if not self.enabled:
+            return None
+        row = self.connect().execute(
+            "SELECT period, xiansuo_count, xiansuo_bupingtai_count, xiansuo_12345_count, anxin_count "
+            "FROM periods WHERE period < ? ORDER BY period DESC LIMIT 1", (period,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("period", "xiansuo_count", "xiansuo_bupingtai_count", "xiansuo_12345_count", "anxin_count"), row))
+
+    def history_revision(self, period):
+        """period的结果所依赖的线索库状态的摘要，作为结果缓存键的一部分
+
+        只包含较早各期的数量和写入时间（补录或重新写入较早一期后变化）；本期的写入来自上传本身，
+        晚于period的各期不影响本期的统计，都不计入，相同文件再次上传时缓存键不变
+        """
+        if not self.enabled:
+            return None
+        earlier = self.connect().execute(
+            "SELECT period, xiansuo_count, xiansuo_bupingtai_count, xiansuo_12345_count, anxin_count, ingested_at "
+            "FROM periods WHERE period < ? ORDER BY period", (period,)
+        ).fetchall()
+        return hashlib.sha256(json.dumps(earlier).encode("utf-8")).hexdigest()[:16]
+
+    def periods(self):
+        """按时间顺序返回各期的线索数量"""
+        if not self.enabled:
+            return []
+        rows = self.connect().execute(
+            "SELECT period, xiansuo_count, xiansuo_bupingtai_count, xiansuo_12345_count, anxin_count, ingested_at "
+            "FROM periods ORDER BY period"
+        ).fetchall()
+        keys = ("period", "xiansuo_count", "xiansuo_bupingtai_count", "xiansuo_12345_count", "anxin_count", "ingested_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def ingest(self, summary_df, period, counts, columns):
+        """保存一期的线索数量和汇总表行，已存在的线索只更新最近一期和内容，返回新增的线索数
+
+        counts为本期的线索数量（xiansuo_count、xiansuo_bupingtai_count、xiansuo_12345_count、anxin_count），
+        columns为写入JSON的汇总表列
+        """
+        if not self.enabled:
+            return 0
+        self.record_period(period, counts)
+        return self.ingest_clues(summary_df, period, columns)
+
+    def record_period(self, period, counts):
+        """保存（或更新）一期的线索数量"""
+        if not self.enabled:
+            return
+        conn = self.connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO periods (period, xiansuo_count, xiansuo_bupingtai_count, xiansuo_12345_count, anxin_count, ingested_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (period) DO UPDATE SET "
+                "xiansuo_count = excluded.xiansuo_count, xiansuo_bupingtai_count = excluded.xiansuo_bupingtai_count, "
+                "xiansuo_12345_count = excluded.xiansuo_12345_count, anxin_count = excluded.anxin_count, "
+                "ingested_at = excluded.ingested_at",
+                (period, int(counts["xiansuo_count"]), int(counts["xiansuo_bupingtai_count"]),
+                 int(counts["xiansuo_12345_count"]), int(counts["anxin_count"]), datetime.now().isoformat(timespec="seconds"))
+            )
+
+    def ingest_clues(self, summary_df, period, columns):
+        """保存汇总表行（流式处理时逐批调用），返回新增的线索数"""
+        if not self.enabled:
+            return 0
+        is_anxin = (summary_df["事件来源"] == "安薪在线").to_numpy()
+        rows = []
+        for source, mask in ((source_12345, ~is_anxin), (source_anxin, is_anxin)):
+            part = summary_df[mask]
+            if part.empty:
+                continue
+            keys = dedup_keys(part, source == source_anxin)
+            districts = part["所属区域"].astype(object).where(part["所属区域"].notna(), None)
+            event_sources = part["事件来源"].astype(object).where(part["事件来源"].notna(), None)
+            fields = part["所涉领域"].astype(object).where(part["所涉领域"].notna(), None)
+            # 只有12345等投诉线索参与一人多诉、多人一诉统计
+            if source == source_12345:
+                phones = normalize_phone(part["诉求人电话"])
+                projects = normalize_project_name(part["所涉项目（企业）"])
+            else:
+                phones = projects = [None] * len(part)
+            rows.extend(zip([source] * len(part), keys, [period] * len(part), [period] * len(part),
+                            districts, event_sources, fields, row_records(part, columns), phones, projects))
+
+        conn = self.connect()
+        with conn:
+            before = conn.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO clues (source, dedup_key, first_period, last_period, district, event_source, field, data, "
+                "phone_key, project_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source, dedup_key) DO UPDATE SET "
+                "first_period = min(first_period, excluded.first_period), "
+                "last_period = max(last_period, excluded.last_period), "
+                "district = excluded.district, event_source = excluded.event_source, "
+                "field = excluded.field, data = excluded.data, "
+                "phone_key = excluded.phone_key, project_key = excluded.project_key",
+                rows
+            )
+            after = conn.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+        return after - before
+
+    def reset_repeat_keys(self):
+        """清空本期收集的电话键、项目键；临时表只对当前线程的连接可见，各处理流程互不影响"""
+        if not self.enabled:
+            return
+        conn = self.connect()
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS period_keys "
+                         "(kind TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (kind, key))")
+            conn.execute("DELETE FROM period_keys")
+
+    def collect_repeat_keys(self, summary_df):
+        """把一批投诉线索的电话键、项目键写入临时表；流式处理时逐批调用，键集合不在内存中累积"""
+        if not self.enabled:
+            return
+        phone_keys, project_keys = complaint_keys(summary_df)
+        conn = self.connect()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO period_keys (kind, key) VALUES (?, ?)",
+                             [("phone", key) for key in phone_keys] + [("project", key) for key in project_keys])
+
+    def collected_repeat_stats(self, period):
+        """按收集的键统计截至period（含）的重复投诉情况（需在线索写入之后调用），统计后清空临时表
+
+        返回历史累计投诉不少于3次的电话数、项目数，以及在更早一期已经出现过的电话数、项目数；
+        晚于period的线索不计入，补录较早一期时的统计与各期按时间顺序处理时一致
+        """
+        if not self.enabled:
+            return None
+        conn = self.connect()
+        stats = {}
+        with conn:
+            for name, column in (("phone", "phone_key"), ("project", "project_key")):
+                repeat_count, cross_period_count = conn.execute(
+                    f"SELECT COALESCE(SUM(count >= ?), 0), COALESCE(SUM(first_period < ?), 0) FROM ("
+                    f"SELECT COUNT(*) AS count, MIN(c.first_period) AS first_period FROM period_keys k "
+                    f"JOIN clues c ON c.{column} = k.key AND c.first_period <= ? WHERE k.kind = ? GROUP BY k.key)",
+                    (repeat_threshold, period, period, name)
+                ).fetchone()
+                stats[f"{name}_repeat_count"] = repeat_count
+                stats[f"{name}_cross_period_count"] = cross_period_count
+            conn.execute("DELETE FROM period_keys")
+        return stats
+
+    def repeat_stats(self, summary_df, period):
+        """统计本期投诉人电话、项目（企业）截至本期的重复投诉情况（需在ingest之后调用），返回值同collected_repeat_stats"""
+        if not self.enabled:
+            return None
+        self.reset_repeat_keys()
+        self.collect_repeat_keys(summary_df)
+        return self.collected_repeat_stats(period)
@@ -0,0 +1,101 @@
+"""数据立方体：按区域 × 所涉领域 × 事件来源 × 所涉行业 × 项目性质 × 预警类型一次分组统计条数、涉及人数和涉及金额
+
+只保存出现过的维度组合（稀疏单元格），数据看板按任意维度切片（过滤）和上卷（按较少的维度汇总）时
+直接在单元格上计算，不需要重新处理汇总表
+"""
+import numpy as np
+import pandas as pd
+
+# 维度：查询参数中的名称 -> 汇总表列
+cube_dimensions = {
+    "district": "所属区域",
+    "field": "所涉领域",
+    "source": "事件来源",
+    "industry": "所涉行业",
+    "nature": "项目性质",
+    "warning_type": "预警类型",
+}
+# 度量：条数、涉及人数之和、涉及金额之和
+cube_measures = ["count", "people", "amount"]
+
+
+def dimension_labels(series):
+    """维度取值：去掉首尾空格的文本，空值为空字符串"""
+    return series.astype("string").str.strip().fillna("")
+
+
+def cube_cells(summary_df, people, amount):
+    """一次分组统计各维度组合的条数和人数、金额之和，返回只含出现过的组合的单元格表
+
+    people、amount为与summary_df对齐的涉及人数、涉及金额（缺失值已按0处理）
+    """
+    cells = pd.DataFrame({dim: dimension_labels(summary_df[column]).to_numpy()
+                          for dim, column in cube_dimensions.items()})
+    cells["count"] = 1
+    cells["people"] = np.asarray(people, dtype="int64")
+    cells["amount"] = np.asarray(amount, dtype="float64")
+    return cells.groupby(list(cube_dimensions), sort=False).sum().reset_index()
+
+
+def merge_cube_cells(total, part):
+    """累加两批单元格表（流式处理时逐批调用），total为None时直接返回part"""
+    if total is None:
+        return part
+    return pd.concat([total, part], ignore_index=True).groupby(
+        list(cube_dimensions), sort=False).sum().reset_index()
+
+
+def cube_payload(cells):
+    """转换为可以写入JSON的格式：每个维度的取值列表和单元格的取值编号，以及各度量的数组"""
+    payload = {"dimensions": list(cube_dimensions), "labels": {}, "codes": {}}
+    for dim in cube_dimensions:
+        codes, labels = pd.factorize(cells[dim], sort=True)
+        payload["labels"][dim] = [str(label) for label in labels]
+        payload["codes"][dim] = codes.tolist()
+    payload["count"] = cells["count"].astype("int64").tolist()
+    payload["people"] = cells["people"].astype("int64").tolist()
+    payload["amount"] = cells["amount"].astype("float64").round(4).tolist()
+    return payload
+
+
+def load_cube(payload):
+    """把cube_payload的结果转换为numpy数组，供query_cube反复查询"""
+    return {
+        "labels": payload["labels"],
+        "label_index": {dim: {label: code for code, label in enumerate(labels)}
+                        for dim, labels in payload["labels"].items()},
+        "codes": {dim: np.asarray(codes, dtype=np.int32) for dim, codes in payload["codes"].items()},
+        **{measure: np.asarray(payload[measure]) for measure in cube_measures},
+    }
+
+
+def query_cube(cube, group_by=(), filters=None, limit=None):
+    """切片和上卷：先按filters（维度 -> 允许的取值列表）过滤单元格，再按group_by中的维度汇总
+
+    group_by为空时只返回合计；结果按条数从多到少排列，limit限制返回的行数
+    """
+    mask = np.ones(len(cube["count"]), dtype=bool)
+    for dim, values in (filters or {}).items():
+        wanted = [cube["label_index"][dim][value] for value in values if value in cube["label_index"][dim]]
+        mask &= np.isin(cube["codes"][dim], wanted)
+    measures = {measure: cube[measure][mask] for measure in cube_measures}
+    total = {"count": int(measures["count"].sum()), "people": int(measures["people"].sum()),
+             "amount": round(float(measures["amount"].sum()), 4)}
+
+    rows = []
+    if group_by:
+        shape = [len(cube["labels"][dim]) for dim in group_by]
+        flat = np.ravel_multi_index([cube["codes"][dim][mask] for dim in group_by], shape)
+        keys, inverse = np.unique(flat, return_inverse=True)
+        sums = {measure: np.bincount(inverse, weights=values, minlength=len(keys))
+                for measure, values in measures.items()}
+        key_codes = np.unravel_index(keys, shape)
+        order = np.argsort(-sums["count"], kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        for index in order:
+            row = {dim: cube["labels"][dim][codes[index]] for dim, codes in zip(group_by, key_codes)}
+            row.update(count=int(sums["count"][index]), people=int(sums["people"][index]),
+                       amount=round(float(sums["amount"][index]), 4))
+            rows.append(row)
+    return {"group_by": list(group_by), "filters": filters or {}, "total": total, "rows": rows}
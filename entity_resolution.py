@@ -0,0 +1,179 @@
+"""项目（企业）关联：把名称相近的12345线索和安薪在线预警关联为同一项目
+
+名称先做规范化（全角半角统一、去掉空白和标点、去掉有限公司等后缀），再按所属区域和字符二元组前缀分块，
+只比较同一块内的候选，不做全量两两比较；得分达到阈值的候选用并查集合并为关联组
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+# 名称末尾去掉的企业类型后缀，按顺序匹配第一个
+company_suffixes = ["股份有限公司", "有限责任公司", "有限公司", "分公司", "公司"]
+# 视为未填写的名称
+blank_entity_names = {"", "无", "不详", "未知"}
+# 名称相似度（字符二元组Jaccard系数）达到此值才作为候选
+candidate_threshold = 0.6
+# 名称相似度达到此值时直接关联
+link_threshold = 0.8
+# 建设单位或施工（总包）单位一致时的加分，名称相似度加上加分达到link_threshold时关联
+unit_match_bonus = 0.2
+
+
+def normalize_entity_name(name):
+    """规范化项目（企业）或单位名称，未填写时返回None"""
+    if name is None or pd.isna(name):
+        return None
+    text = unicodedata.normalize("NFKC", str(name)).lower()
+    # 去掉空白、括号和标点，中文字符保留
+    text = re.sub(r"[\W_]+", "", text)
+    if text in blank_entity_names:
+        return None
+    for suffix in company_suffixes:
+        if text.endswith(suffix):
+            # 名称只有后缀时保留原样
+            return text[:-len(suffix)] or text
+    return text
+
+
+def normalize_entity_column(series):
+    """对每个不同的值只规范化一次"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    normalized = [normalize_entity_name(value) for value in uniques]
+    return pd.Series([normalized[code] if code >= 0 else None for code in codes], index=series.index, dtype=object)
+
+
+def name_tokens(name):
+    """名称的字符二元组集合，单字名称使用单字"""
+    if len(name) == 1:
+        return frozenset([name])
+    return frozenset(name[i:i + 2] for i in range(len(name) - 1))
+
+
+def prefix_tokens(tokens, token_order):
+    """前缀过滤：按全局出现次数从少到多排序后取前n - ceil(t*n) + 1个二元组
+
+    两个集合的Jaccard系数不低于t时，它们的前缀至少有一个共同的二元组
+    """
+    ordered = sorted(tokens, key=token_order.__getitem__)
+    return ordered[:len(ordered) - math.ceil(candidate_threshold * len(ordered)) + 1]
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, node):
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def entity_nodes(summary_df):
+    """按(来源, 区域, 名称)去重得到实体节点
+
+    返回节点表（来源、区域、名称，以及节点内出现过的建设单位、施工单位集合）和每行对应的节点号（无名称时为-1）
+    """
+    is_anxin = summary_df["事件来源"].eq("安薪在线").to_numpy()
+    contractor = summary_df["施工单位"].where(is_anxin, summary_df["总包单位"])
+    keys = pd.DataFrame({
+        "anxin": is_anxin,
+        "district": summary_df["所属区域"].astype(object).where(summary_df["所属区域"].notna(), ""),
+        "name": normalize_entity_column(summary_df["所涉项目（企业）"]),
+    }, index=summary_df.index)
+    named = keys["name"].notna().to_numpy()
+    row_nodes = np.full(len(keys), -1, dtype=np.int64)
+    row_nodes[named] = keys[named].groupby(["anxin", "district", "name"], sort=False).ngroup().to_numpy()
+    nodes = keys[named].assign(node=row_nodes[named]).drop_duplicates("node").set_index("node").sort_index()
+
+    # 同一节点的各行可能填写了不同的单位，全部保留用于比较
+    owners = defaultdict(set)
+    contractors = defaultdict(set)
+    for node, owner, other in zip(row_nodes, normalize_entity_column(summary_df["建设单位"]),
+                                  normalize_entity_column(contractor)):
+        if node < 0:
+            continue
+        if owner is not None:
+            owners[node].add(owner)
+        if other is not None:
+            contractors[node].add(other)
+    nodes["owners"] = [owners.get(node, set()) for node in nodes.index]
+    nodes["contractors"] = [contractors.get(node, set()) for node in nodes.index]
+    return nodes, row_nodes
+
+
+def link_entities(nodes):
+    """在同一区域内比较12345节点和安薪在线节点，返回得分达到阈值的节点对"""
+    tokens = {node: name_tokens(name) for node, name in nodes["name"].items()}
+    frequency = Counter(token for node_tokens in tokens.values() for token in node_tokens)
+    token_order = {token: (count, token) for token, count in frequency.items()}
+    owners = nodes["owners"].to_dict()
+    contractors = nodes["contractors"].to_dict()
+
+    # 安薪在线节点按(区域, 前缀二元组)建立倒排索引
+    index = defaultdict(list)
+    anxin_nodes = nodes[nodes["anxin"]]
+    for node, district in anxin_nodes["district"].items():
+        for token in prefix_tokens(tokens[node], token_order):
+            index[(district, token)].append(node)
+
+    pairs = []
+    for node, district in nodes.loc[~nodes["anxin"], "district"].items():
+        node_tokens = tokens[node]
+        candidates = set()
+        for token in prefix_tokens(node_tokens, token_order):
+            candidates.update(index.get((district, token), ()))
+        for candidate in candidates:
+            candidate_tokens = tokens[candidate]
+            intersection = len(node_tokens & candidate_tokens)
+            similarity = intersection / (len(node_tokens) + len(candidate_tokens) - intersection)
+            if similarity >= link_threshold:
+                pairs.append((node, candidate))
+            elif similarity >= candidate_threshold and similarity + unit_match_bonus >= link_threshold:
+                # 名称相似度不够时，建设单位或施工（总包）单位一致才关联
+                if owners[node] & owners[candidate] or contractors[node] & contractors[candidate]:
+                    pairs.append((node, candidate))
+    return pairs
+
+
+def resolve_entities(summary_df):
+    """为关联到同一项目的12345线索和安薪在线预警分配相同的关联编号
+
+    只有同时包含两个来源的关联组才分配编号，编号按组内第一行的顺序从1开始，未关联的行为None
+    """
+    if summary_df.empty:
+        return pd.Series([], index=summary_df.index, dtype=object)
+    nodes, row_nodes = entity_nodes(summary_df)
+    if nodes.empty:
+        return pd.Series([None] * len(summary_df), index=summary_df.index, dtype=object)
+
+    union_find = UnionFind(len(nodes))
+    for a, b in link_entities(nodes):
+        union_find.union(a, b)
+
+    # 只保留同时包含12345和安薪在线节点的组
+    sources = defaultdict(set)
+    for node, anxin in nodes["anxin"].items():
+        sources[union_find.find(node)].add(bool(anxin))
+    linked_roots = {root for root, kinds in sources.items() if len(kinds) == 2}
+
+    cluster_ids = {}
+    result = []
+    for node in row_nodes:
+        root = union_find.find(node) if node >= 0 else None
+        if root in linked_roots:
+            result.append(cluster_ids.setdefault(root, len(cluster_ids) + 1))
+        else:
+            result.append(None)
+    return pd.Series(result, index=summary_df.index, dtype=object)
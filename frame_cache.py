@@ -0,0 +1,108 @@
+"""解析缓存：把每个数据源处理后的数据框按文件内容哈希保存为Parquet文件
+
+命中时用内存映射读回，未变化的文件不需要重新解析Excel；未安装pyarrow时不缓存
+"""
+import hashlib
+import os
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def pyarrow_available():
+    return pa is not None
+
+
+class FrameCache:
+    """按目录总大小淘汰的Parquet文件缓存，多个工作进程可以共用同一个目录
+
+    写入先落到临时文件再原子替换；读取时更新修改时间，淘汰时删除修改时间最早的文件
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return pyarrow_available() and bool(self.directory) and self.max_bytes > 0
+
+    def key(self, content, source, version):
+        """由文件内容、数据源名称和版本（映射表版本、缓存格式版本）计算缓存键"""
+        digest = hashlib.sha256(content).hexdigest()
+        version_digest = hashlib.sha256(f"{source}:{version}".encode("utf-8")).hexdigest()[:16]
+        return f"{source}-{digest}-{version_digest}"
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def load(self, key):
+        """命中时返回数据框，否则返回None；缓存文件损坏时删除并视为未命中"""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pq.read_table(path, memory_map=True).to_pandas()
+            os.utime(path)
+        except (OSError, pa.ArrowException) as e:
+            print(f"读取解析缓存失败，重新解析: {str(e)}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return df
+
+    def store(self, key, df):
+        """保存数据框；列中混有无法转换为Arrow类型的值或写入失败时跳过缓存"""
+        if not self.enabled:
+            return False
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            print(f"数据无法保存为Parquet，跳过解析缓存: {str(e)}")
+            return False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            try:
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, self.path(key))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except (OSError, pa.ArrowException) as e:
+            print(f"写入解析缓存失败: {str(e)}")
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """目录总大小超过上限时，按修改时间从旧到新删除缓存文件"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,243 @@
+"""处理流程的阶段指标：耗时、CPU时间、峰值内存增量和输入输出规模
+
+工作进程中由StageRecorder记录每个阶段并输出一行JSON日志，记录随处理结果返回事件循环所在进程，
+再汇总为Prometheus格式的直方图，由/metrics接口输出
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    page_size = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    page_size = None
+
+# 阶段运行期间采样当前常驻内存的间隔（秒）
+rss_sample_interval = 0.01
+
+
+def current_rss_bytes():
+    """当前进程的常驻内存（字节），读取/proc/self/statm；其他系统无法获取时返回None"""
+    if page_size is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * page_size
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler:
+    """有阶段在运行时由后台线程定时采样当前常驻内存，记录每个阶段运行期间的最大值"""
+
+    def __init__(self, interval=rss_sample_interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        # 阶段 -> 运行期间采样到的最大常驻内存
+        self.peaks = {}
+        self.stop_event = None
+
+    def begin(self, stage):
+        """阶段开始，返回开始时的常驻内存，无法获取时返回None"""
+        rss = current_rss_bytes()
+        if rss is None:
+            return None
+        with self.lock:
+            self.peaks[stage] = rss
+            if self.stop_event is None:
+                self.stop_event = threading.Event()
+                threading.Thread(target=self.run, args=(self.stop_event,), daemon=True,
+                                 name="rss-sampler").start()
+        return rss
+
+    def end(self, stage):
+        """阶段结束，返回运行期间的最大常驻内存；没有运行中的阶段时停止采样线程"""
+        rss = current_rss_bytes()
+        with self.lock:
+            peak = self.peaks.pop(stage, None)
+            if not self.peaks and self.stop_event is not None:
+                self.stop_event.set()
+                self.stop_event = None
+        if peak is None or rss is None:
+            return None
+        return max(peak, rss)
+
+    def run(self, stop_event):
+        while not stop_event.wait(self.interval):
+            rss = current_rss_bytes()
+            if rss is None:
+                return
+            with self.lock:
+                for stage, peak in self.peaks.items():
+                    if rss > peak:
+                        self.peaks[stage] = rss
+
+
+def log_event(event, **fields):
+    """输出一行JSON格式的结构化日志"""
+    record = {"time": datetime.now().isoformat(timespec="milliseconds"), "event": event, **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+
+
+class StageRecorder:
+    """记录处理流程各阶段的指标，并把阶段开始、完成事件转发给进度回调
+
+    峰值内存增量为阶段运行期间采样到的最大常驻内存与开始时的差值，与工作进程此前处理过的任务无关；
+    进程内同时运行其他任务（线程执行器、事件循环所在进程）时内存无法归属到阶段，
+    应以track_memory=False创建，不记录内存
+    """
+
+    def __init__(self, pipeline, progress=None, track_memory=True):
+        self.pipeline = pipeline
+        self.progress = progress
+        self.records = []
+        self.running = {}
+        self.sampler = RssSampler() if track_memory else None
+
+    def start(self, stage, input_rows=None, input_bytes=None):
+        rss_start = None if self.sampler is None else self.sampler.begin(stage)
+        self.running[stage] = (time.perf_counter(), time.process_time(), rss_start, input_rows, input_bytes)
+        if self.progress is not None:
+            self.progress(stage, "start")
+
+    def done(self, stage, output_rows=None, output_bytes=None):
+        wall_start, cpu_start, rss_start, input_rows, input_bytes = self.running.pop(stage)
+        rss_peak = None if self.sampler is None else self.sampler.end(stage)
+        record = {
+            "pipeline": self.pipeline,
+            "stage": stage,
+            "wall_seconds": round(time.perf_counter() - wall_start, 6),
+            "cpu_seconds": round(time.process_time() - cpu_start, 6),
+            "peak_rss_delta_bytes": None if rss_start is None or rss_peak is None else rss_peak - rss_start,
+            "input_rows": input_rows,
+            "input_bytes": input_bytes,
+            "output_rows": output_rows,
+            "output_bytes": output_bytes,
+        }
+        self.records.append(record)
+        log_event("pipeline_stage", **record)
+        if self.progress is not None:
+            self.progress(stage, "done")
+        return record
+
+
+# 直方图的桶上限
+seconds_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+bytes_buckets = tuple(1024 * 4 ** power for power in range(12))  # 1KB ~ 4GB
+rows_buckets = tuple(10 ** power for power in range(8))  # 1 ~ 1000万行
+
+
+def format_value(value):
+    """样本值按完整精度输出（:g只保留6位有效数字，字节数等累计值会显示为不再增长）"""
+    return repr(float(value))
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """按标签分组的累积直方图，输出Prometheus文本格式"""
+
+    def __init__(self, name, documentation, buckets, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # 标签值 -> [各桶计数, 总和, 次数]
+        self.series = {}
+
+    def observe(self, value, *label_values):
+        series = self.series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            labels = format_labels(self.label_names, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {format_value(total)}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    """按标签分组的计数器，输出Prometheus文本格式"""
+
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.series = {}
+
+    def inc(self, *label_values, amount=1):
+        self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{format_labels(self.label_names, label_values)}}} {format_value(value)}")
+        return lines
+
+
+# 阶段记录中的字段 -> (指标名, 说明, 桶)
+stage_metric_fields = {
+    "wall_seconds": ("jiancha_stage_wall_seconds", "处理阶段耗时（秒）", seconds_buckets),
+    "cpu_seconds": ("jiancha_stage_cpu_seconds", "处理阶段CPU时间（秒）", seconds_buckets),
+    "peak_rss_delta_bytes": ("jiancha_stage_peak_rss_delta_bytes", "处理阶段峰值内存增量（字节）", bytes_buckets),
+    "input_rows": ("jiancha_stage_input_rows", "处理阶段输入行数", rows_buckets),
+    "input_bytes": ("jiancha_stage_input_bytes", "处理阶段输入字节数", bytes_buckets),
+    "output_rows": ("jiancha_stage_output_rows", "处理阶段输出行数", rows_buckets),
+    "output_bytes": ("jiancha_stage_output_bytes", "处理阶段输出字节数", bytes_buckets),
+}
+
+
+class PipelineMetrics:
+    """事件循环所在进程中汇总的处理指标，各工作进程返回的阶段记录在这里合并"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_histograms = {
+            field: Histogram(name, documentation, buckets, ("pipeline", "stage"))
+            for field, (name, documentation, buckets) in stage_metric_fields.items()
+        }
+        self.runs = Counter("jiancha_pipeline_runs_total", "处理请求数（按处理方式和结果）", ("pipeline", "status"))
+        self.run_seconds = Histogram("jiancha_pipeline_run_seconds", "处理请求的总耗时（秒）",
+                                     seconds_buckets, ("pipeline",))
+
+    def observe_stages(self, records):
+        """合并一次处理返回的阶段记录，值为None的字段不计入"""
+        with self.lock:
+            for record in records:
+                for field, histogram in self.stage_histograms.items():
+                    value = record.get(field)
+                    if value is not None:
+                        histogram.observe(value, record["pipeline"], record["stage"])
+
+    def observe_run(self, pipeline, status, seconds=None):
+        """记录一次处理请求的结果（done、failed、cached）和总耗时"""
+        with self.lock:
+            self.runs.inc(pipeline, status)
+            if seconds is not None:
+                self.run_seconds.observe(seconds, pipeline)
+        log_event("pipeline_run", pipeline=pipeline, status=status,
+                  wall_seconds=None if seconds is None else round(seconds, 6))
+
+    def render(self):
+        """Prometheus文本格式（text/plain; version=0.0.4）"""
+        with self.lock:
+            lines = self.runs.render() + self.run_seconds.render()
+            for histogram in self.stage_histograms.values():
+                lines += histogram.render()
+        return "\n".join(lines) + "\n"
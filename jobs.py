@@ -0,0 +1,146 @@
+"""异步处理任务：任务状态、阶段进度和结果的存储"""
+import threading
+import time
+import uuid
+
+# 处理流程的各个阶段，顺序与run_pipeline一致
+pipeline_stages = [
+    ("read_12345", "读取12345文件"),
+    ("read_anxin", "读取安薪文件"),
+    ("summary", "生成汇总表"),
+    ("link", "关联项目"),
+    ("basic_info", "生成基本情况"),
+    ("cube", "生成数据立方体"),
+    ("stats", "生成统计表"),
+    ("store", "写入线索库"),
+    ("retain", "保留汇总表"),
+    ("export", "写入Excel文件"),
+]
+
+
+class ProgressReporter:
+    """把阶段进度事件放入队列，由事件循环所在进程的后台线程写回任务存储
+
+    队列为multiprocessing.Manager的队列代理时可以传给进程池中的工作进程
+    """
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def __call__(self, stage, event):
+        self.queue.put((self.job_id, stage, event, time.time()))
+
+
+class JobStore:
+    """有容量上限和过期时间的任务存储
+
+    已完成（成功或失败）的任务在ttl秒后过期；任务数超过max_jobs时优先淘汰最早完成的任务
+    """
+
+    def __init__(self, max_jobs=32, ttl=3600):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, **info):
+        """创建排队中的任务，返回任务id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": now,
+            "finished_at": None,
+            "error": None,
+            "stages": {name: {"status": "pending", "started_at": None, "finished_at": None}
+                       for name, _ in pipeline_stages},
+            "result": None,
+        }
+        job.update(info)
+        with self.lock:
+            self.evict(now)
+            self.jobs[job_id] = job
+        return job_id
+
+    def evict(self, now):
+        """清理过期任务，并在超出容量时淘汰最早完成的任务（调用方需持有锁）"""
+        for job_id, job in list(self.jobs.items()):
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl:
+                del self.jobs[job_id]
+        finished = sorted((job for job in self.jobs.values() if job["finished_at"] is not None),
+                          key=lambda job: job["finished_at"])
+        while len(self.jobs) >= self.max_jobs and finished:
+            del self.jobs[finished.pop(0)["job_id"]]
+
+    def get(self, job_id):
+        with self.lock:
+            self.evict(time.time())
+            return self.jobs.get(job_id)
+
+    def record_stage(self, job_id, stage, event, timestamp):
+        """记录阶段开始（start）或完成（done）"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or stage not in job["stages"]:
+                return
+            stage_info = job["stages"][stage]
+            # 进度事件可能晚于任务结束到达，此时只补记时间，不改变状态
+            finished = job["finished_at"] is not None
+            if event == "start":
+                stage_info["started_at"] = timestamp
+                if not finished:
+                    job["status"] = "running"
+                    stage_info["status"] = "running"
+            elif event == "done":
+                stage_info.update(status="done", finished_at=timestamp)
+
+    def finish(self, job_id, result=None, error=None):
+        """任务结束：成功时保存结果，失败时记录错误并把进行中的阶段标记为失败"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            now = time.time()
+            job["finished_at"] = now
+            if error is None:
+                job["status"] = "done"
+                job["result"] = result
+                for stage in job["stages"].values():
+                    if stage["status"] != "done":
+                        stage.update(status="done", finished_at=stage["finished_at"] or now)
+            else:
+                job["status"] = "failed"
+                job["error"] = error
+                for stage in job["stages"].values():
+                    if stage["status"] == "running":
+                        stage.update(status="failed", finished_at=now)
+
+    def status(self, job_id):
+        """返回任务状态（不含结果内容），任务不存在或已过期时返回None"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self.lock:
+            stages = []
+            for name, label in pipeline_stages:
+                stage = job["stages"][name]
+                elapsed = None
+                if stage["started_at"] is not None:
+                    end = stage["finished_at"] or time.time()
+                    elapsed = round(end - stage["started_at"], 3)
+                stages.append({"name": name, "label": label, "status": stage["status"], "elapsed": elapsed})
+            done_count = sum(1 for stage in stages if stage["status"] == "done")
+            return {
+                "job_id": job_id,
+                "status": job["status"],
+                "progress": round(done_count / len(stages), 3),
+                "stages": stages,
+                "error": job["error"],
+                "cached": job.get("cached", False),
+                "streaming": job.get("streaming", False),
+                "profile_id": job.get("profile_id"),
+                "created_at": job["created_at"],
+                "finished_at": job["finished_at"],
+            }
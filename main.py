@@ -1,16 +1,53 @@
 from fastapi import FastAPI, File, UploadFile, Request, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import StreamingResponse, HTMLResponse, Response
+from fastapi.responses import StreamingResponse, HTMLResponse, Response, FileResponse
 from fastapi.staticfiles import StaticFiles
 import pandas as pd
+import numpy as np
 import io
 import os
+import gzip
+import hmac
+import json
+import tempfile
+import time
 from datetime import datetime
 import re
+import asyncio
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+from jobs import JobStore, ProgressReporter
+from result_cache import ResultCache, content_digest, result_cache_key
+from frame_cache import FrameCache, pyarrow_available
+from clue_store import ClueStore
+from entity_resolution import resolve_entities
+from streaming import iter_excel_chunks, remove_files, spool_upload
+from instrumentation import PipelineMetrics, StageRecorder
+from profiling import new_profile_id, profile_path, profiled_call
+from cube import cube_cells, cube_dimensions, cube_payload, load_cube, merge_cube_cells, query_cube
+from summary_store import SummaryIndexCache, SummaryStore, range_columns, range_operators
+from mapping_config import MappingConfig, match_district_keyword
+from schema_detection import SchemaError, detect_schema
+from batch import (BatchInputError, PeriodGate, batch_statistics_frames, build_batch_zip, expand_batch_files,
+                   pair_batch_files)
+
+# 应用生命周期：退出时关闭处理任务执行器
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    shutdown_pipeline_executor()
+    shutdown_progress_queue()
 
 # 创建FastAPI应用
-app = FastAPI(title="劳动监察线索表格汇聚和统计工具")
+app = FastAPI(title="劳动监察线索表格汇聚和统计工具", lifespan=lifespan)
 
 # 添加中间件处理Vite客户端请求
 class ViteClientMiddleware(BaseHTTPMiddleware):
@@ -29,30 +66,18 @@ app.add_middleware(ViteClientMiddleware)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# 区域转换映射
-district_mapping = {
-    "长阳土家族自治县": "长阳县",
-    "五峰土家族自治县": "五峰县",
-    "宜都": "宜都市",
-    "当阳": "当阳市",
-    "枝江": "枝江市",
-    "点军": "点军区",
-    "高新": "高新区",
-    "西陵": "西陵区",
-    "猇亭": "猇亭区",
-    "兴山": "兴山县",
-    "长阳": "长阳县",
-    "秭归": "秭归县",
-    "五峰": "五峰县",
-    # 可以根据需要添加更多映射
-}
-
-# 有效区域列表
-valid_districts = ["宜都市", "枝江市", "当阳市", "远安县", "兴山县", "秭归县", "长阳县", "五峰县", "夷陵区", "西陵区", "伍家岗区", "点军区", "猇亭区", "高新区"]
+# 区域映射配置：区域别名映射、有效区域列表和专班包保人，文件修改后自动重新加载
+mapping_config = MappingConfig(
+    os.environ.get("MAPPING_CONFIG_PATH") or os.path.join("config", "mappings.json"),
+    check_interval=float(os.environ.get("MAPPING_CHECK_INTERVAL", 2)),
+)
 
 # 处理安薪在线数据中的区域格式
 def process_anxin_district(district_str):
     """从'宜昌市-伍家岗区-伍家乡'或'宜昌市-宜都市'格式提取区域名"""
+    if not isinstance(district_str, str):
+        return district_str
+    
     # 分割字符串并获取倒数第二部分（如果格式为'宜昌市-伍家岗区-伍家乡'）
     # 或者获取最后一部分（如果格式为'宜昌市-宜都市'）
     parts = district_str.split('-')
@@ -66,47 +91,245 @@ def process_anxin_district(district_str):
         district = district_str
     
     # 应用映射转换
-    if district in district_mapping:
-        return district_mapping[district]
+    mappings = mapping_config.tables
+    if district in mappings.district_mapping:
+        return mappings.district_mapping[district]
     
     # 确保返回的是有效区域，如果不是，尝试提取有效部分
-    for valid_district in valid_districts:
-        if valid_district in district:
-            return valid_district
+    valid_district = match_district_keyword(mappings.valid_district_matcher, district)
+    if valid_district is not None:
+        return valid_district
     
     return district
 
 # 处理12345数据中的区域格式
 def process_12345_district(district_str):
     """标准化12345数据中的区域名称"""
+    if not isinstance(district_str, str):
+        return district_str
+    
     # 应用映射转换
-    for key, value in district_mapping.items():
-        if key in district_str:
-            return value
+    mappings = mapping_config.tables
+    key = match_district_keyword(mappings.district_mapping_matcher, district_str)
+    if key is not None:
+        return mappings.district_mapping[key]
     
     # 确保返回的是有效区域，如果不是，尝试提取有效部分
-    for valid_district in valid_districts:
-        if valid_district in district_str:
-            return valid_district
+    valid_district = match_district_keyword(mappings.valid_district_matcher, district_str)
+    if valid_district is not None:
+        return valid_district
     
     return district_str
 
+# 整列标准化区域名称
+def normalize_district_column(series, resolver=process_12345_district):
+    """对区域列去重编码后，每个不同的原始值只解析一次，再按编码映射回整列
+    
+    resolver为单个值的解析函数（process_12345_district或process_anxin_district），
+    返回分类类型（category）的区域列，类别按首次出现的顺序排列
+    """
+    codes, uniques = pd.factorize(series)
+    resolved = [resolver(value) for value in uniques]
+    # 不同原始值可能解析为同一区域，再对解析结果编码一次
+    resolved_codes, categories = pd.factorize(pd.Series(resolved, dtype=object))
+    resolved_codes = np.append(resolved_codes, -1)
+    # 原始缺失值的编码为-1，对应追加在末尾的-1
+    return pd.Series(
+        pd.Categorical.from_codes(resolved_codes[codes], categories=categories),
+        index=series.index,
+    )
+
+def as_first_seen_categorical(series):
+    """将列转换为类别按首次出现顺序排列的分类类型"""
+    categories = series.dropna().unique()
+    return series.astype(pd.CategoricalDtype(categories=categories))
+
+# 12345数据需要的列
+required_columns_12345 = ["序号", "流水号", "紧急程度", "事件来源", "诉求人", "诉求人电话", 
+                          "诉求标题", "诉求内容", "所属区域", "所涉领域", "是否涉稳", 
+                          "所涉行业", "所涉项目（企业）", "项目性质", "是否在监管系统中", 
+                          "项目状态", "建设单位", "总包单位", "涉及人数", "涉及金额", "是否再次投诉"]
+
+# 安薪在线数据需要的列
+required_columns_anxin = ["项目名称", "行业", "建设单位", "施工单位", "项目经理", 
+                          "联系电话", "区域", "预警类型", "预警原因", "预警时间", 
+                          "状态", "预警天数"]
+
+# 读取时按文本处理的列，避免流水号、电话号码被解析为数值
+text_dtypes_12345 = {"流水号": str, "诉求人电话": str}
+text_dtypes_anxin = {"联系电话": str}
+
+# 汇总表的列类型：category（取值较少的枚举列）、text（自由文本）、integer（可空整数）
+# 两个数据源为对方补齐的空列也按此类型保存；未列出的列（涉及人数、涉及金额、预警时间）保持读取时的类型
+summary_schema = {
+    "紧急程度": "category",
+    "事件来源": "category",
+    "所属区域": "category",
+    "所涉领域": "category",
+    "是否涉稳": "category",
+    "所涉行业": "category",
+    "项目性质": "category",
+    "是否在监管系统中": "category",
+    "项目状态": "category",
+    "是否再次投诉": "category",
+    "预警类型": "category",
+    "状态": "category",
+    "流水号": "text",
+    "诉求人": "text",
+    "诉求人电话": "text",
+    "诉求标题": "text",
+    "诉求内容": "text",
+    "所涉项目（企业）": "text",
+    "建设单位": "text",
+    "总包单位": "text",
+    "施工单位": "text",
+    "项目经理": "text",
+    "联系电话": "text",
+    "预警原因": "text",
+    "序号": "integer",
+    "预警天数": "integer",
+}
+
+def summary_text_dtype():
+    """自由文本列的类型：安装pyarrow时为Arrow存储的字符串，否则为Python存储的字符串，缺失值均为NaN"""
+    storage = "pyarrow" if pyarrow_available() else "python"
+    try:
+        return pd.StringDtype(storage, na_value=np.nan)
+    except TypeError:
+        # pandas 2.3之前的StringDtype不支持na_value参数
+        return pd.StringDtype(storage)
+
+def as_nullable_integer(series):
+    """全部非空值都是整数时转换为Int64，否则（例如混有文本）保持原样"""
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype("Int64")
+    numeric = pd.to_numeric(series, errors="coerce")
+    if numeric.notna().sum() != series.notna().sum() or not (numeric.dropna() % 1 == 0).all():
+        return series
+    return numeric.astype("Int64")
+
+def apply_summary_schema(df):
+    """按summary_schema转换已有的列，已经是目标类型的列不再转换"""
+    text_dtype = summary_text_dtype()
+    for column, kind in summary_schema.items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == "category":
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = as_first_seen_categorical(series)
+        elif kind == "text":
+            if series.dtype != text_dtype:
+                df[column] = series.astype(text_dtype)
+        elif kind == "integer":
+            if series.dtype != "Int64":
+                df[column] = as_nullable_integer(series)
+    return df
+
+def align_categories(frames):
+    """合并前统一各数据框中分类列的类别（按出现的先后合并），concat后仍为分类类型"""
+    for column in frames[0].columns:
+        dtypes = [frame[column].dtype for frame in frames if column in frame.columns]
+        if len(dtypes) != len(frames) or not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        categories = list(dict.fromkeys(category for dtype in dtypes for category in dtype.categories))
+        dtype = pd.CategoricalDtype(categories=categories)
+        for frame in frames:
+            frame[column] = frame[column].cat.set_categories(categories).astype(dtype)
+    return frames
+
+def memory_report(df):
+    """各列（含内部缓存列）占用的内存字节数，按从大到小排列"""
+    usage = df.memory_usage(deep=True, index=False)
+    return {str(column): int(size) for column, size in usage.sort_values(ascending=False).items()}
+
+def frame_bytes(df):
+    """数据框占用的内存字节数"""
+    return int(df.memory_usage(deep=True).sum())
+
+def format_memory_report(report, top=5):
+    """生成“总计X MB（最大的列：...）”格式的日志文本"""
+    total = sum(report.values())
+    largest = "、".join(f"{column} {size / 1024 / 1024:.1f}MB" for column, size in list(report.items())[:top])
+    return f"总计{total / 1024 / 1024:.1f}MB（最大的列：{largest}）"
+
+# Excel读取引擎：auto（优先calamine，未安装时使用openpyxl只读模式）、calamine、openpyxl
+excel_read_engine = os.environ.get("EXCEL_READ_ENGINE", "auto")
+
+def calamine_available():
+    """是否安装了基于Rust的python-calamine读取引擎"""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def resolve_excel_engine(content, engine=None):
+    """根据配置和文件格式确定读取引擎"""
+    engine = engine or excel_read_engine
+    if engine in ("auto", "calamine"):
+        if calamine_available():
+            return "calamine"
+        if engine == "calamine":
+            print("未安装python-calamine，改用openpyxl读取")
+    # openpyxl只能读取xlsx（zip格式），.xls文件交给pandas默认引擎
+    if not content.startswith(b"PK"):
+        return None
+    return "openpyxl"
+
+def read_upload_excel(content, columns, dtypes=None, engine=None, schema=None):
+    """读取上传的Excel文件，只读取需要的列
+    
+    openpyxl引擎由pandas以read_only模式流式读取；缺失的列由后续处理函数补齐。
+    schema为detect_schema的结果，给出时从识别出的表头行读取，并把列名改为标准列名
+    """
+    engine = resolve_excel_engine(content, engine)
+    # 文件中的列名 -> 标准列名
+    names = {name: column for name, column in schema.columns.items() if column in columns} if schema \
+        else {column: column for column in columns}
+    actual = {column: name for name, column in names.items()}
+    df = pd.read_excel(
+        io.BytesIO(content),
+        engine=engine,
+        header=schema.header_row if schema else 0,
+        usecols=lambda name: name in names,
+        dtype={actual[column]: dtype for column, dtype in (dtypes or {}).items() if column in actual},
+    )
+    return df.rename(columns=names), engine
+
+# 只含空白的文本转换为空值
+def blank_text_to_na(df):
+    """只含空白字符（包括全角空格）的文本单元格转换为空值
+
+    calamine引擎把这样的单元格读取为空值，openpyxl引擎和流式读取读取为原文本；
+    统一转换后，同一文件无论用哪种方式读取，预警、线索的统计结果都相同
+    """
+    for column in df.columns:
+        series = df[column]
+        if series.dtype != object and not isinstance(series.dtype, pd.StringDtype):
+            continue
+        try:
+            # 非文本的值（数字、日期）strip后为空值，不会被转换
+            blank = series.str.strip().eq("").fillna(False).astype(bool)
+        except AttributeError:
+            # 没有文本值的object列
+            continue
+        if blank.any():
+            df[column] = series.mask(blank)
+    return df
+
 # 处理12345数据
 def process_12345_data(df):
     """处理12345数据并转换为汇总表格式"""
+    df = blank_text_to_na(df)
     # 确保必要的列存在
-    required_columns = ["序号", "流水号", "紧急程度", "事件来源", "诉求人", "诉求人电话", 
-                       "诉求标题", "诉求内容", "所属区域", "所涉领域", "是否涉稳", 
-                       "所涉行业", "所涉项目（企业）", "项目性质", "是否在监管系统中", 
-                       "项目状态", "建设单位", "总包单位", "涉及人数", "涉及金额", "是否再次投诉"]
-    
-    for col in required_columns:
+    for col in required_columns_12345:
         if col not in df.columns:
             # 如果列不存在，添加空列
             df[col] = pd.NA
     
     # 标准化所属区域
-    df['所属区域'] = df['所属区域'].apply(process_12345_district)
+    df['所属区域'] = normalize_district_column(df['所属区域'], process_12345_district)
     
     # 对于12345数据，需要添加安薪在线数据相关的空列
     anxin_columns = ["施工单位", "项目经理", "联系电话", "预警类型", "预警原因", 
@@ -115,17 +338,14 @@ def process_12345_data(df):
     for col in anxin_columns:
         df[col] = pd.NA
     
-    return df
+    return apply_summary_schema(df)
 
 # 处理安薪在线数据
 def process_anxin_data(df):
     """处理安薪在线数据并转换为汇总表格式"""
+    df = blank_text_to_na(df)
     # 确保必要的列存在
-    required_columns = ["项目名称", "行业", "建设单位", "施工单位", "项目经理", 
-                       "联系电话", "区域", "预警类型", "预警原因", "预警时间", 
-                       "状态", "预警天数"]
-    
-    for col in required_columns:
+    for col in required_columns_anxin:
         if col not in df.columns:
             # 如果列不存在，添加空列
             df[col] = pd.NA
@@ -142,7 +362,7 @@ def process_anxin_data(df):
     result_df['诉求人电话'] = pd.NA
     result_df['诉求标题'] = pd.NA
     result_df['诉求内容'] = pd.NA
-    result_df['所属区域'] = df['区域'].apply(process_anxin_district)  # 转换区域格式
+    result_df['所属区域'] = normalize_district_column(df['区域'], process_anxin_district).values  # 转换区域格式
     result_df['所涉领域'] = "建筑"  # 安薪在线数据的所涉领域固定为"建筑"
     result_df['是否涉稳'] = pd.NA
     result_df['所涉行业'] = df['行业']
@@ -164,7 +384,7 @@ def process_anxin_data(df):
     result_df['状态'] = df['状态']
     result_df['预警天数'] = df['预警天数']
     
-    return result_df
+    return apply_summary_schema(result_df)
 
 # 生成汇总表
 def generate_summary_table(df_12345, df_anxin):
@@ -173,113 +393,395 @@ def generate_summary_table(df_12345, df_anxin):
     processed_df_12345 = process_12345_data(df_12345)
     processed_df_anxin = process_anxin_data(df_anxin)
     
-    # 合并两个数据框
-    combined_df = pd.concat([processed_df_12345, processed_df_anxin], ignore_index=True)
+    return combine_summary_frames(processed_df_12345, processed_df_anxin)
+
+# 合并处理后的数据源
+def combine_summary_frames(processed_df_12345, processed_df_anxin):
+    """合并已处理（或从解析缓存读回）的两个数据源，生成汇总表"""
+    # 统一分类列的类别后合并两个数据框，合并结果仍为分类类型
+    frames = align_categories([apply_summary_schema(processed_df_12345), apply_summary_schema(processed_df_anxin)])
+    combined_df = pd.concat(frames, ignore_index=True)
     
     # 重新生成序号
     combined_df['序号'] = range(1, len(combined_df) + 1)
     
     return combined_df
 
-# 安全地将值转换为整数的辅助函数
-def safe_int_convert(value):
-    try:
-        # 检查是否为字符串，如果是则去除空格
-        if isinstance(value, str):
-            value = value.strip()
-            # 如果是空格或空字符串，返回0
-            if not value:
-                return 0
-        # 尝试转换为整数
-        return int(value)
-    except (ValueError, TypeError):
-        # 转换失败返回0
-        return 0
+# 解析缓存配置：处理后的数据源按文件哈希保存为Parquet文件，容量为0时不缓存
+frame_cache = FrameCache(
+    directory=os.environ.get("FRAME_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "jiancha-frame-cache"),
+    max_bytes=int(os.environ.get("FRAME_CACHE_MAX_BYTES", 1024 * 1024 * 1024)),
+)
+# 解析缓存格式版本，修改process_12345_data/process_anxin_data的输出时需要递增
+frame_cache_version = 4
 
-# 生成基本情况文本
-def generate_basic_info(summary_df, current_date):
-    """根据汇总表生成基本情况文本"""
-    # 准备数据
+# 线索库配置：SQLite文件路径，为空时不保存历史数据
+clue_store = ClueStore(os.environ.get("CLUE_STORE_PATH", os.path.join("data", "clues.db")))
+
+# 汇总表保留配置：每次处理的类型化汇总表保存为Parquet文件供查询接口读取，最多保留SUMMARY_STORE_MAX_FILES个，为0时不保留
+summary_store = SummaryStore(
+    directory=os.environ.get("SUMMARY_STORE_DIR") or os.path.join(tempfile.gettempdir(), "jiancha-summaries"),
+    max_files=int(os.environ.get("SUMMARY_STORE_MAX_FILES", 32)),
+)
+
+# 是否把名称相近的12345线索和安薪在线预警关联为同一项目（汇总表增加关联编号列）
+entity_resolution_enabled = os.environ.get("ENTITY_RESOLUTION", "1") != "0"
+
+# 数据源：名称 -> (读取的列, 文本列类型, 处理函数)
+source_readers = {
+    "12345": (required_columns_12345, text_dtypes_12345, process_12345_data),
+    "安薪": (required_columns_anxin, text_dtypes_anxin, process_anxin_data),
+}
+# 缺少时拒绝处理的列（区域、领域等统计依据），其余列缺少时按空值处理并提示
+critical_columns = {
+    "12345": ["所属区域", "所涉领域", "事件来源"],
+    "安薪": ["项目名称", "区域"],
+}
+
+# 识别数据源的表头
+def detect_source_schema(source_input, source):
+    """只读取文件（内容或路径）的前几行，识别表头行并对应列名，缺少关键列时抛出SchemaError"""
+    schema = detect_schema(source_input, source_readers[source][0], critical_columns[source], f"{source}文件")
+    print(f"{source}文件表头识别完成（{schema.elapsed * 1000:.1f}ms），表头在第{schema.header_row + 1}行")
+    for warning in schema.warnings:
+        print(f"表头提示: {warning}")
+    return schema
+
+# 读取并处理一个数据源
+def read_source_frame(content, source):
+    """返回(处理后的数据框, 表头识别结果)，文件内容和映射表未变化时直接读取解析缓存"""
+    columns, dtypes, process = source_readers[source]
+    schema = detect_source_schema(content, source)
+    key = frame_cache.key(content, source, f"{mapping_config.tables.version}:{frame_cache_version}")
+    processed_df = frame_cache.load(key)
+    if processed_df is not None:
+        print(f"{source}文件解析缓存命中，行数: {len(processed_df)}")
+        return processed_df, schema
+    
+    # 只解析需要的列
+    df, engine = read_upload_excel(content, columns, dtypes, schema=schema)
+    print(f"成功读取{source}文件（{engine or '默认'}引擎），行数: {len(df)}, 列数: {len(df.columns)}")
+    processed_df = process(df)
+    if frame_cache.store(key, processed_df):
+        print(f"{source}文件已写入解析缓存")
+    return processed_df, schema
+
+# 数值列及其类型化缓存列（以下划线开头的列不写入导出的汇总表）
+numeric_cache_columns = {
+    '涉及人数': '_涉及人数',
+    '涉及金额': '_涉及金额',
+}
+
+# 全角数字、符号到半角的转换表
+fullwidth_number_table = str.maketrans('０１２３４５６７８９．，－＋', '0123456789.,-+')
+
+def parse_numeric_column(series):
+    """整列解析为数值，兼容前后空白、全角数字和千分位逗号，无法解析的值为NaN"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    text = (series.astype('string')
+            .str.translate(fullwidth_number_table)
+            .str.strip()
+            .str.replace(',', '', regex=False))
+    numeric = pd.to_numeric(text, errors='coerce').astype('float64')
+    # 排除inf等非有限值
+    return numeric.where(np.isfinite(numeric))
+
+def normalize_numeric_columns(summary_df):
+    """一次性解析涉及人数、涉及金额，写入类型化缓存列
+    
+    涉及人数解析为可空整数（Int64，小数截断取整），涉及金额解析为float64
+    """
+    people = parse_numeric_column(summary_df['涉及人数'])
+    summary_df[numeric_cache_columns['涉及人数']] = np.trunc(people).astype('Int64')
+    summary_df[numeric_cache_columns['涉及金额']] = parse_numeric_column(summary_df['涉及金额'])
+    return summary_df
+
+def numeric_column(df, column):
+    """读取数值列的类型化缓存，缺失值按0处理；未经过normalize_numeric_columns时现场解析"""
+    cache_column = numeric_cache_columns[column]
+    if cache_column in df.columns:
+        values = df[cache_column]
+    else:
+        values = parse_numeric_column(df[column])
+        if column == '涉及人数':
+            values = np.trunc(values).astype('Int64')
+    if column == '涉及人数':
+        return values.fillna(0).astype('int64')
+    return values.fillna(0.0).astype('float64')
+
+# 数据立方体的单元格
+def summary_cube_cells(summary_df):
+    """按立方体各维度分组统计汇总表（或流式处理中的一批行）的条数、涉及人数和涉及金额"""
+    return cube_cells(summary_df, numeric_column(summary_df, '涉及人数'), numeric_column(summary_df, '涉及金额'))
+
+def summary_export_columns(summary_df):
+    """汇总表中需要导出的列（排除以下划线开头的内部缓存列）"""
+    return [column for column in summary_df.columns if not str(column).startswith('_')]
+
+def format_amount_column(amount):
+    """整列格式化金额：整数金额不带小数位，其余保留原始小数"""
+    integral = amount == amount.round()
+    as_int = amount.where(integral, 0).astype('int64').astype(str)
+    return as_int.where(integral, amount.astype(str))
+
+# 整列格式化辅助函数，避免逐行iterrows和字符串累加
+def format_text_column(series, default="", skip_blank=False):
+    """整列转换为文本，空值（skip_blank时包括空白文本）替换为默认值"""
+    text = series.astype('string')
+    missing = text.isna()
+    if skip_blank:
+        missing = missing | text.str.strip().eq('').fillna(True)
+    return text.mask(missing, default).astype(object)
+
+def format_arrears_entries(df, warning_entry):
+    """整列拼接每条记录的欠薪点位文本
+    
+    warning_entry为True的记录输出"项目因原因预警；"，其余输出"项目（人数人金额元）；"
+    """
+    project = format_text_column(df['所涉项目（企业）']).astype(str)
+    reason = format_text_column(df['预警原因']).astype(str)
+    people = numeric_column(df, '涉及人数').astype(str)
+    amount = format_amount_column(numeric_column(df, '涉及金额'))
+    arrears_entry = project.str.cat([pd.Series("（", index=df.index), people, pd.Series("人", index=df.index),
+                                     amount, pd.Series("元）；", index=df.index)])
+    warning_text = project.str.cat([pd.Series("因", index=df.index), reason, pd.Series("预警；", index=df.index)])
+    return arrears_entry.where(~warning_entry, warning_text)
+
+def build_scatter_records(df):
+    """生成散点图数据（涉及人数或金额大于0的记录），并返回人数、金额平均值"""
+    people = numeric_column(df, '涉及人数')
+    amount = numeric_column(df, '涉及金额')
+    mask = (people > 0) | (amount > 0)
+    scatter_df = pd.DataFrame({
+        'id': df.index + 1,
+        'people': people,
+        'amount': amount
+    }, index=df.index)[mask]
+    
+    if scatter_df.empty:
+        return [], 0, 0
+    
+    people_avg = scatter_df['people'].sum() / len(scatter_df)
+    amount_avg = scatter_df['amount'].sum() / len(scatter_df)
+    return scatter_df.to_dict('records'), people_avg, amount_avg
+
+def build_large_project_records(df):
+    """生成涉及人数较多项目的明细记录，空值显示为--"""
+    project_df = pd.DataFrame({
+        'project_name': format_text_column(df['所涉项目（企业）'], '--', skip_blank=True),
+        'district': format_text_column(df['所属区域'], '--', skip_blank=True),
+        'industry': format_text_column(df['所涉行业'], '--', skip_blank=True),
+        'people_count': numeric_column(df, '涉及人数'),
+        'amount': numeric_column(df, '涉及金额'),
+        'applicant': format_text_column(df['诉求人'], '--', skip_blank=True),
+        'content': format_text_column(df['诉求内容'], '--', skip_blank=True)
+    }, index=df.index)
+    return project_df.to_dict('records')
+
+# 基本情况和数据看板的计数辅助函数
+def value_counts_dict(series):
+    """按首次出现的顺序统计各值的数量，不含空值和计数为0的类别"""
+    counts = series.value_counts(sort=False)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # 分类类型按类别顺序返回，改为按在本列（或子集）中首次出现的顺序，与文本列一致
+        codes = series.cat.codes.to_numpy()
+        counts = counts.reindex(series.cat.categories[pd.unique(codes[codes >= 0])])
+    return {key: int(count) for key, count in counts.items() if count > 0}
+
+def merge_counts(total, part):
+    """把part中的计数累加到total，新出现的值追加在末尾"""
+    for key, count in part.items():
+        total[key] = total.get(key, 0) + count
+
+def sorted_counts(counts):
+    """按数量从多到少排序，数量相同时保持首次出现的顺序（与value_counts一致）"""
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+def field_counts(data):
+    """统计一个领域（建设或非建）的线索数量、分布、人数金额和明细"""
+    people = numeric_column(data, '涉及人数')
+    scatter_records, _, _ = build_scatter_records(data)
+    return {
+        'count': len(data),
+        'industry_counts': value_counts_dict(data['所涉行业']),
+        'district_counts': value_counts_dict(data['所属区域']),
+        'event_source_counts': value_counts_dict(data['事件来源']),
+        'renshu': int(people.sum()),
+        'jine': float(numeric_column(data, '涉及金额').sum()),
+        'scatter_data': scatter_records,
+        'scatter_people_sum': sum(record['people'] for record in scatter_records),
+        'scatter_amount_sum': float(pd.Series([record['amount'] for record in scatter_records], dtype='float64').sum()),
+    }
+
+# 统计基本情况所需的计数
+def basic_info_counts(summary_df):
+    """统计汇总表（或流式处理中的一批行）的基本情况计数
+    
+    返回的计数可以用merge_basic_info_counts逐批累加，再由format_basic_info生成基本情况文本和数据看板数据
+    """
     # 1. 线索数量相关统计
     non_anxin_data = summary_df[summary_df['事件来源'] != '安薪在线']
     anxin_data = summary_df[summary_df['事件来源'] == '安薪在线']
     
+    # 2. 建设领域、非建领域
+    construction_data = non_anxin_data[non_anxin_data['所涉领域'] == '建筑']
+    non_construction_data = non_anxin_data[non_anxin_data['所涉领域'] == '非建']
+    
+    # 项目性质统计
+    government = construction_data['项目性质'].str.contains('政府', na=False)
+    state_owned = construction_data['项目性质'].str.contains('国企', na=False)
+    other = ~construction_data['项目性质'].str.contains('政府|国企', na=False)
+    
+    jianshe = field_counts(construction_data)
+    jianshe['project_nature_counts'] = value_counts_dict(construction_data['项目性质'])
+    jianshe['government_count'] = int(government.sum())
+    jianshe['state_owned_count'] = int(state_owned.sum())
+    jianshe['other_count'] = int(other.sum())
+    # 建筑类涉及人数较多的项目数据（涉及人数>=3）
+    jianshe['large_projects'] = build_large_project_records(
+        construction_data[numeric_column(construction_data, '涉及人数') >= 3])
+    
+    feijian = field_counts(non_construction_data)
+    # 非建类涉及人数较多的项目数据（涉及人数>3）
+    feijian['large_projects'] = build_large_project_records(
+        non_construction_data[numeric_column(non_construction_data, '涉及人数') > 3])
+    
+    return {
+        'xiansuo_count': len(non_anxin_data),
+        'event_source_counts': value_counts_dict(non_anxin_data['事件来源']),
+        'xiansuo_bupingtai_count': int((non_anxin_data['事件来源'] == '部平台').sum()),
+        'xiansuo_12345_count': int(non_anxin_data['事件来源'].str.startswith('12345/').fillna(False).astype(bool).sum()),
+        'phone_counts': value_counts_dict(non_anxin_data['诉求人电话']),
+        'project_counts': value_counts_dict(non_anxin_data['所涉项目（企业）']),
+        'zaicitousu_count': int(non_anxin_data['是否再次投诉'].str.contains('是', na=False, regex=False).sum()),
+        'district_counts': value_counts_dict(non_anxin_data['所属区域']),
+        'jianshe': jianshe,
+        'feijian': feijian,
+        'anxin': {
+            'count': len(anxin_data),
+            'warning_types': value_counts_dict(anxin_data['预警类型']),
+            'district_counts': value_counts_dict(anxin_data['所属区域']),
+            'construction_units': set(anxin_data['建设单位'].dropna().unique()),
+            'projects': set(anxin_data['所涉项目（企业）'].dropna().unique()),
+            'industry_counts': value_counts_dict(anxin_data['所涉行业']),
+            'status_counts': value_counts_dict(anxin_data['状态']),
+        },
+    }
+
+def merge_basic_info_counts(total, part):
+    """把一批行的计数累加到total（就地修改并返回total），total为None时直接返回part"""
+    if total is None:
+        return part
+    for key, value in part.items():
+        if key in ('jianshe', 'feijian', 'anxin'):
+            merge_basic_info_counts(total[key], value)
+        elif isinstance(value, dict):
+            merge_counts(total[key], value)
+        elif isinstance(value, set):
+            total[key] |= value
+        elif isinstance(value, list):
+            total[key].extend(value)
+        else:
+            total[key] += value
+    return total
+
+# 与上一期比较的变化
+def format_period_delta(current, previous):
+    """生成“减少N条”“增加N条”或“持平”"""
+    delta = int(current) - int(previous)
+    if delta < 0:
+        return f"减少{-delta}条"
+    if delta > 0:
+        return f"增加{delta}条"
+    return "持平"
+
+# 生成基本情况文本
+def generate_basic_info(summary_df, current_date, previous_counts=None):
+    """根据汇总表生成基本情况文本
+    
+    previous_counts为线索库中上一期的线索数量，为None时与上一期的比较留待手工填写
+    """
+    return format_basic_info(basic_info_counts(summary_df), current_date, previous_counts)
+
+def format_basic_info(counts, current_date, previous_counts=None):
+    """根据basic_info_counts统计（或逐批累加）的计数生成基本情况文本和数据看板数据"""
     # 1.1 日期格式化为YYYY年MM月DD日
     datetime_str = f"{current_date[:4]}年{current_date[4:6]}月{current_date[6:]}日"
     
     # 1.2 总线索数量
-    xiansuo_count = len(non_anxin_data)
+    xiansuo_count = counts['xiansuo_count']
     
     # 1.3 统计所有事件来源的数量
-    event_source_counts = non_anxin_data['事件来源'].value_counts()
+    event_source_counts = sorted_counts(counts['event_source_counts'])
     
     # 1.4 部平台线索数量
-    xiansuo_bupingtai_count = len(non_anxin_data[non_anxin_data['事件来源'] == '部平台'])
+    xiansuo_bupingtai_count = counts['xiansuo_bupingtai_count']
     
     # 1.5 12345热线线索数量
-    xiansuo_12345_count = len(non_anxin_data[non_anxin_data['事件来源'].str.startswith('12345/')])
+    xiansuo_12345_count = counts['xiansuo_12345_count']
     
     # 1.5 一人多诉统计
-    phone_counts = non_anxin_data['诉求人电话'].value_counts()
-    yirenduosu_count = len(phone_counts[phone_counts >= 3])
+    yirenduosu_count = sum(1 for count in counts['phone_counts'].values() if count >= 3)
     yirenduosu = f"{yirenduosu_count}条" if yirenduosu_count > 0 else "无"
     
     # 1.6 多人一诉统计
-    project_counts = non_anxin_data['所涉项目（企业）'].value_counts()
-    duorenyisu_count = len(project_counts[project_counts >= 3])
+    duorenyisu_count = sum(1 for count in counts['project_counts'].values() if count >= 3)
     duorenyisu = f"{duorenyisu_count}条" if duorenyisu_count > 0 else "无"
     
-    # 1.7 再次投诉统计
-    # 查找“是否再次投诉”字段值为“是”的数据
-    zaicitousu_count = len(non_anxin_data[non_anxin_data['是否再次投诉'].str.contains('是', na=False)])
+    # 1.7 再次投诉统计（“是否再次投诉”字段包含“是”的数据）
+    zaicitousu_count = counts['zaicitousu_count']
     
     # 1.8 线索数量前三的地区
-    full_district_counts = non_anxin_data['所属区域'].value_counts()
-    district_counts_top3 = full_district_counts.head(3)
-    xiansuo_count_top3 = "、".join([f"{district}{count}条" for district, count in district_counts_top3.items()])
+    full_district_counts = sorted_counts(counts['district_counts'])
+    xiansuo_count_top3 = "、".join([f"{district}{count}条" for district, count in list(full_district_counts.items())[:3]])
+    
+    # 1.9 与上一期比较
+    if previous_counts is None:
+        period_delta = "较上一期减少[手工填写]条（部平台减少[手工填写]条）"
+    else:
+        period_delta = (f"较上一期{format_period_delta(xiansuo_count, previous_counts['xiansuo_count'])}"
+                        f"（部平台{format_period_delta(xiansuo_bupingtai_count, previous_counts['xiansuo_bupingtai_count'])}）")
     
     # 第一段文字
-    text1 = f"1.线索数量。{datetime_str}，全市共收到欠薪线索{xiansuo_count}条（部平台{xiansuo_bupingtai_count}条、12345热线{xiansuo_12345_count}条），较上一期减少[手工填写]条（部平台减少[手工填写]条）。一人多诉{yirenduosu}，多人一诉{duorenyisu}，再次投诉{zaicitousu_count}条。线索数量前三的地方为：{xiansuo_count_top3}。"
+    text1 = f"1.线索数量。{datetime_str}，全市共收到欠薪线索{xiansuo_count}条（部平台{xiansuo_bupingtai_count}条、12345热线{xiansuo_12345_count}条），{period_delta}。一人多诉{yirenduosu}，多人一诉{duorenyisu}，再次投诉{zaicitousu_count}条。线索数量前三的地方为：{xiansuo_count_top3}。"
     
     # 2. 建设领域欠薪线索情况
-    construction_data = non_anxin_data[non_anxin_data['所涉领域'] == '建筑']
-    jianshe_project_count = len(construction_data)
+    jianshe = counts['jianshe']
+    jianshe_project_count = jianshe['count']
     
     # 2.2 建设领域行业分布
-    industry_counts = construction_data['所涉行业'].value_counts()
+    industry_counts = sorted_counts(jianshe['industry_counts'])
     jianshe_suoshe_hangye = "其中" + "、".join([f"{industry}{count}条" for industry, count in industry_counts.items()])
     
     # 2.3 建设领域项目性质统计
-    government_count = len(construction_data[construction_data['项目性质'].str.contains('政府', na=False)])
-    state_owned_count = len(construction_data[construction_data['项目性质'].str.contains('国企', na=False)])
-    other_count = len(construction_data[~construction_data['项目性质'].str.contains('政府|国企', na=False)])
+    government_count = jianshe['government_count']
+    state_owned_count = jianshe['state_owned_count']
+    other_count = jianshe['other_count']
     jianshe_project_xingzhi = f"涉及政府项目{government_count}个、国企项目{state_owned_count}个、其他商建项目{other_count}个"
     
     # 2.4 建设领域涉及人数
-    jianshe_renshu = construction_data['涉及人数'].apply(safe_int_convert).sum()
+    jianshe_renshu = jianshe['renshu']
     
     # 2.5 建设领域涉及金额（万元）
-    jianshe_jine = round(construction_data['涉及金额'].apply(safe_int_convert).sum() / 10000, 2)
+    jianshe_jine = round(jianshe['jine'] / 10000, 2)
     
     # 第二段文字
     text2 = f"2.建设领域欠薪线索情况。建设领域{jianshe_project_count}条。({jianshe_suoshe_hangye}，{jianshe_project_xingzhi}），涉及{jianshe_renshu}人、{jianshe_jine}万元。"
     
     # 3. 非建领域欠薪线索情况
-    non_construction_data = non_anxin_data[non_anxin_data['所涉领域'] == '非建']
-    feijian_project_count = len(non_construction_data)
+    feijian = counts['feijian']
+    feijian_project_count = feijian['count']
     
     # 3.2 非建领域行业分布
-    feijian_industry_counts = non_construction_data['所涉行业'].value_counts()
+    feijian_industry_counts = sorted_counts(feijian['industry_counts'])
     feijian_suoshe_hangye = "其中" + "、".join([f"{industry}{count}条" for industry, count in feijian_industry_counts.items()])
     
-    # 转换为前端可用的格式
-    feijian_industry_data = {industry: count for industry, count in feijian_industry_counts.items()}
-    
     # 3.3 非建领域涉及人数
-    feijian_renshu = non_construction_data['涉及人数'].apply(safe_int_convert).sum()
+    feijian_renshu = feijian['renshu']
     
     # 3.4 非建领域涉及金额（万元）
-    feijian_jine = round(non_construction_data['涉及金额'].apply(safe_int_convert).sum() / 10000, 2)
+    feijian_jine = round(feijian['jine'] / 10000, 2)
     
     # 第三段文字
     text3 = f"3.非建领域欠薪线索情况。非建领域{feijian_project_count}条。（{feijian_suoshe_hangye}），涉及{feijian_renshu}人、{feijian_jine}万元。"
@@ -288,10 +790,11 @@ def generate_basic_info(summary_df, current_date):
     text4 = "4.涉稳情况。舆情[手工填写]条。[手工填写]"
     
     # 5. 预警情况
-    axzx_yvjing_count = len(anxin_data)
+    anxin = counts['anxin']
+    axzx_yvjing_count = anxin['count']
     
     # 5.2 预警类型统计
-    warning_types = anxin_data['预警类型'].value_counts()
+    warning_types = sorted_counts(anxin['warning_types'])
     axzx_yvjing_leixing = "其中" + "；".join([f"{warning}{count}条" for warning, count in warning_types.items()])
     
     # 第五段文字
@@ -300,118 +803,21 @@ def generate_basic_info(summary_df, current_date):
     # 合并所有文字，用换行符分隔
     basic_info = "\n".join([text1, text2, text3, text4, text5])
     
-    # 按县市区统计建设领域线索数量
-    jianshe_district_counts = construction_data['所属区域'].value_counts()
-    
-    # 按县市区统计非建领域线索数量
-    feijian_district_counts = non_construction_data['所属区域'].value_counts()
-    
-    # 按县市区统计预警信息数量
-    warning_district_counts = anxin_data['所属区域'].value_counts()
-    
-    # 建筑类其他维度分析数据
-    # 1. 事件来源统计（排除安薪在线）
-    jianshe_event_source_counts = construction_data['事件来源'].value_counts()
-    
-    # 2. 所涉行业统计（排除安薪在线）
-    jianshe_industry_counts = construction_data['所涉行业'].value_counts()
-    
-    # 3. 项目性质统计
-    jianshe_project_nature_counts = construction_data['项目性质'].value_counts()
-    
-    # 4. 涉及人数金额数据（用于散点图）
-    jianshe_scatter_data = []
-    for idx, row in construction_data.iterrows():
-        people = safe_int_convert(row['涉及人数'])
-        amount = safe_int_convert(row['涉及金额'])
-        if people > 0 or amount > 0:
-            jianshe_scatter_data.append({
-                'id': idx + 1,
-                'people': people,
-                'amount': amount
-            })
-    
-    # 计算人数和金额的平均值
-    jianshe_people_avg = sum(item['people'] for item in jianshe_scatter_data) / len(jianshe_scatter_data) if jianshe_scatter_data else 0
-    jianshe_amount_avg = sum(item['amount'] for item in jianshe_scatter_data) / len(jianshe_scatter_data) if jianshe_scatter_data else 0
-    
-    # 非建类其他维度分析数据
-    # 1. 事件来源统计
-    feijian_event_source_counts = non_construction_data['事件来源'].value_counts()
-    
-    # 2. 所涉行业统计（已存在，使用feijian_industry_counts）
-    
-    # 3. 涉及人数金额数据（用于散点图）
-    feijian_scatter_data = []
-    for idx, row in non_construction_data.iterrows():
-        people = safe_int_convert(row['涉及人数'])
-        amount = safe_int_convert(row['涉及金额'])
-        if people > 0 or amount > 0:
-            feijian_scatter_data.append({
-                'id': idx + 1,
-                'people': people,
-                'amount': amount
-            })
-    
-    # 计算人数和金额的平均值
-    feijian_people_avg = sum(item['people'] for item in feijian_scatter_data) / len(feijian_scatter_data) if feijian_scatter_data else 0
-    feijian_amount_avg = sum(item['amount'] for item in feijian_scatter_data) / len(feijian_scatter_data) if feijian_scatter_data else 0
-    
-    # 建筑类涉及人数较多的项目数据（涉及人数>3）
-    jianshe_large_projects = construction_data[construction_data['涉及人数'].apply(safe_int_convert) >= 3].copy()
-    jianshe_large_projects_list = []
-    
-    # 提取所需字段并处理空值
-    for _, row in jianshe_large_projects.iterrows():
-        project_data = {
-            'project_name': str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) and str(row['所涉项目（企业）']).strip() else '--',
-            'district': str(row['所属区域']) if pd.notna(row['所属区域']) and str(row['所属区域']).strip() else '--',
-            'industry': str(row['所涉行业']) if pd.notna(row['所涉行业']) and str(row['所涉行业']).strip() else '--',
-            'people_count': int(safe_int_convert(row['涉及人数'])),
-            'amount': float(safe_int_convert(row['涉及金额'])),
-            'applicant': str(row['诉求人']) if pd.notna(row['诉求人']) and str(row['诉求人']).strip() else '--',
-            'content': str(row['诉求内容']) if pd.notna(row['诉求内容']) and str(row['诉求内容']).strip() else '--'
-        }
-        jianshe_large_projects_list.append(project_data)
-    
-    # 非建类涉及人数较多的项目数据（涉及人数>3）
-    feijian_large_projects = non_construction_data[non_construction_data['涉及人数'].apply(safe_int_convert) > 3].copy()
-    feijian_large_projects_list = []
-    
-    # 提取所需字段并处理空值
-    for _, row in feijian_large_projects.iterrows():
-        project_data = {
-            'project_name': str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) and str(row['所涉项目（企业）']).strip() else '--',
-            'district': str(row['所属区域']) if pd.notna(row['所属区域']) and str(row['所属区域']).strip() else '--',
-            'industry': str(row['所涉行业']) if pd.notna(row['所涉行业']) and str(row['所涉行业']).strip() else '--',
-            'people_count': int(safe_int_convert(row['涉及人数'])),
-            'amount': float(safe_int_convert(row['涉及金额'])),
-            'applicant': str(row['诉求人']) if pd.notna(row['诉求人']) and str(row['诉求人']).strip() else '--',
-            'content': str(row['诉求内容']) if pd.notna(row['诉求内容']) and str(row['诉求内容']).strip() else '--'
-        }
-        feijian_large_projects_list.append(project_data)
+    # 散点图中人数和金额的平均值
+    def scatter_averages(field):
+        if not field['scatter_data']:
+            return 0, 0
+        return field['scatter_people_sum'] / len(field['scatter_data']), field['scatter_amount_sum'] / len(field['scatter_data'])
+    jianshe_people_avg, jianshe_amount_avg = scatter_averages(jianshe)
+    feijian_people_avg, feijian_amount_avg = scatter_averages(feijian)
     
     # 准备所有县市区列表，确保所有分类都有完整的县市区数据
-    all_districts = set(full_district_counts.index)
+    all_districts = list(full_district_counts)
     
-    # 预警类统计数据
-    # 1. 预警类案件总数（事件来源为"安薪在线"的数据数量）
-    warning_case_total = len(anxin_data)
-    
-    # 2. 涉及建设单位（统计建设单位字段中出现的唯一值数量）
-    unique_construction_units = anxin_data['建设单位'].dropna().nunique()
-    
-    # 3. 所涉项目/企业（统计所涉项目（企业）字段中出现的唯一值数量）
-    unique_projects = anxin_data['所涉项目（企业）'].dropna().nunique()
-    
-    # 4. 所涉行业统计
-    warning_industry_counts = anxin_data['所涉行业'].value_counts()
-    
-    # 5. 预警类型统计（已存在）
-    # warning_types 已定义
-    
-    # 6. 状态统计
-    warning_status_counts = anxin_data['状态'].value_counts()
+    # 按县市区统计建设领域、非建领域线索数量和预警信息数量
+    jianshe_district_counts = jianshe['district_counts']
+    feijian_district_counts = feijian['district_counts']
+    warning_district_counts = anxin['district_counts']
     
     # 准备数据看板数据，确保所有数值都是Python原生类型
     dashboard_data = {
@@ -420,6 +826,7 @@ def generate_basic_info(summary_df, current_date):
         'xiansuo_count': int(xiansuo_count),
         'xiansuo_bupingtai_count': int(xiansuo_bupingtai_count),
         'xiansuo_12345_count': int(xiansuo_12345_count),
+        'previous_period': previous_counts['period'] if previous_counts else None,
         'yirenduosu': yirenduosu,
         'duorenyisu': duorenyisu,
         'zaicitousu_count': int(zaicitousu_count),
@@ -430,50 +837,115 @@ def generate_basic_info(summary_df, current_date):
         'feijian_project_count': int(feijian_project_count),
         'feijian_renshu': int(feijian_renshu),
         'feijian_jine': float(feijian_jine),
-        'feijian_industry_data': feijian_industry_data,
+        'feijian_industry_data': feijian_industry_counts,
         'axzx_yvjing_count': int(axzx_yvjing_count),
         # 预警类统计数据
-        'warning_case_total': int(warning_case_total),
-        'unique_construction_units': int(unique_construction_units),
-        'unique_projects': int(unique_projects),
-        'warning_industry_counts': {k: int(v) for k, v in warning_industry_counts.to_dict().items()},
-        'warning_status_counts': {k: int(v) for k, v in warning_status_counts.to_dict().items()},
-        # 将Series.to_dict()的结果转换为Python原生类型的字典
-        'district_counts': {k: int(v) for k, v in full_district_counts.to_dict().items()},
-        'jianshe_district_counts': {k: int(jianshe_district_counts[k]) if k in jianshe_district_counts else 0 for k in all_districts},
-        'feijian_district_counts': {k: int(feijian_district_counts[k]) if k in feijian_district_counts else 0 for k in all_districts},
-        'warning_district_counts': {k: int(warning_district_counts[k]) if k in warning_district_counts else 0 for k in all_districts},
-        'industry_counts': {k: int(v) for k, v in industry_counts.to_dict().items()},
-        'feijian_industry_counts': {k: int(v) for k, v in feijian_industry_counts.to_dict().items()},
-        'warning_types': {k: int(v) for k, v in warning_types.to_dict().items()},
+        'warning_case_total': int(axzx_yvjing_count),
+        # 涉及建设单位、所涉项目/企业的唯一值数量
+        'unique_construction_units': len(anxin['construction_units']),
+        'unique_projects': len(anxin['projects']),
+        'warning_industry_counts': sorted_counts(anxin['industry_counts']),
+        'warning_status_counts': sorted_counts(anxin['status_counts']),
+        'district_counts': full_district_counts,
+        'jianshe_district_counts': {k: jianshe_district_counts.get(k, 0) for k in all_districts},
+        'feijian_district_counts': {k: feijian_district_counts.get(k, 0) for k in all_districts},
+        'warning_district_counts': {k: warning_district_counts.get(k, 0) for k in all_districts},
+        'industry_counts': industry_counts,
+        'feijian_industry_counts': feijian_industry_counts,
+        'warning_types': warning_types,
         'project_nature_counts': {
             '政府项目': int(government_count),
             '国企项目': int(state_owned_count),
             '其他商建项目': int(other_count)
         },
-        'event_source_counts': {k: int(v) for k, v in event_source_counts.to_dict().items()},
+        'event_source_counts': event_source_counts,
         # 建筑类其他维度分析数据
-        'jianshe_event_source_counts': {k: int(v) for k, v in jianshe_event_source_counts.to_dict().items()},
-        'jianshe_industry_counts': {k: int(v) for k, v in jianshe_industry_counts.to_dict().items()},
-        'jianshe_project_nature_counts': {k: int(v) for k, v in jianshe_project_nature_counts.to_dict().items()},
-        'jianshe_scatter_data': jianshe_scatter_data,
+        'jianshe_event_source_counts': sorted_counts(jianshe['event_source_counts']),
+        'jianshe_industry_counts': industry_counts,
+        'jianshe_project_nature_counts': sorted_counts(jianshe['project_nature_counts']),
+        'jianshe_scatter_data': jianshe['scatter_data'],
         'jianshe_people_avg': float(jianshe_people_avg),
         'jianshe_amount_avg': float(jianshe_amount_avg),
         # 非建类其他维度分析数据
-        'feijian_event_source_counts': {k: int(v) for k, v in feijian_event_source_counts.to_dict().items()},
-        'feijian_scatter_data': feijian_scatter_data,
+        'feijian_event_source_counts': sorted_counts(feijian['event_source_counts']),
+        'feijian_scatter_data': feijian['scatter_data'],
         'feijian_people_avg': float(feijian_people_avg),
         'feijian_amount_avg': float(feijian_amount_avg),
         # 涉及人数较多的项目数据
-        'jianshe_large_projects': jianshe_large_projects_list,
-        'feijian_large_projects': feijian_large_projects_list
+        'jianshe_large_projects': jianshe['large_projects'],
+        'feijian_large_projects': feijian['large_projects']
     }
     
     return basic_info, dashboard_data
 
+# 统计表聚合引擎
+def district_statistic_parts(summary_df):
+    """在预先计算的布尔列上按区域、领域和是否预警一次分组，统计线索数量、预警数量和欠薪点位
+    
+    返回以(区域, 是否建设领域)为键、[线索数量, 预警数量, 无预警记录的欠薪点位, 预警记录的欠薪点位]为值的字典，
+    流式处理时可以用merge_district_statistics逐批累加
+    """
+    warning_type = summary_df['预警类型']
+    has_warning = warning_type.notna()
+    # 预警类型为空值或空白字符串的记录计为线索
+    blank_warning = warning_type.astype('string').str.strip().eq('').fillna(False).astype(bool)
+    is_construction = summary_df['所涉领域'].eq('建筑').fillna(False).astype(bool)
+    # 建设领域中有预警的记录按预警格式输出，排在无预警记录之后
+    warning_entry = is_construction & has_warning
+    
+    # 整列拼接每条记录的欠薪点位文本
+    entry = format_arrears_entries(summary_df, warning_entry)
+    
+    grouped_df = pd.DataFrame({
+        '区域': summary_df['所属区域'],
+        '建设': is_construction,
+        '预警': warning_entry,
+        '线索': ~has_warning | blank_warning,
+        '欠薪点位': entry,
+    })
+    
+    aggregated = grouped_df.groupby(['区域', '建设', '预警'], sort=False, observed=True).agg(
+        线索=('线索', 'sum'),
+        数量=('线索', 'size'),
+        欠薪点位=('欠薪点位', "".join),
+    )
+    
+    parts = {}
+    for (district, construction, warning), row in zip(aggregated.index, aggregated.itertuples(index=False)):
+        part = parts.setdefault((district, construction), [0, 0, "", ""])
+        part[0] += int(row.线索)
+        if warning:
+            part[1] += int(row.数量)
+            part[3] += row.欠薪点位
+        else:
+            part[2] += row.欠薪点位
+    return parts
+
+def merge_district_statistics(total, part):
+    """把一批行的区域统计累加到total（就地修改并返回total）"""
+    for key, (clues, warnings, entries, warning_entries) in part.items():
+        current = total.setdefault(key, [0, 0, "", ""])
+        current[0] += clues
+        current[1] += warnings
+        current[2] += entries
+        current[3] += warning_entries
+    return total
+
+def finish_district_statistics(parts):
+    """转换为以(区域, 是否建设领域)为键、(线索数量, 预警数量, 欠薪点位)为值的字典"""
+    return {key: (clues, warnings, entries + warning_entries)
+            for key, (clues, warnings, entries, warning_entries) in parts.items()}
+
+def aggregate_district_statistics(summary_df):
+    """一次统计整个汇总表的区域统计，返回值格式同finish_district_statistics"""
+    return finish_district_statistics(district_statistic_parts(summary_df))
+
 # 生成数据情况统计表
-def generate_statistics_table(summary_df, basic_info):
-    """根据汇总表生成数据情况统计表"""
+def generate_statistics_table(summary_df, basic_info, district_stats=None):
+    """根据汇总表生成数据情况统计表
+    
+    district_stats为流式处理中逐批累加的区域统计（finish_district_statistics的返回值），此时summary_df可以为None
+    """
     # 创建统计结果数据框
     stats_data = []
     
@@ -489,90 +961,29 @@ def generate_statistics_table(summary_df, basic_info):
     #     '欠薪点位': ''
     # })
     
-    # 区域到专班包保人的映射关系
-    district_boss_mapping = {
-        "宜都市": "罗雷",
-        "枝江市": "孟禹",
-        "当阳市": "侯民杰",
-        "远安县": "熊伟",
-        "兴山县": "牟鹏",
-        "秭归县": "叶磊",
-        "长阳县": "杨继平",
-        "五峰县": "肖丰",
-        "夷陵区": "韩晓明",
-        "西陵区": "董蒋军",
-        "伍家岗区": "雷斌斌",
-        "点军区": "储成刚",
-        "猇亭区": "朱强",
-        "高新区": "侯民杰"
-    }
     
+    # 一次分组计算所有区域、领域的统计结果
+    if district_stats is None:
+        district_stats = aggregate_district_statistics(summary_df)
+    
+    mappings = mapping_config.tables
     row_number=0
     # 对于每个有效区域，创建建设和非建两行数据
-    for district in valid_districts:
+    for district in mappings.valid_districts:
         if row_number==0:
             basic_info=basic_info
         else:
             basic_info=""
         row_number=row_number+1
 
-        # 建设领域数据统计 - 只统计预警类型字段文本长度为0的记录
-        construction_data = summary_df[(summary_df['所属区域'] == district) & 
-                                      (summary_df['所涉领域'] == '建筑')]
-        
-        # 非建领域数据统计 - 只统计预警类型字段文本长度为0的记录
-        non_construction_data = summary_df[(summary_df['所属区域'] == district) & 
-                                          (summary_df['所涉领域'] != '建筑')]
+        # 建设领域数据统计 - 线索数量只统计预警类型字段文本长度为0的记录
+        construction_count, warning_count, wage_arrears_construction = district_stats.get((district, True), (0, 0, ""))
         
-        # 统计建设领域的线索数量 - 只统计预警类型字段文本长度为0的记录
-        # 处理预警类型字段，确保是字符串类型并检查长度
-        construction_with_empty_warning = construction_data[
-            construction_data['预警类型'].apply(lambda x: isinstance(x, str) and len(x.strip()) == 0 or pd.isna(x))
-        ]
-        construction_count = len(construction_with_empty_warning)
-        
-        # 统计非建领域的线索数量 - 只统计预警类型字段文本长度为0的记录
-        non_construction_with_empty_warning = non_construction_data[
-            non_construction_data['预警类型'].apply(lambda x: isinstance(x, str) and len(x.strip()) == 0 or pd.isna(x))
-        ]
-        non_construction_count = len(non_construction_with_empty_warning)
-        
-        # 统计预警数量（只有建设领域有预警）
-        warning_count = len(construction_data[construction_data['预警类型'].notna()])
+        # 非建领域数据统计（非建领域没有预警）
+        non_construction_count, _, wage_arrears_non_construction = district_stats.get((district, False), (0, 0, ""))
         
         # 获取当前区域对应的专班包保人
-        boss_name = district_boss_mapping.get(district, "")
-        
-        # 已将safe_int_convert移至全局函数
-        
-        # 构建建设领域的欠薪点位文本
-        # 1. 处理无预警的建设领域数据
-        construction_no_warning = construction_data[construction_data['预警类型'].isna()]
-        wage_arrears_construction_no_warning = ""
-        for _, row in construction_no_warning.iterrows():
-            project = str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) else ""
-            people = str(safe_int_convert(row['涉及人数'])) if pd.notna(row['涉及人数']) else "0"
-            amount = str(safe_int_convert(row['涉及金额'])) if pd.notna(row['涉及金额']) else "0"
-            wage_arrears_construction_no_warning += f"{project}（{people}人{amount}元）；"
-        
-        # 2. 处理有预警的建设领域数据
-        construction_with_warning = construction_data[construction_data['预警类型'].notna()]
-        wage_arrears_construction_with_warning = ""
-        for _, row in construction_with_warning.iterrows():
-            project = str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) else ""
-            reason = str(row['预警原因']) if pd.notna(row['预警原因']) else ""
-            wage_arrears_construction_with_warning += f"{project}因{reason}预警；"
-        
-        # 合并建设领域的欠薪点位
-        wage_arrears_construction = wage_arrears_construction_no_warning + wage_arrears_construction_with_warning
-        
-        # 构建非建领域的欠薪点位文本（非建领域没有预警）
-        wage_arrears_non_construction = ""
-        for _, row in non_construction_data.iterrows():
-            project = str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) else ""
-            people = str(safe_int_convert(row['涉及人数'])) if pd.notna(row['涉及人数']) else "0"
-            amount = str(safe_int_convert(row['涉及金额'])) if pd.notna(row['涉及金额']) else "0"
-            wage_arrears_non_construction += f"{project}（{people}人{amount}元）；"
+        boss_name = mappings.district_boss_mapping.get(district, "")
         
         # 添加建设领域的数据行
         stats_data.append({
@@ -603,10 +1014,92 @@ def generate_statistics_table(summary_df, basic_info):
     
     return stats_df
 
+# 汇总表写入时每批转换的行数
+excel_write_chunk_rows = 10000
+
+def header_cells(worksheet, columns):
+    """生成与pandas导出格式一致的表头单元格（加粗、细边框、居中）"""
+    side = Side(style='thin')
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell.font = Font(bold=True)
+        cell.border = Border(left=side, right=side, top=side, bottom=side)
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        cells.append(cell)
+    return cells
+
+def iter_dataframe_rows(df, chunk_rows=excel_write_chunk_rows):
+    """分批把数据框转换为Python值，逐行返回，空值转换为None"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+def excel_column_widths(df, max_width=50):
+    """根据每列（含表头）最长的文本长度计算列宽，空值和0不计入"""
+    widths = []
+    for column in df.columns:
+        # 先去掉空值，否则astype(str)把NaN变成"nan"计为3个字符
+        values = df[column].dropna()
+        lengths = values[values.astype(bool)].astype(str).str.len()
+        max_length = max([len(str(column))] + lengths.tolist())
+        widths.append(min(max_length + 2, max_width))
+    return widths
+
+def write_summary_workbook(output, summary_df, stats_df):
+    """以openpyxl只写模式导出汇总表和统计表
+    
+    汇总表逐行写入临时文件，内存占用不随行数增长；
+    统计表的列宽和合并单元格在写入数据前声明
+    """
+    workbook = Workbook(write_only=True)
+    
+    # 写入汇总表
+    summary_sheet = workbook.create_sheet('劳动监察线索汇总表')
+    export_df = summary_df[summary_export_columns(summary_df)]
+    summary_sheet.append(header_cells(summary_sheet, export_df.columns))
+    for row in iter_dataframe_rows(export_df):
+        summary_sheet.append(row)
+    
+    write_statistics_sheet(workbook, stats_df)
+    workbook.save(output)
+
+def write_statistics_sheet(workbook, stats_df):
+    """在只写模式的工作簿中写入统计表"""
+    stats_sheet = workbook.create_sheet('劳动监察线索数据情况统计表')
+    for index, width in enumerate(excel_column_widths(stats_df), start=1):
+        stats_sheet.column_dimensions[get_column_letter(index)].width = width
+    
+    last_row = len(stats_df) + 1
+    if len(stats_df) > 1:
+        # 合并基本情况单元格（A2到最后一行）
+        stats_sheet.merged_cells.add(f"A2:A{last_row}")
+    # 合并区域、专班包保列的单元格对（B2~B3、B4~B5等）
+    merged_pair_rows = set(range(2, last_row, 2))
+    for row_index in merged_pair_rows:
+        stats_sheet.merged_cells.add(f"B{row_index}:B{row_index + 1}")
+        stats_sheet.merged_cells.add(f"C{row_index}:C{row_index + 1}")
+    
+    stats_sheet.append(header_cells(stats_sheet, stats_df.columns))
+    for row_index, row in enumerate(iter_dataframe_rows(stats_df), start=2):
+        row = list(row)
+        # 合并单元格左上角的内容垂直居中
+        merged_columns = []
+        if row_index == 2:
+            merged_columns.append(0)
+        if row_index in merged_pair_rows:
+            merged_columns.extend([1, 2])
+        for column_index in merged_columns:
+            cell = WriteOnlyCell(stats_sheet, value=row[column_index])
+            cell.alignment = Alignment(vertical='center')
+            row[column_index] = cell
+        stats_sheet.append(row)
+
 @app.get("/")
 async def read_root(request: Request):
     """返回主页面"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 # @app.get("/test")
 # async def test_page(request: Request):
@@ -628,184 +1121,1201 @@ async def read_root(request: Request):
 #         print(traceback.format_exc())
 #         raise HTTPException(status_code=500, detail=f"测试上传失败: {str(e)}")
 
-@app.post("/process_files/")
-async def process_files(file_12345: UploadFile = File(...), file_anxin: UploadFile = File(...)):
-    print("收到文件上传请求")
-    
-    # 检查文件类型
-    if not file_12345.filename.endswith(('.xlsx', '.xls')):
-        print(f"文件类型错误: {file_12345.filename}")
-        raise HTTPException(status_code=400, detail=f"请上传Excel文件(.xlsx或.xls格式)，当前文件: {file_12345.filename}")
+# 处理流程中某个阶段失败时抛出，异常信息直接返回给前端
+class PipelineError(Exception):
+    pass
+
+# 处理流程：读取 → 汇总 → 基本情况 → 统计 → 导出
+def run_pipeline(file_12345_content, file_anxin_content, current_date, progress=None, previous_counts=None,
+                 period_gate=None):
+    """在工作进程（或线程）中执行完整的处理流程，返回Excel文件内容、数据看板数据和各阶段的指标记录
+    
+    progress为可选的进度回调，在每个阶段开始和完成时以(阶段名, "start"/"done")调用；
+    previous_counts为线索库中上一期的线索数量，用于生成与上一期的比较；
+    period_gate为批量处理中该期的顺序控制（见batch.PeriodGate）：读取、汇总和关联与其他期并行，
+    生成基本情况前等待更早的各期写入线索库并取得上一期数量，该期已命中结果缓存时返回(None, None, 指标记录)
+    """
+    recorder = StageRecorder("full", progress, track_memory=pipeline_executor_kind != "thread")
+    # 本次处理使用的映射表，配置文件已修改时先重新加载
+    mappings = mapping_config.refresh()
+    
+    # 读取12345文件
+    recorder.start("read_12345", input_bytes=len(file_12345_content))
+    print("开始读取12345文件")
+    try:
+        processed_df_12345, schema_12345 = read_source_frame(file_12345_content, "12345")
+        recorder.done("read_12345", output_rows=len(processed_df_12345), output_bytes=frame_bytes(processed_df_12345))
+    except Exception as e:
+        print(f"读取12345文件失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"读取12345文件失败: {str(e)}")
     
-    if not file_anxin.filename.endswith(('.xlsx', '.xls')):
-        print(f"文件类型错误: {file_anxin.filename}")
-        raise HTTPException(status_code=400, detail=f"请上传Excel文件(.xlsx或.xls格式)，当前文件: {file_anxin.filename}")
+    # 读取安薪文件
+    recorder.start("read_anxin", input_bytes=len(file_anxin_content))
+    print("开始读取安薪文件")
+    try:
+        processed_df_anxin, schema_anxin = read_source_frame(file_anxin_content, "安薪")
+        recorder.done("read_anxin", output_rows=len(processed_df_anxin), output_bytes=frame_bytes(processed_df_anxin))
+    except Exception as e:
+        print(f"读取安薪文件失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"读取安薪文件失败: {str(e)}")
     
+    # 生成汇总表
+    recorder.start("summary", input_rows=len(processed_df_12345) + len(processed_df_anxin))
+    print("开始生成汇总表...")
     try:
-        # 读取12345文件
-        print(f"开始读取文件: {file_12345.filename}")
+        summary_df = combine_summary_frames(processed_df_12345, processed_df_anxin)
+        # 一次性解析涉及人数、涉及金额，后续统计均读取类型化缓存列
+        summary_df = normalize_numeric_columns(summary_df)
+        print(f"汇总表生成完成，行数: {len(summary_df)}, 列数: {len(summary_df.columns)}")
+        summary_memory = memory_report(summary_df)
+        print(f"汇总表内存占用: {format_memory_report(summary_memory)}")
+        recorder.done("summary", output_rows=len(summary_df), output_bytes=sum(summary_memory.values()))
+    except Exception as e:
+        print(f"生成汇总表失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成汇总表失败: {str(e)}")
+    
+    # 关联同一项目的12345线索和安薪在线预警
+    recorder.start("link", input_rows=len(summary_df))
+    linked_count = None
+    if entity_resolution_enabled:
+        print("开始关联项目...")
         try:
-            # 保存文件内容到临时BytesIO对象
-            file_12345_content = await file_12345.read()
-            file_12345_io = io.BytesIO(file_12345_content)
-            df_12345 = pd.read_excel(file_12345_io)
-            print(f"成功读取12345文件，行数: {len(df_12345)}, 列数: {len(df_12345.columns)}")
-            print(f"12345文件列名: {list(df_12345.columns)}")
+            summary_df['关联编号'] = resolve_entities(summary_df)
+            linked_count = int(summary_df['关联编号'].notna().sum())
+            print(f"项目关联完成，关联线索{linked_count}条，关联组{summary_df['关联编号'].nunique()}个")
         except Exception as e:
-            print(f"读取12345文件失败: {str(e)}")
+            print(f"关联项目失败: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"读取12345文件失败: {str(e)}")
-        
-        # 读取安薪文件
-        print(f"开始读取文件: {file_anxin.filename}")
+            raise PipelineError(f"关联项目失败: {str(e)}")
+    recorder.done("link", output_rows=linked_count)
+    
+    # 批量处理：上一期数量和跨期重复投诉取决于更早的各期，等它们写入线索库后再继续
+    if period_gate is not None:
+        proceed, previous_counts = period_gate.wait()
+        if not proceed:
+            return None, None, recorder.records
+    
+    # 生成基本情况文本和数据看板数据
+    recorder.start("basic_info", input_rows=len(summary_df))
+    print("开始生成基本情况...")
+    try:
+        basic_info, dashboard_data = generate_basic_info(summary_df, current_date, previous_counts)
+        dashboard_data['mapping_version'] = mappings.version
+        dashboard_data['schema_warnings'] = schema_12345.warnings + schema_anxin.warnings
+        print("基本情况生成完成")
+        recorder.done("basic_info", output_bytes=len(basic_info.encode("utf-8")))
+    except Exception as e:
+        print(f"生成基本情况失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成基本情况失败: {str(e)}")
+    
+    # 生成数据立方体，数据看板按任意维度切片、上卷时不需要重新处理
+    recorder.start("cube", input_rows=len(summary_df))
+    print("开始生成数据立方体...")
+    try:
+        dashboard_data['cube'] = cube_payload(summary_cube_cells(summary_df))
+        cell_count = len(dashboard_data['cube']['count'])
+        print(f"数据立方体生成完成，单元格数: {cell_count}")
+        recorder.done("cube", output_rows=cell_count)
+    except Exception as e:
+        print(f"生成数据立方体失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成数据立方体失败: {str(e)}")
+    
+    # 生成统计表
+    recorder.start("stats", input_rows=len(summary_df))
+    print("开始生成统计表...")
+    try:
+        stats_df = generate_statistics_table(summary_df, basic_info)
+        print(f"统计表生成完成，行数: {len(stats_df)}, 列数: {len(stats_df.columns)}")
+        recorder.done("stats", output_rows=len(stats_df))
+    except Exception as e:
+        print(f"生成统计表失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成统计表失败: {str(e)}")
+    
+    # 写入线索库，失败时不影响本次生成的文件
+    recorder.start("store", input_rows=len(summary_df))
+    new_count = None
+    try:
+        counts = {key: dashboard_data[key] for key in ('xiansuo_count', 'xiansuo_bupingtai_count', 'xiansuo_12345_count')}
+        counts['anxin_count'] = len(summary_df) - dashboard_data['xiansuo_count']
+        new_count = clue_store.ingest(summary_df, current_date, counts, summary_export_columns(summary_df))
+        print(f"线索库写入完成，新增线索{new_count}条")
+        # 按电话、项目（企业）索引统计跨期重复投诉
+        dashboard_data['repeat_stats'] = clue_store.repeat_stats(summary_df, current_date)
+    except Exception as e:
+        print(f"写入线索库失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+    recorder.done("store", output_rows=new_count)
+    if period_gate is not None:
+        period_gate.release()
+    
+    # 保留类型化的汇总表，失败时不影响本次生成的文件，只是不能按条件查询
+    recorder.start("retain", input_rows=len(summary_df))
+    dashboard_data['summary_id'] = None
+    if summary_store.enabled:
         try:
-            # 保存文件内容到临时BytesIO对象
-            file_anxin_content = await file_anxin.read()
-            file_anxin_io = io.BytesIO(file_anxin_content)
-            df_anxin = pd.read_excel(file_anxin_io)
-            print(f"成功读取安薪文件，行数: {len(df_anxin)}, 列数: {len(df_anxin.columns)}")
-            print(f"安薪文件列名: {list(df_anxin.columns)}")
+            dashboard_data['summary_id'] = summary_store.save(summary_df)
+            print(f"汇总表已保留: {dashboard_data['summary_id']}")
         except Exception as e:
-            print(f"读取安薪文件失败: {str(e)}")
+            print(f"保留汇总表失败: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"读取安薪文件失败: {str(e)}")
-        
-        # 生成汇总表
-        print("开始生成汇总表...")
+    recorder.done("retain", output_rows=len(summary_df) if dashboard_data['summary_id'] else None)
+    
+    # 创建Excel文件
+    recorder.start("export", input_rows=len(summary_df))
+    print("开始写入Excel文件...")
+    try:
+        output = io.BytesIO()
+        write_summary_workbook(output, summary_df, stats_df)
+        print("Excel文件写入完成")
+        recorder.done("export", output_bytes=output.getbuffer().nbytes)
+    except Exception as e:
+        print(f"写入Excel文件失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"写入Excel文件失败: {str(e)}")
+    
+    return output.getvalue(), dashboard_data, recorder.records
+
+# 流式处理配置：auto（两个上传文件总大小达到阈值时流式处理，默认）、always、never
+streaming_mode = os.environ.get("STREAMING_MODE", "auto")
+streaming_threshold_bytes = int(os.environ.get("STREAMING_THRESHOLD_BYTES", 50 * 1024 * 1024))
+# 流式处理时每批读取的行数
+streaming_chunk_rows = int(os.environ.get("STREAMING_CHUNK_ROWS", 20000))
+
+# 流式处理流程：逐批读取 → 处理 → 写入汇总表，同时累加基本情况和统计表的计数
+def run_streaming_pipeline(path_12345, path_anxin, current_date, progress=None, previous_counts=None):
+    """从临时文件逐批读取两个数据源，内存中只保留一批行，返回Excel文件内容、数据看板数据和各阶段的指标记录
+    
+    汇总表在读取的同时逐行写入只写模式的工作簿，基本情况、统计表和线索库按批累加；散点图、项目明细和欠薪点位文本
+    是结果的一部分，仍随行数增长；
+    不使用解析缓存，也不做项目关联（需要完整的汇总表）。参数含义同run_pipeline
+    """
+    recorder = StageRecorder("streaming", progress, track_memory=pipeline_executor_kind != "thread")
+    mappings = mapping_config.refresh()
+    
+    workbook = Workbook(write_only=True)
+    summary_sheet = workbook.create_sheet('劳动监察线索汇总表')
+    export_columns = None
+    counts = None
+    district_parts = {}
+    cells = None
+    # 线索库按批写入，出错后本次不再写入
+    store_ok = True
+    new_count = 0
+    row_count = 0
+    schema_warnings = []
+    # 类型化的汇总表按批写入Parquet文件，出错后本次不再保留
+    summary_writer = summary_store.writer() if summary_store.enabled else None
+    # 本期的电话键、项目键逐批写入线索库的临时表，最后统计跨期重复投诉
+    try:
+        clue_store.reset_repeat_keys()
+    except Exception as e:
+        print(f"写入线索库失败: {str(e)}")
+        store_ok = False
+    
+    for stage, path, source in (("read_12345", path_12345, "12345"), ("read_anxin", path_anxin, "安薪")):
+        recorder.start(stage, input_bytes=os.path.getsize(path))
+        print(f"开始流式读取{source}文件")
+        source_start = row_count
+        columns, dtypes, process = source_readers[source]
         try:
-            summary_df = generate_summary_table(df_12345, df_anxin)
-            print(f"汇总表生成完成，行数: {len(summary_df)}, 列数: {len(summary_df.columns)}")
+            schema = detect_source_schema(path, source)
+            schema_warnings += schema.warnings
+            for chunk in iter_excel_chunks(path, columns, dtypes, streaming_chunk_rows,
+                                           header_row=schema.header_row, column_names=schema.columns):
+                processed_df = process(chunk)
+                # 序号和行索引在两个数据源中连续编号，与合并后的汇总表一致
+                processed_df.index = pd.RangeIndex(row_count, row_count + len(processed_df))
+                processed_df['序号'] = range(row_count + 1, row_count + len(processed_df) + 1)
+                processed_df = normalize_numeric_columns(processed_df)
+                if export_columns is None:
+                    # 汇总表的列以12345文件为准，安薪在线数据按相同的列写入
+                    export_columns = summary_export_columns(processed_df)
+                    summary_sheet.append(header_cells(summary_sheet, export_columns))
+                for row in iter_dataframe_rows(processed_df.reindex(columns=export_columns)):
+                    summary_sheet.append(row)
+                
+                counts = merge_basic_info_counts(counts, basic_info_counts(processed_df))
+                cells = merge_cube_cells(cells, summary_cube_cells(processed_df))
+                merge_district_statistics(district_parts, district_statistic_parts(processed_df))
+                if summary_writer is not None:
+                    try:
+                        summary_writer.write(processed_df)
+                    except Exception as e:
+                        print(f"保留汇总表失败: {str(e)}")
+                        summary_writer.abort()
+                        summary_writer = None
+                if store_ok:
+                    try:
+                        new_count += clue_store.ingest_clues(processed_df, current_date, export_columns)
+                        clue_store.collect_repeat_keys(processed_df)
+                    except Exception as e:
+                        print(f"写入线索库失败: {str(e)}")
+                        store_ok = False
+                row_count += len(processed_df)
+            print(f"{source}文件流式读取完成，累计行数: {row_count}")
+            recorder.done(stage, output_rows=row_count - source_start)
         except Exception as e:
-            print(f"生成汇总表失败: {str(e)}")
+            print(f"读取{source}文件失败: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"生成汇总表失败: {str(e)}")
-        
-        # 生成日期
-        current_date = datetime.now().strftime("%Y%m%d")
-        
-        # 生成基本情况文本和数据看板数据
-        print("开始生成基本情况...")
+            raise PipelineError(f"读取{source}文件失败: {str(e)}")
+    
+    # 汇总表已在读取时写入
+    recorder.start("summary", input_rows=row_count)
+    print(f"汇总表生成完成，行数: {row_count}, 列数: {len(export_columns)}")
+    recorder.done("summary", output_rows=row_count)
+    recorder.start("link", input_rows=row_count)
+    print("流式处理不做项目关联")
+    recorder.done("link")
+    
+    # 根据累加的计数生成基本情况文本和数据看板数据
+    recorder.start("basic_info", input_rows=row_count)
+    try:
+        basic_info, dashboard_data = format_basic_info(counts, current_date, previous_counts)
+        dashboard_data['mapping_version'] = mappings.version
+        dashboard_data['schema_warnings'] = schema_warnings
+        print("基本情况生成完成")
+        recorder.done("basic_info", output_bytes=len(basic_info.encode("utf-8")))
+    except Exception as e:
+        print(f"生成基本情况失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成基本情况失败: {str(e)}")
+    
+    # 根据累加的单元格生成数据立方体
+    recorder.start("cube", input_rows=row_count)
+    try:
+        dashboard_data['cube'] = cube_payload(cells)
+        print(f"数据立方体生成完成，单元格数: {len(cells)}")
+        recorder.done("cube", output_rows=len(cells))
+    except Exception as e:
+        print(f"生成数据立方体失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成数据立方体失败: {str(e)}")
+    
+    # 根据累加的区域统计生成统计表
+    recorder.start("stats", input_rows=row_count)
+    try:
+        stats_df = generate_statistics_table(None, basic_info, finish_district_statistics(district_parts))
+        print(f"统计表生成完成，行数: {len(stats_df)}, 列数: {len(stats_df.columns)}")
+        recorder.done("stats", output_rows=len(stats_df))
+    except Exception as e:
+        print(f"生成统计表失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"生成统计表失败: {str(e)}")
+    
+    # 线索已按批写入，最后保存本期数量并统计跨期重复投诉
+    recorder.start("store", input_rows=row_count)
+    if store_ok:
         try:
-            basic_info, dashboard_data = generate_basic_info(summary_df, current_date)
-            print("基本情况生成完成")
+            period_counts = {key: dashboard_data[key] for key in ('xiansuo_count', 'xiansuo_bupingtai_count', 'xiansuo_12345_count')}
+            period_counts['anxin_count'] = row_count - dashboard_data['xiansuo_count']
+            clue_store.record_period(current_date, period_counts)
+            print(f"线索库写入完成，新增线索{new_count}条")
+            dashboard_data['repeat_stats'] = clue_store.collected_repeat_stats(current_date)
         except Exception as e:
-            print(f"生成基本情况失败: {str(e)}")
+            print(f"写入线索库失败: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"生成基本情况失败: {str(e)}")
-        
-        # 生成统计表
-        print("开始生成统计表...")
+    recorder.done("store", output_rows=new_count if store_ok else None)
+    
+    # 汇总表已按批写入，写完后改为正式文件
+    recorder.start("retain", input_rows=row_count)
+    dashboard_data['summary_id'] = None
+    if summary_writer is not None:
         try:
-            stats_df = generate_statistics_table(summary_df, basic_info)
-            print(f"统计表生成完成，行数: {len(stats_df)}, 列数: {len(stats_df.columns)}")
+            dashboard_data['summary_id'] = summary_writer.commit()
+            print(f"汇总表已保留: {dashboard_data['summary_id']}")
         except Exception as e:
-            print(f"生成统计表失败: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"生成统计表失败: {str(e)}")
+            print(f"保留汇总表失败: {str(e)}")
+            summary_writer.abort()
+    recorder.done("retain", output_rows=row_count if dashboard_data['summary_id'] else None)
+    
+    recorder.start("export", input_rows=row_count)
+    print("开始写入Excel文件...")
+    try:
+        write_statistics_sheet(workbook, stats_df)
+        output = io.BytesIO()
+        workbook.save(output)
+        print("Excel文件写入完成")
+        recorder.done("export", output_bytes=output.getbuffer().nbytes)
+    except Exception as e:
+        print(f"写入Excel文件失败: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        raise PipelineError(f"写入Excel文件失败: {str(e)}")
+    
+    return output.getvalue(), dashboard_data, recorder.records
+
+# 处理任务执行器配置：process（进程池，默认）或thread（线程池）
+pipeline_executor_kind = os.environ.get("PIPELINE_EXECUTOR", "process")
+# 工作进程（线程）数
+pipeline_workers = int(os.environ.get("PIPELINE_WORKERS", os.cpu_count() or 1))
+# 同时处理的任务数上限，超过时拒绝新的请求
+pipeline_max_jobs = int(os.environ.get("PIPELINE_MAX_JOBS", pipeline_workers))
+
+pipeline_executor = None
+pipeline_active_jobs = 0
+
+def get_pipeline_executor():
+    """首次使用时创建执行器；进程池使用spawn方式启动，避免复制事件循环所在进程的线程状态"""
+    global pipeline_executor
+    if pipeline_executor is None:
+        if pipeline_executor_kind == "thread":
+            pipeline_executor = ThreadPoolExecutor(max_workers=pipeline_workers, thread_name_prefix="pipeline")
+        else:
+            pipeline_executor = ProcessPoolExecutor(max_workers=pipeline_workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+        print(f"已创建处理任务执行器: {pipeline_executor_kind}, 工作数: {pipeline_workers}")
+    return pipeline_executor
+
+def shutdown_pipeline_executor():
+    """关闭执行器，等待已提交的任务结束"""
+    global pipeline_executor
+    if pipeline_executor is not None:
+        pipeline_executor.shutdown(wait=True)
+        pipeline_executor = None
+
+async def run_in_pipeline_executor(func, *args):
+    """在执行器中运行CPU密集的处理函数，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pipeline_executor(), func, *args)
+
+# 性能剖析配置：PROFILE_REQUESTS=1时剖析每次处理；设置PROFILE_ADMIN_TOKEN后，
+# 请求头X-Profile-Token与之相同的请求单独剖析，下载剖析结果时也需要该请求头
+profile_all_requests = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+profile_admin_token = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+profile_dir = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "jiancha-profiles")
+# 保留最近多少次剖析结果
+profile_keep = int(os.environ.get("PROFILE_KEEP", 20))
+
+def has_profile_token(request):
+    """请求头中的X-Profile-Token是否与配置的管理员令牌一致"""
+    token = request.headers.get("x-profile-token")
+    return bool(profile_admin_token) and token is not None and hmac.compare_digest(token, profile_admin_token)
+
+def requested_profile_id(request):
+    """需要剖析本次处理时返回新的剖析id，否则返回None"""
+    if profile_all_requests or has_profile_token(request):
+        return new_profile_id()
+    return None
+
+async def run_pipeline_task(pipeline, args, profile_id=None):
+    """在执行器中运行处理流程，profile_id不为None时在工作进程中剖析并保存结果"""
+    if profile_id is None:
+        return await run_in_pipeline_executor(pipeline, *args)
+    print(f"本次处理开启性能剖析: {profile_id}")
+    return await run_in_pipeline_executor(profiled_call, profile_id, profile_dir, profile_keep, pipeline, *args)
+
+def try_acquire_pipeline_slot():
+    """占用一个处理任务名额，名额已满时返回False（只在事件循环中调用，无需加锁）"""
+    global pipeline_active_jobs
+    if pipeline_active_jobs >= pipeline_max_jobs:
+        return False
+    pipeline_active_jobs += 1
+    return True
+
+def acquire_pipeline_slots(count):
+    """批量处理时尽量占用count个名额，返回实际占用的个数（名额已满时为0）"""
+    global pipeline_active_jobs
+    acquired = max(0, min(count, pipeline_max_jobs - pipeline_active_jobs))
+    pipeline_active_jobs += acquired
+    return acquired
+
+def release_pipeline_slot(count=1):
+    """释放处理任务名额"""
+    global pipeline_active_jobs
+    pipeline_active_jobs -= count
+
+# 进度事件队列：进程池模式下使用Manager队列，工作进程可以通过代理写入；批量处理的顺序控制共用同一个Manager
+progress_manager = None
+progress_queue = None
+
+def get_progress_manager():
+    """首次使用时启动Manager进程（进程池模式）"""
+    global progress_manager
+    if progress_manager is None:
+        progress_manager = multiprocessing.get_context("spawn").Manager()
+    return progress_manager
+
+def drain_progress_queue(events):
+    """后台线程：把工作进程上报的阶段进度写入任务存储，收到None时退出"""
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        job_store.record_stage(*event)
+
+def get_progress_queue():
+    """首次使用时创建进度队列并启动后台线程"""
+    global progress_queue
+    if progress_queue is None:
+        if pipeline_executor_kind == "thread":
+            progress_queue = queue.Queue()
+        else:
+            progress_queue = get_progress_manager().Queue()
+        threading.Thread(target=drain_progress_queue, args=(progress_queue,),
+                         name="pipeline-progress", daemon=True).start()
+    return progress_queue
+
+def shutdown_progress_queue():
+    """停止进度后台线程并关闭Manager进程"""
+    global progress_manager, progress_queue
+    if progress_queue is not None:
+        progress_queue.put(None)
+        progress_queue = None
+    if progress_manager is not None:
+        progress_manager.shutdown()
+        progress_manager = None
+
+# 异步任务存储配置：最多保留的任务数和结果保留时间（秒）
+job_store = JobStore(max_jobs=int(os.environ.get("JOB_STORE_MAX_JOBS", 32)),
+                     ttl=int(os.environ.get("JOB_RESULT_TTL", 3600)))
+# 正在运行的后台任务，保留引用避免被垃圾回收
+job_tasks = set()
+
+# 处理指标：工作进程返回的阶段记录在这里汇总，由/metrics接口输出
+pipeline_metrics = PipelineMetrics()
+
+def pipeline_kind(pipeline):
+    """指标和日志中的处理方式：full（整体处理）或streaming（流式处理）"""
+    return "streaming" if pipeline is run_streaming_pipeline else "full"
+
+# 结果缓存配置：缓存目录为空时保存在内存中，容量为0时不缓存
+result_cache = ResultCache(max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+                           directory=os.environ.get("RESULT_CACHE_DIR") or None)
+
+# 结果格式版本，数据看板数据增加或修改字段时需要递增，旧的缓存结果随之失效
+result_format_version = 5
+
+async def lookup_result_cache(digests, current_date, streaming=False):
+    """查询线索库中上一期的线索数量，计算缓存键并查询结果缓存
+    
+    digests为两个上传文件内容的SHA-256摘要；返回(缓存键, 命中的结果或None, 上一期线索数量)。
+    上一期数量会写入基本情况，跨期重复投诉取决于线索库中较早的各期（见ClueStore.history_revision），
+    流式处理的结果不含关联编号列，因此都是缓存键的一部分；
+    缓存键中的映射表版本为查询时的版本，处理时映射表已重新加载的结果不写入缓存（见put_result_cache）
+    """
+    previous_counts = await asyncio.to_thread(clue_store.previous_period_counts, current_date)
+    history_revision = await asyncio.to_thread(clue_store.history_revision, current_date)
+    mappings = mapping_config.refresh()
+    version = (f"{result_format_version}:{mappings.version}:{json.dumps(previous_counts, sort_keys=True)}:"
+               f"{history_revision}:{entity_resolution_enabled and not streaming}")
+    key = result_cache_key(*digests, version, current_date)
+    cached = await asyncio.to_thread(result_cache.get, key)
+    if cached is None:
+        cache_key_mapping_versions[key] = mappings.version
+        # 处理失败的键不会被取走，只保留最近的一部分
+        while len(cache_key_mapping_versions) > 1024:
+            cache_key_mapping_versions.pop(next(iter(cache_key_mapping_versions)))
+    return key, cached, previous_counts
+
+# 未命中的缓存键 -> 计算缓存键时的映射表版本，写入缓存时确认结果使用的是同一版本
+cache_key_mapping_versions = {}
+
+async def put_result_cache(cache_key, workbook_content, dashboard_data):
+    """把处理结果写入结果缓存；处理期间映射表已经变化时不写入，避免旧版本的键对应新版本的结果"""
+    if cache_key_mapping_versions.pop(cache_key, None) != dashboard_data.get('mapping_version'):
+        print("处理期间区域映射配置已变化，结果不写入缓存")
+        return
+    await asyncio.to_thread(result_cache.put, cache_key, workbook_content, dashboard_data)
+
+def upload_size(file):
+    """上传文件的字节数"""
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+def should_stream(file_12345, file_anxin):
+    """根据配置和上传文件总大小决定是否流式处理；.xls文件只能整体读取"""
+    if streaming_mode == "never":
+        return False
+    if not (file_12345.filename.endswith('.xlsx') and file_anxin.filename.endswith('.xlsx')):
+        return False
+    if streaming_mode == "always":
+        return True
+    return upload_size(file_12345) + upload_size(file_anxin) >= streaming_threshold_bytes
+
+async def receive_uploads(file_12345, file_anxin):
+    """接收两个上传文件，返回(处理函数, 文件参数, 内容摘要, 需要删除的临时文件)
+    
+    流式处理时上传文件分块写入临时文件，工作进程按路径读取；否则读入内存
+    """
+    if should_stream(file_12345, file_anxin):
+        path_12345, size_12345, digest_12345 = await asyncio.to_thread(spool_upload, file_12345.file)
+        try:
+            path_anxin, size_anxin, digest_anxin = await asyncio.to_thread(spool_upload, file_anxin.file)
+        except BaseException:
+            remove_files([path_12345])
+            raise
+        print(f"文件已写入临时文件（流式处理）: {file_12345.filename}（{size_12345}字节）, {file_anxin.filename}（{size_anxin}字节）")
+        return (run_streaming_pipeline, (path_12345, path_anxin), (digest_12345, digest_anxin),
+                [path_12345, path_anxin])
+    
+    file_12345_content = await file_12345.read()
+    file_anxin_content = await file_anxin.read()
+    print(f"文件读取完成: {file_12345.filename}（{len(file_12345_content)}字节）, {file_anxin.filename}（{len(file_anxin_content)}字节）")
+    digests = await asyncio.to_thread(lambda: (content_digest(file_12345_content), content_digest(file_anxin_content)))
+    return run_pipeline, (file_12345_content, file_anxin_content), digests, []
+
+async def check_upload_schemas(inputs):
+    """在主进程中识别两个上传文件（内容或临时文件路径）的表头，缺少关键列时直接返回400，不进入处理队列
+
+    返回表头提示；工作进程读取时会再识别一次（只读取前几行，耗时为毫秒级）
+    """
+    try:
+        schemas = await asyncio.to_thread(
+            lambda: [detect_source_schema(source_input, source) for source_input, source in zip(inputs, ("12345", "安薪"))])
+    except SchemaError as e:
+        print(f"上传文件表头不符合要求: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return [warning for schema in schemas for warning in schema.warnings]
+
+def store_result(files, current_date, workbook_content, dashboard_data, cached):
+    """把同步处理的结果登记为已完成的任务，返回结果id（即任务id）"""
+    job_id = job_store.create(files=files, cached=cached)
+    job_store.finish(job_id, result={
+        "workbook": workbook_content,
+        "filename": result_filename(current_date),
+        "dashboard": dashboard_data,
+    })
+    return job_id
+
+def check_excel_upload(file):
+    """检查上传文件的扩展名"""
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        print(f"文件类型错误: {file.filename}")
+        raise HTTPException(status_code=400, detail=f"请上传Excel文件(.xlsx或.xls格式)，当前文件: {file.filename}")
+
+def result_filename(current_date):
+    return f"{current_date}劳动监察线索汇总和统计.xlsx"
+
+def excel_download_response(workbook_content, filename, headers=None):
+    """返回Excel文件下载响应，中文文件名需要URL编码"""
+    from urllib.parse import quote
+    return StreamingResponse(
+        io.BytesIO(workbook_content),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={quote(filename)}", **(headers or {})}
+    )
+
+@app.post("/process_files/")
+async def process_files(request: Request, file_12345: UploadFile = File(...), file_anxin: UploadFile = File(...)):
+    print("收到文件上传请求")
+    profile_id = requested_profile_id(request)
+    
+    # 检查文件类型
+    check_excel_upload(file_12345)
+    check_excel_upload(file_anxin)
+    
+    # 接收上传文件，解析和统计在工作进程中完成
+    pipeline, inputs, digests, temp_paths = await receive_uploads(file_12345, file_anxin)
+    files = [file_12345.filename, file_anxin.filename]
+    
+    try:
+        # 解析前先检查表头，文件不对时立即返回
+        await check_upload_schemas(inputs)
+        
+        # 相同文件重复上传时直接返回缓存的结果（剖析时总是重新处理）
+        current_date = datetime.now().strftime("%Y%m%d")
+        cache_key, cached, previous_counts = await lookup_result_cache(
+            digests, current_date, pipeline is run_streaming_pipeline)
+        if cached is not None and profile_id is None:
+            print("结果缓存命中，直接返回")
+            pipeline_metrics.observe_run(pipeline_kind(pipeline), "cached")
+            workbook_content, dashboard_data = cached
+            result_id = store_result(files, current_date, workbook_content, dashboard_data, cached=True)
+            return excel_download_response(
+                workbook_content, result_filename(current_date), headers={"X-Result-Id": result_id}
+            )
         
-        # 生成文件名
-        filename = f"{current_date}劳动监察线索汇总和统计.xlsx"
+        # 准入控制：同时处理的任务数达到上限时直接拒绝
+        if not try_acquire_pipeline_slot():
+            print(f"处理任务已满（{pipeline_max_jobs}个），拒绝新的请求")
+            raise HTTPException(status_code=503, detail="服务器正在处理其他文件，请稍后重试")
         
-        # 创建Excel文件
-        print("开始写入Excel文件...")
+        started_at = time.perf_counter()
         try:
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # 写入汇总表
-                summary_df.to_excel(writer, sheet_name='劳动监察线索汇总表', index=False)
-                
-                # 写入统计表
-                stats_df.to_excel(writer, sheet_name='劳动监察线索数据情况统计表', index=False)
-                
-                # 合并基本情况单元格（A2到A29）
-                worksheet = writer.sheets['劳动监察线索数据情况统计表']
-                from openpyxl.utils import get_column_letter
-                from openpyxl.styles import Alignment
-                
-                # 基本情况列在Excel中是第一列
-                basic_info_col_index = 1
-                
-                # 保存A2单元格的内容，用于合并后填充
-                a2_value = worksheet.cell(row=2, column=basic_info_col_index).value
-                
-                # 合并A2到A29单元格
-                worksheet.merge_cells(start_row=2, start_column=basic_info_col_index, 
-                                    end_row=29, end_column=basic_info_col_index)
-                
-                # 用A2的内容填充合并后的单元格并设置垂直居中
-                a_cell = worksheet.cell(row=2, column=basic_info_col_index)
-                a_cell.value = a2_value
-                a_cell.alignment = Alignment(vertical='center')
-                
-                # 合并B列的指定单元格对（B2~B3、B4~B5等）
-                for i in range(2, 30, 2):
-                    # 保存B列当前单元格的值
-                    b_value = worksheet.cell(row=i, column=2).value
-                    # 合并B列两个相邻单元格
-                    worksheet.merge_cells(start_row=i, start_column=2, end_row=i+1, end_column=2)
-                    # 用第一个单元格的内容填充并设置垂直居中
-                    b_cell = worksheet.cell(row=i, column=2)
-                    b_cell.value = b_value
-                    b_cell.alignment = Alignment(vertical='center')
-                    
-                    # 保存C列当前单元格的值
-                    c_value = worksheet.cell(row=i, column=3).value
-                    # 合并C列两个相邻单元格
-                    worksheet.merge_cells(start_row=i, start_column=3, end_row=i+1, end_column=3)
-                    # 用第一个单元格的内容填充并设置垂直居中
-                    c_cell = worksheet.cell(row=i, column=3)
-                    c_cell.value = c_value
-                    c_cell.alignment = Alignment(vertical='center')
-                
-                # 调整列宽以适应内容
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = get_column_letter(column[0].column)
-                    for cell in column:
-                        try:
-                            if cell.value:
-                                max_length = max(max_length, len(str(cell.value)))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                    
-            # 重置文件指针
-            output.seek(0)
-            print("Excel文件写入完成")
+            try:
+                workbook_content, dashboard_data, stage_records = await run_pipeline_task(
+                    pipeline, (*inputs, current_date, None, previous_counts), profile_id)
+            except PipelineError as e:
+                pipeline_metrics.observe_run(pipeline_kind(pipeline), "failed", time.perf_counter() - started_at)
+                raise HTTPException(status_code=500, detail=str(e))
+            pipeline_metrics.observe_stages(stage_records)
+            pipeline_metrics.observe_run(pipeline_kind(pipeline), "done", time.perf_counter() - started_at)
+            await put_result_cache(cache_key, workbook_content, dashboard_data)
+            
+            # 返回生成的Excel文件，数据看板数据通过结果id从/jobs/{result_id}/dashboard获取
+            result_id = store_result(files, current_date, workbook_content, dashboard_data, cached=False)
+            headers = {"X-Result-Id": result_id}
+            if profile_id is not None:
+                headers["X-Profile-Id"] = profile_id
+            return excel_download_response(workbook_content, result_filename(current_date), headers=headers)
+        except HTTPException:
+            # 重新抛出已经格式化的HTTPException
+            raise
         except Exception as e:
-            print(f"写入Excel文件失败: {str(e)}")
+            pipeline_metrics.observe_run(pipeline_kind(pipeline), "failed", time.perf_counter() - started_at)
+            print(f"处理文件时发生未捕获的错误: {str(e)}")
             import traceback
             print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"写入Excel文件失败: {str(e)}")
-        
-        # 返回生成的Excel文件，需要对中文文件名进行URL编码
-        from urllib.parse import quote
-        import json
-        encoded_filename = quote(filename)
-        response = StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={encoded_filename}",
-                "X-Dashboard-Data": json.dumps(dashboard_data)  # 传递数据看板数据给前端
-            }
-        )
-        
-        return response
-    except HTTPException:
-        # 重新抛出已经格式化的HTTPException
-        raise
+            raise HTTPException(status_code=500, detail=f"处理文件时发生未捕获的错误: {str(e)}")
+        finally:
+            release_pipeline_slot()
+    finally:
+        remove_files(temp_paths)
+
+async def run_job(job_id, pipeline, inputs, current_date, cache_key, previous_counts, temp_paths, profile_id=None):
+    """后台执行处理任务，结束后把结果或错误写入任务存储，释放名额并删除临时文件"""
+    started_at = time.perf_counter()
+    try:
+        reporter = ProgressReporter(get_progress_queue(), job_id)
+        workbook_content, dashboard_data, stage_records = await run_pipeline_task(
+            pipeline, (*inputs, current_date, reporter, previous_counts), profile_id)
+        pipeline_metrics.observe_stages(stage_records)
+        pipeline_metrics.observe_run(pipeline_kind(pipeline), "done", time.perf_counter() - started_at)
+        await put_result_cache(cache_key, workbook_content, dashboard_data)
+        job_store.finish(job_id, result={
+            "workbook": workbook_content,
+            "filename": result_filename(current_date),
+            "dashboard": dashboard_data,
+        })
+        print(f"任务{job_id}处理完成")
+    except PipelineError as e:
+        pipeline_metrics.observe_run(pipeline_kind(pipeline), "failed", time.perf_counter() - started_at)
+        job_store.finish(job_id, error=str(e))
     except Exception as e:
-        print(f"处理文件时发生未捕获的错误: {str(e)}")
+        pipeline_metrics.observe_run(pipeline_kind(pipeline), "failed", time.perf_counter() - started_at)
+        print(f"任务{job_id}发生未捕获的错误: {str(e)}")
         import traceback
         print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"处理文件时发生未捕获的错误: {str(e)}")
+        job_store.finish(job_id, error=f"处理文件时发生未捕获的错误: {str(e)}")
+    finally:
+        release_pipeline_slot()
+        remove_files(temp_paths)
+
+def get_finished_job(job_id):
+    """返回已成功完成的任务，任务不存在、未完成或失败时抛出HTTPException"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或结果已过期")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="任务尚未完成")
+    return job
+
+@app.post("/jobs/", status_code=202)
+async def create_job(request: Request, file_12345: UploadFile = File(...), file_anxin: UploadFile = File(...)):
+    """提交处理任务，立即返回任务id，处理进度通过/jobs/{job_id}查询"""
+    print("收到异步处理任务请求")
+    profile_id = requested_profile_id(request)
+    check_excel_upload(file_12345)
+    check_excel_upload(file_anxin)
+    
+    pipeline, inputs, digests, temp_paths = await receive_uploads(file_12345, file_anxin)
+    files = [file_12345.filename, file_anxin.filename]
+    
+    # 临时文件交给后台任务后由任务删除
+    try:
+        schema_warnings = await check_upload_schemas(inputs)
+        
+        # 结果缓存命中时任务直接完成（剖析时总是重新处理）
+        current_date = datetime.now().strftime("%Y%m%d")
+        cache_key, cached, previous_counts = await lookup_result_cache(
+            digests, current_date, pipeline is run_streaming_pipeline)
+        if cached is not None and profile_id is None:
+            pipeline_metrics.observe_run(pipeline_kind(pipeline), "cached")
+            job_id = store_result(files, current_date, cached[0], cached[1], cached=True)
+            print(f"任务{job_id}结果缓存命中")
+        else:
+            if not try_acquire_pipeline_slot():
+                print(f"处理任务已满（{pipeline_max_jobs}个），拒绝新的请求")
+                raise HTTPException(status_code=503, detail="服务器正在处理其他文件，请稍后重试")
+            
+            job_id = job_store.create(files=files, cached=False, streaming=pipeline is run_streaming_pipeline,
+                                      profile_id=profile_id)
+            print(f"任务{job_id}已创建: {file_12345.filename}, {file_anxin.filename}")
+            task = asyncio.create_task(run_job(job_id, pipeline, inputs, current_date, cache_key,
+                                               previous_counts, temp_paths, profile_id))
+            temp_paths = []
+            job_tasks.add(task)
+            task.add_done_callback(job_tasks.discard)
+    finally:
+        remove_files(temp_paths)
+    
+    return {
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result",
+        "dashboard_url": f"/jobs/{job_id}/dashboard",
+        "schema_warnings": schema_warnings,
+    }
+
+# 批量处理：预先解析多期共用的安薪在线文件
+def warm_frame_cache(content, source):
+    """在工作进程中解析数据源并写入解析缓存，返回行数"""
+    return len(read_source_frame(content, source)[0])
+
+def new_period_gate():
+    """批量处理中一期的顺序控制，进程池模式下使用Manager代理，工作进程可以等待和通知"""
+    if pipeline_executor_kind == "thread":
+        return PeriodGate(queue.Queue(), threading.Event())
+    manager = get_progress_manager()
+    return PeriodGate(manager.Queue(), manager.Event())
+
+async def run_batch(pairs, concurrency):
+    """处理按日期排列的各期，返回[{date, files, workbook, dashboard, error}]
+    
+    每期以文件名中的日期作为处理日期，与单次上传一样使用结果缓存和线索库；某一期失败时只记录错误。
+    各期的处理流程以最多concurrency个在执行器中并行；“上一期”和跨期重复投诉取决于线索库中更早的各期，
+    因此每期在生成基本情况前等待（见batch.PeriodGate）：前一期写入线索库（或失败）后，
+    按日期顺序查询该期的结果缓存和上一期数量，写入线索库也按日期顺序进行，结果与各期处理的快慢无关
+    """
+    digests = await asyncio.to_thread(lambda: [
+        (content_digest(pair["content_12345"]), content_digest(pair["content_anxin"])) for pair in pairs])
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    # 多期共用的文件（通常是安薪在线文件）先并行解析一次写入解析缓存，各期直接读取；解析失败时由各期处理时报告错误
+    if frame_cache.enabled:
+        sources, uses = {}, {}
+        for pair, (digest_12345, digest_anxin) in zip(pairs, digests):
+            for digest, content, source in ((digest_12345, pair["content_12345"], "12345"),
+                                            (digest_anxin, pair["content_anxin"], "安薪")):
+                sources.setdefault(digest, (content, source))
+                uses[digest] = uses.get(digest, 0) + 1
+        shared = [sources[digest] for digest, count in uses.items() if count > 1]
+        if shared:
+            print(f"预先解析{len(shared)}个多期共用的文件")
+            
+            async def warm(content, source):
+                async with semaphore:
+                    await run_in_pipeline_executor(warm_frame_cache, content, source)
+            
+            await asyncio.gather(*(warm(content, source) for content, source in shared), return_exceptions=True)
+    
+    gates = await asyncio.to_thread(lambda: [new_period_gate() for _ in pairs])
+    results = [{"date": pair["date"], "files": [pair["name_12345"], pair["name_anxin"]],
+                "workbook": None, "dashboard": None, "error": None} for pair in pairs]
+    cache_keys = [None] * len(pairs)
+    
+    async def run_period(index):
+        """在执行器中运行一期的处理流程，返回(结果, 耗时)或(异常, 耗时)；结束时总是通知下一期"""
+        pair = pairs[index]
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                outcome = await run_pipeline_task(
+                    run_pipeline, (pair["content_12345"], pair["content_anxin"], pair["date"], None, None, gates[index]))
+            except Exception as e:
+                outcome = e
+            finally:
+                await asyncio.to_thread(gates[index].release)
+            return outcome, time.perf_counter() - started_at
+    
+    # 按日期顺序创建，信号量先到先得，排在前面的期总是先占用执行器
+    tasks = [asyncio.ensure_future(run_period(index)) for index in range(len(pairs))]
+    decided = 0
+    try:
+        # 前一期写入线索库后，再查询本期的结果缓存和上一期数量
+        for index, (pair, pair_digests) in enumerate(zip(pairs, digests)):
+            if index > 0:
+                await asyncio.to_thread(gates[index - 1].wait_released)
+            cache_key, cached, previous_counts = await lookup_result_cache(pair_digests, pair["date"])
+            if cached is not None:
+                print(f"{pair['date']}结果缓存命中")
+                pipeline_metrics.observe_run("full", "cached")
+                results[index]["workbook"], results[index]["dashboard"] = cached
+                # 命中缓存的期不写入线索库，下一期不必等它的处理流程停下
+                await asyncio.to_thread(gates[index].decide, False)
+                await asyncio.to_thread(gates[index].release)
+            else:
+                cache_keys[index] = cache_key
+                await asyncio.to_thread(gates[index].decide, True, previous_counts)
+            decided = index + 1
+        outcomes = await asyncio.gather(*tasks)
+    except BaseException:
+        # 还在等待决定的处理流程直接结束，不占用执行器
+        for gate in gates[decided:]:
+            gate.decide(False)
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    for index, (outcome, seconds) in enumerate(outcomes):
+        result = results[index]
+        if cache_keys[index] is None:
+            continue
+        if isinstance(outcome, Exception):
+            pipeline_metrics.observe_run("full", "failed", seconds)
+            if not isinstance(outcome, PipelineError):
+                import traceback
+                print("".join(traceback.format_exception(outcome)))
+            result["error"] = str(outcome)
+            print(f"{result['date']}处理失败: {str(outcome)}")
+            continue
+        workbook_content, dashboard_data, stage_records = outcome
+        pipeline_metrics.observe_stages(stage_records)
+        pipeline_metrics.observe_run("full", "done", seconds)
+        await put_result_cache(cache_keys[index], workbook_content, dashboard_data)
+        result["workbook"], result["dashboard"] = workbook_content, dashboard_data
+        print(f"{result['date']}处理完成")
+    return results
+
+def write_batch_statistics_workbook(periods_df, districts_df):
+    """跨期统计表：各期汇总、各区域线索数两个工作表"""
+    workbook = Workbook(write_only=True)
+    for title, df in (("各期汇总", periods_df), ("各区域线索数", districts_df)):
+        sheet = workbook.create_sheet(title)
+        for index, width in enumerate(excel_column_widths(df), start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = width
+        sheet.append(header_cells(sheet, df.columns))
+        for row in iter_dataframe_rows(df):
+            sheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+# 批量处理结果中跨期统计表的文件名
+batch_statistics_filename = "跨期统计.xlsx"
+
+def build_batch_archive(results):
+    """把各期结果打包为zip：每期一个“YYYYMMDD劳动监察线索汇总和统计.xlsx”，加上跨期统计表"""
+    entries = [(result_filename(result["date"]), result["workbook"])
+               for result in results if result["workbook"] is not None]
+    periods_df, districts_df = batch_statistics_frames(results)
+    entries.append((batch_statistics_filename, write_batch_statistics_workbook(periods_df, districts_df)))
+    return build_batch_zip(entries)
+
+def batch_archive_filename(results):
+    first, last = results[0]["date"], results[-1]["date"]
+    return f"{first}劳动监察线索汇总和统计.zip" if first == last else f"{first}-{last}劳动监察线索汇总和统计.zip"
+
+@app.post("/batch/")
+async def process_batch(files: list[UploadFile] = File(...)):
+    """批量处理多期文件：上传多个12345 / 安薪在线文件或zip压缩包，按文件名中的日期配对后并行处理，
+    返回包含各期Excel文件和跨期统计表的zip
+    """
+    print(f"收到批量处理请求，文件数: {len(files)}")
+    uploads = [(file.filename, await file.read()) for file in files]
+    try:
+        pairs = await asyncio.to_thread(lambda: pair_batch_files(expand_batch_files(uploads)))
+    except BatchInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # 批量处理占用当前空闲的名额（最多每期一个），没有空闲名额时拒绝
+    slots = acquire_pipeline_slots(len(pairs))
+    if slots == 0:
+        print(f"处理任务已满（{pipeline_max_jobs}个），拒绝批量处理请求")
+        raise HTTPException(status_code=503, detail="服务器正在处理其他文件，请稍后重试")
+    print(f"批量处理{len(pairs)}期（{pairs[0]['date']}~{pairs[-1]['date']}），并行数: {slots}")
+    try:
+        results = await run_batch(pairs, slots)
+        archive = await asyncio.to_thread(build_batch_archive, results)
+    finally:
+        release_pipeline_slot(slots)
+    
+    from urllib.parse import quote
+    failed = sum(1 for result in results if result["error"] is not None)
+    return StreamingResponse(
+        io.BytesIO(archive),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={quote(batch_archive_filename(results))}",
+                 "X-Batch-Periods": str(len(results)), "X-Batch-Failed": str(failed)},
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """查询任务状态和各阶段进度、耗时"""
+    status = job_store.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="任务不存在或结果已过期")
+    return status
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """下载任务生成的Excel文件"""
+    result = get_finished_job(job_id)["result"]
+    return excel_download_response(result["workbook"], result["filename"])
+
+# 数据看板中按列传输的散点图数据
+dashboard_scatter_keys = ["jianshe_scatter_data", "feijian_scatter_data"]
+# 分页获取的涉及人数较多项目明细：领域 -> 数据看板中的键
+large_project_keys = {"jianshe": "jianshe_large_projects", "feijian": "feijian_large_projects"}
+# 按数值排序的项目明细字段，其余字段按文本排序
+large_project_numeric_fields = ["people_count", "amount"]
+large_project_sort_fields = ["project_name", "district", "industry", "people_count", "amount", "applicant", "content"]
+
+def compact_dashboard(dashboard_data, job_id):
+    """转换为前端使用的紧凑格式：散点图按列传输，项目明细只保留条数和分页接口地址"""
+    compact = dict(dashboard_data)
+    for key in dashboard_scatter_keys:
+        records = compact.get(key) or []
+        compact[key] = {column: [record[column] for record in records] for column in ("id", "people", "amount")}
+    for key in large_project_keys.values():
+        compact[f"{key}_total"] = len(compact.pop(key, None) or [])
+    compact["large_projects_url"] = f"/jobs/{job_id}/large_projects"
+    # 数据立方体通过查询接口按需切片，不随数据看板传输
+    compact.pop("cube", None)
+    compact["cube_url"] = f"/jobs/{job_id}/cube"
+    # 汇总表明细通过查询接口按条件分页读取
+    retained = compact.pop("summary_id", None)
+    compact["summary_url"] = f"/jobs/{job_id}/summary" if retained else None
+    compact["search_url"] = f"/jobs/{job_id}/search" if retained else None
+    return compact
+
+def dashboard_payload(job):
+    """数据看板的JSON及其gzip压缩内容只生成一次，保存在任务结果中"""
+    result = job["result"]
+    if "dashboard_gzip" not in result:
+        # 在事件循环所在进程中执行，内存无法归属到本阶段
+        recorder = StageRecorder("response", track_memory=False)
+        recorder.start("dashboard")
+        body = json.dumps(compact_dashboard(result["dashboard"], job["job_id"]),
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        result["dashboard_json"] = body
+        result["dashboard_gzip"] = gzip.compress(body, compresslevel=6)
+        recorder.done("dashboard", output_bytes=len(body))
+        pipeline_metrics.observe_stages(recorder.records)
+    return result["dashboard_json"], result["dashboard_gzip"]
+
+def accepts_gzip(accept_encoding):
+    """按Accept-Encoding的q值判断客户端是否接受gzip：gzip的q值为0时不接受，没有列出gzip时看*的q值"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+@app.get("/jobs/{job_id}/dashboard")
+async def get_job_dashboard(job_id: str, request: Request):
+    """获取任务的数据看板数据，客户端支持时返回gzip压缩内容"""
+    body, compressed = await asyncio.to_thread(dashboard_payload, get_finished_job(job_id))
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        return Response(compressed, media_type="application/json",
+                        headers={**headers, "Content-Encoding": "gzip"})
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/jobs/{job_id}/large_projects/{field}")
+async def get_job_large_projects(job_id: str, field: str, page: int = 1, page_size: int = 10,
+                                 sort: str = "", order: str = "asc"):
+    """分页获取涉及人数较多的项目明细，field为jianshe（建筑类）或feijian（非建类）"""
+    if field not in large_project_keys:
+        raise HTTPException(status_code=404, detail=f"未知的领域: {field}")
+    if sort and sort not in large_project_sort_fields:
+        raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort}")
+    records = get_finished_job(job_id)["result"]["dashboard"].get(large_project_keys[field]) or []
+    
+    if sort in large_project_numeric_fields:
+        records = sorted(records, key=lambda record: float(record[sort] or 0), reverse=order == "desc")
+    elif sort:
+        records = sorted(records, key=lambda record: str(record[sort] or "").lower(), reverse=order == "desc")
+    
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 100)
+    start = (page - 1) * page_size
+    return {
+        "items": records[start:start + page_size],
+        "total": len(records),
+        "page": page,
+        "page_size": page_size,
+    }
+
+def job_cube(job):
+    """任务结果中的数据立方体，首次查询时转换为numpy数组并保存在任务结果中"""
+    result = job["result"]
+    if "cube_arrays" not in result:
+        payload = result["dashboard"].get("cube")
+        if payload is None:
+            raise HTTPException(status_code=404, detail="该结果没有数据立方体")
+        result["cube_arrays"] = load_cube(payload)
+    return result["cube_arrays"]
+
+@app.get("/jobs/{job_id}/cube")
+async def get_job_cube(job_id: str, request: Request, group_by: str = "", limit: int = 0):
+    """数据立方体的切片和上卷查询
+    
+    group_by为逗号分隔的维度（district、field、source、industry、nature、warning_type），为空时只返回合计；
+    维度名作为查询参数时按取值过滤，多个取值用逗号分隔或重复参数，空字符串表示未填写；
+    limit限制返回的行数（按条数从多到少），为0时不限制。dimensions中返回各维度的全部取值
+    """
+    job = get_finished_job(job_id)
+    dims = [dim for dim in group_by.split(",") if dim]
+    unknown = [dim for dim in dims if dim not in cube_dimensions]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的维度: {', '.join(unknown)}")
+    if len(set(dims)) != len(dims):
+        raise HTTPException(status_code=400, detail="group_by中的维度不能重复")
+    filters = {}
+    for dim in cube_dimensions:
+        values = request.query_params.getlist(dim)
+        if values:
+            filters[dim] = [value for param in values for value in param.split(",")]
+    
+    def run_query():
+        cube = job_cube(job)
+        result = query_cube(cube, dims, filters, limit or None)
+        result["dimensions"] = cube["labels"]
+        return result
+    return await asyncio.to_thread(run_query)
+
+# 主进程中最近查询过的汇总表及其列索引
+summary_indexes = SummaryIndexCache(summary_store, restore=apply_summary_schema,
+                                    max_entries=int(os.environ.get("SUMMARY_INDEX_ENTRIES", 4)),
+                                    max_bytes=int(os.environ.get("SUMMARY_INDEX_MAX_BYTES", 1024 * 1024 * 1024)))
+# 汇总表查询的保留参数，其余参数均为过滤条件
+summary_query_params = {"columns", "limit", "after"}
+
+def parse_summary_filters(request, columns):
+    """解析汇总表查询的过滤条件：列名=取值（逗号分隔或重复参数）为等值过滤，列名__gt/__gte/__lt/__lte=数值为区间过滤"""
+    equals, ranges = {}, []
+    for key, value in request.query_params.multi_items():
+        if key in summary_query_params:
+            continue
+        column, _, operator = key.partition("__")
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"未知的列: {column}")
+        if not operator:
+            equals.setdefault(column, []).extend(value.split(","))
+            continue
+        if operator not in range_operators:
+            raise HTTPException(status_code=400, detail=f"不支持的运算符: {operator}")
+        if column not in range_columns:
+            raise HTTPException(status_code=400, detail=f"{column}不支持区间过滤，只支持: {', '.join(range_columns)}")
+        try:
+            ranges.append((column, operator, float(value)))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{key}需要数值: {value}")
+    return equals, ranges
+
+@app.get("/jobs/{job_id}/summary")
+async def get_job_summary(job_id: str, request: Request, columns: str = "", limit: int = 50, after: int = 0):
+    """按条件查询任务保留的汇总表，按序号做键集分页
+    
+    columns为逗号分隔的返回列，为空时返回全部列；列名作为查询参数时按取值过滤（多个取值用逗号分隔或重复参数，
+    空字符串表示未填写），序号、预警天数、涉及人数、涉及金额还支持__gt/__gte/__lt/__lte区间过滤；
+    after为上一页返回的next_after，limit最大为1000
+    """
+    summary_id = get_finished_job(job_id)["result"]["dashboard"].get("summary_id")
+    if not summary_id:
+        raise HTTPException(status_code=404, detail="该结果没有保留汇总表")
+    index = await asyncio.to_thread(summary_indexes.get, summary_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="汇总表已被清理，请重新处理")
+    available = index.columns
+    selected = [column for column in columns.split(",") if column]
+    unknown = [column for column in selected if column not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的列: {', '.join(unknown)}")
+    equals, ranges = parse_summary_filters(request, available)
+    return await asyncio.to_thread(index.query, selected, equals, ranges, after, min(max(limit, 1), 1000))
+
+# 全文检索结果中附带的汇总表列
+search_result_columns = ["序号", "流水号", "事件来源", "所属区域", "所涉领域", "所涉项目（企业）"]
+
+@app.get("/jobs/{job_id}/search")
+async def search_job_summary(job_id: str, q: str, offset: int = 0, limit: int = 20):
+    """在任务保留的汇总表中全文检索诉求标题、诉求内容、预警原因（只检索这一次上传的线索）
+    
+    q中空格分隔的多个词需要同时出现，结果按相关度排列，snippet为用<mark>标记匹配位置的摘要（已转义HTML）；
+    offset、limit分页，limit最大为100
+    """
+    summary_id = get_finished_job(job_id)["result"]["dashboard"].get("summary_id")
+    if not summary_id:
+        raise HTTPException(status_code=404, detail="该结果没有保留汇总表")
+    index = await asyncio.to_thread(summary_indexes.get, summary_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="汇总表已被清理，请重新处理")
+    
+    def run_search():
+        result = index.search(q, max(offset, 0), min(max(limit, 1), 100))
+        if result is None:
+            raise HTTPException(status_code=404, detail="该结果没有全文检索索引，请重新处理")
+        columns = [column for column in search_result_columns if column in index.df.columns]
+        rows = index.df.iloc[[item["row"] for item in result["results"]]][columns]
+        for item, values in zip(result["results"], rows.astype(object).where(rows.notna(), None).values.tolist()):
+            item.update(zip(columns, values))
+            del item["row"]
+        return result
+    return await asyncio.to_thread(run_search)
+
+@app.get("/clues/periods")
+async def get_clue_periods():
+    """线索库中各期的线索数量"""
+    return await asyncio.to_thread(clue_store.periods)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """结果缓存的命中、未命中次数和占用空间"""
+    return result_cache.stats()
+
+@app.get("/mappings")
+async def get_mappings():
+    """当前使用的区域映射配置及其版本号（结果缓存、解析缓存的键包含该版本号），配置文件已修改时先重新加载"""
+    mappings = mapping_config.refresh()
+    return {
+        "version": mappings.version,
+        "label": mappings.label,
+        "path": mapping_config.path,
+        "loaded_at": datetime.fromtimestamp(mapping_config.loaded_at).isoformat(timespec="seconds"),
+        "district_mapping": mappings.district_mapping,
+        "valid_districts": mappings.valid_districts,
+        "district_boss_mapping": mappings.district_boss_mapping,
+    }
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "collapsed"):
+    """下载性能剖析结果：format为collapsed（折叠调用栈，用于火焰图）或pstats（cProfile统计）
+    
+    配置了PROFILE_ADMIN_TOKEN时需要在X-Profile-Token请求头中提供令牌
+    """
+    if profile_admin_token and not has_profile_token(request):
+        raise HTTPException(status_code=403, detail="需要有效的X-Profile-Token请求头")
+    path = profile_path(profile_dir, profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=400, detail=f"不合法的剖析id或格式: {profile_id}, {format}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="剖析结果不存在或已被清理")
+    media_type = "text/plain; charset=utf-8" if format == "collapsed" else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus格式的处理指标：各阶段耗时、CPU时间、峰值内存增量、输入输出规模的直方图和处理请求数"""
+    return Response(pipeline_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # 运行应用
 # if __name__ == "__main__":
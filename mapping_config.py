@@ -0,0 +1,142 @@
+"""区域映射配置：区域别名映射、有效区域列表和专班包保人从JSON配置文件读取
+
+配置文件加载时编译为查找结构（关键字匹配器等），版本号为三张映射表内容的哈希，
+结果缓存和解析缓存的键包含版本号，映射表变化后旧的缓存自动失效。
+文件修改后在下一次检查时自动重新加载（不需要重启服务），新文件有错误时继续使用之前的映射表
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+
+class MappingConfigError(ValueError):
+    """配置文件格式错误"""
+
+
+# 区域关键字匹配器
+def compile_district_matcher(keywords):
+    """将关键字按优先级编译为一个交替正则
+
+    正则使用前瞻断言，finditer可以找出所有（包括重叠的）匹配位置；
+    同一位置按关键字顺序取第一个匹配，优先级与逐个关键字做子串判断一致
+    """
+    keywords = list(keywords)
+    pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in keywords) + "))")
+    priority = {keyword: index for index, keyword in enumerate(keywords)}
+    return pattern, priority
+
+
+def match_district_keyword(matcher, text):
+    """返回文本中出现的优先级最高的关键字，没有则返回None"""
+    pattern, priority = matcher
+    matched = [match.group(1) for match in pattern.finditer(text)]
+    if not matched:
+        return None
+    return min(matched, key=priority.__getitem__)
+
+
+def mapping_tables_version(district_mapping, valid_districts, district_boss_mapping):
+    """映射表内容的哈希，只与三张表的内容有关，与配置文件的格式和version标签无关"""
+    return hashlib.sha256(
+        json.dumps([district_mapping, valid_districts, district_boss_mapping], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+class MappingTables:
+    """编译后的映射表，加载后不再修改"""
+
+    def __init__(self, district_mapping, valid_districts, district_boss_mapping, label=None):
+        self.district_mapping = district_mapping
+        self.valid_districts = valid_districts
+        self.district_boss_mapping = district_boss_mapping
+        self.label = label
+        self.version = mapping_tables_version(district_mapping, valid_districts, district_boss_mapping)
+        # 映射关键字和有效区域的匹配器，加载时编译一次
+        self.district_mapping_matcher = compile_district_matcher(district_mapping)
+        self.valid_district_matcher = compile_district_matcher(valid_districts)
+
+
+def string_dict(config, key):
+    value = config.get(key)
+    if not isinstance(value, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in value.items()):
+        raise MappingConfigError(f"{key}必须是文本到文本的映射")
+    return value
+
+
+def parse_mapping_tables(content):
+    """解析配置文件内容并检查：映射目标和包保人的区域都必须在有效区域列表中"""
+    try:
+        config = json.loads(content)
+    except ValueError as e:
+        raise MappingConfigError(f"不是有效的JSON: {e}")
+    if not isinstance(config, dict):
+        raise MappingConfigError("配置文件必须是JSON对象")
+    district_mapping = string_dict(config, "district_mapping")
+    district_boss_mapping = string_dict(config, "district_boss_mapping")
+    valid_districts = config.get("valid_districts")
+    if not isinstance(valid_districts, list) or not valid_districts \
+            or not all(isinstance(district, str) and district for district in valid_districts):
+        raise MappingConfigError("valid_districts必须是非空的区域名称列表")
+    if len(set(valid_districts)) != len(valid_districts):
+        raise MappingConfigError("valid_districts中有重复的区域")
+    if not district_mapping or not all(district_mapping):
+        raise MappingConfigError("district_mapping不能为空，也不能包含空的别名")
+    unknown = sorted(set(district_mapping.values()) - set(valid_districts))
+    if unknown:
+        raise MappingConfigError(f"district_mapping映射到了不在valid_districts中的区域: {', '.join(unknown)}")
+    unknown = sorted(set(district_boss_mapping) - set(valid_districts))
+    if unknown:
+        raise MappingConfigError(f"district_boss_mapping中有不在valid_districts中的区域: {', '.join(unknown)}")
+    return MappingTables(district_mapping, valid_districts, district_boss_mapping, config.get("version"))
+
+
+class MappingConfig:
+    """当前使用的映射表；refresh()最多每check_interval秒检查一次文件的修改时间和大小，变化时重新加载"""
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.signature = self.file_signature()
+        with open(path, "rb") as f:
+            self.tables = parse_mapping_tables(f.read())
+        self.loaded_at = time.time()
+        self.checked_at = time.monotonic()
+
+    def file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """返回最新的映射表；文件已修改时重新加载，加载失败时打印错误并继续使用之前的映射表"""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return self.tables
+        with self.lock:
+            if now - self.checked_at < self.check_interval:
+                return self.tables
+            self.checked_at = now
+            try:
+                signature = self.file_signature()
+                if signature == self.signature:
+                    return self.tables
+                with open(self.path, "rb") as f:
+                    tables = parse_mapping_tables(f.read())
+            except OSError as e:
+                # 编辑器保存文件时可能短暂不存在，下次检查时重试
+                print(f"读取区域映射配置失败，继续使用版本{self.tables.version}: {e}")
+                return self.tables
+            except MappingConfigError as e:
+                # 同一个有错误的文件只提示一次
+                self.signature = signature
+                print(f"区域映射配置有错误，继续使用版本{self.tables.version}: {e}")
+                return self.tables
+            self.signature = signature
+            if tables.version != self.tables.version:
+                print(f"区域映射配置已重新加载: 版本{self.tables.version} -> {tables.version}")
+            self.tables = tables
+            self.loaded_at = time.time()
+            return self.tables
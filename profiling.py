@@ -0,0 +1,142 @@
+"""按请求开启的性能剖析：在工作进程中用cProfile剖析处理流程，同时按固定间隔采样调用栈
+
+结果保存为两个文件：{profile_id}.pstats（可用pstats、snakeviz等查看）和
+{profile_id}.collapsed（折叠调用栈文本，每行“帧;帧;... 次数”，可直接交给flamegraph.pl或speedscope）
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+
+# 剖析结果的文件格式：格式名 -> 扩展名
+profile_formats = {"pstats": ".pstats", "collapsed": ".collapsed"}
+# 剖析id只允许32位十六进制，防止下载时访问目录外的文件
+profile_id_pattern = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_profile_id():
+    return uuid.uuid4().hex
+
+
+def profile_path(directory, profile_id, fmt):
+    """剖析结果文件路径，剖析id或格式不合法时返回None"""
+    if not profile_id_pattern.match(profile_id) or fmt not in profile_formats:
+        return None
+    return os.path.join(directory, profile_id + profile_formats[fmt])
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """后台线程按interval秒的间隔采样目标线程的调用栈，按折叠格式计数
+
+    root_code为开始采样的函数，调用栈只记录它调用的帧，不含进程池工作进程的启动代码
+    """
+
+    def __init__(self, thread_id, root_code=None, interval=0.005):
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.counts = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+def modified_time(path):
+    """文件的修改时间，文件已被其他进程删除时返回0"""
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+def prune_profiles(directory, keep):
+    """只保留最近的keep次剖析结果，删除更早的文件"""
+    paths = {}
+    for name in os.listdir(directory):
+        profile_id, ext = os.path.splitext(name)
+        if ext in profile_formats.values():
+            paths.setdefault(profile_id, []).append(os.path.join(directory, name))
+    ordered = sorted(paths.values(), key=lambda files: max(modified_time(path) for path in files), reverse=True)
+    for files in ordered[keep:]:
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# 同一进程中同时只能有一个剖析（Python 3.12起cProfile不能同时启用多个）；
+# 进程池的工作进程一次只处理一个任务，只有线程执行器会同时收到多个剖析请求
+profile_lock = threading.Lock()
+
+
+def profiled_call(profile_id, directory, keep, func, *args):
+    """剖析func(*args)的执行，保存pstats和折叠调用栈文件后返回func的返回值
+
+    在工作进程中调用；func抛出异常时同样保存已经采集到的剖析结果。
+    本进程中已有其他剖析正在进行，或无法启用cProfile时不剖析，输出警告后照常执行func
+    """
+    if not profile_lock.acquire(blocking=False):
+        print(f"性能剖析{profile_id}跳过：本进程中已有其他剖析正在进行，按普通方式处理")
+        return func(*args)
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            print(f"性能剖析{profile_id}跳过：无法启用cProfile（{e}），按普通方式处理")
+            return func(*args)
+        return profile_and_save(profiler, profile_id, directory, keep, func, *args)
+    finally:
+        profile_lock.release()
+
+
+def profile_and_save(profiler, profile_id, directory, keep, func, *args):
+    """profiler已经启用（持有profile_lock），执行func(*args)，结束后停止剖析并保存结果"""
+    started_at = time.perf_counter()
+    sampler = StackSampler(threading.get_ident(), sys._getframe().f_code)
+    try:
+        with sampler:
+            return func(*args)
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(profile_path(directory, profile_id, "pstats"))
+        with open(profile_path(directory, profile_id, "collapsed"), "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        prune_profiles(directory, keep)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        print(f"性能剖析{profile_id}完成，耗时{time.perf_counter() - started_at:.2f}s，累计耗时最多的函数:")
+        print(summary.getvalue())
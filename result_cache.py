@@ -0,0 +1,166 @@
+"""处理结果缓存：按上传文件内容哈希保存生成的Excel文件和数据看板数据"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def content_digest(content):
+    """文件内容的SHA-256摘要"""
+    return hashlib.sha256(content).digest()
+
+
+def result_cache_key(file_12345_digest, file_anxin_digest, mapping_version, current_date):
+    """由两个上传文件内容的SHA-256摘要、映射表版本和日期计算缓存键
+
+    日期会写入文件名、基本情况和统计表，所以也是键的一部分；
+    流式处理时摘要在写入临时文件的同时计算，不需要把文件读入内存
+    """
+    digest = hashlib.sha256()
+    for part in (file_12345_digest,
+                 file_anxin_digest,
+                 mapping_version.encode("utf-8"),
+                 current_date.encode("utf-8")):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """按总字节数淘汰的LRU缓存
+
+    directory为空时保存在内存中，否则每个结果保存为目录下的{key}.xlsx和{key}.json，
+    重启后按文件修改时间恢复LRU顺序；max_bytes为0时不缓存
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()  # key -> 内存模式下为(workbook, dashboard_json, size)，磁盘模式下为size
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.load_index()
+
+    def entry_paths(self, key):
+        return os.path.join(self.directory, f"{key}.xlsx"), os.path.join(self.directory, f"{key}.json")
+
+    def load_index(self):
+        """扫描缓存目录，按修改时间从旧到新重建索引"""
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".xlsx"):
+                continue
+            key = name[:-len(".xlsx")]
+            workbook_path, dashboard_path = self.entry_paths(key)
+            try:
+                size = os.path.getsize(workbook_path) + os.path.getsize(dashboard_path)
+                mtime = os.path.getmtime(workbook_path)
+            except OSError:
+                continue
+            found.append((mtime, key, size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self.evict()
+
+    def get(self, key):
+        """命中时返回(workbook_bytes, dashboard_data)，否则返回None"""
+        if self.max_bytes <= 0:
+            return None
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            if self.directory:
+                workbook_path, dashboard_path = self.entry_paths(key)
+                try:
+                    with open(workbook_path, "rb") as f:
+                        workbook = f.read()
+                    with open(dashboard_path, "rb") as f:
+                        dashboard_json = f.read()
+                    os.utime(workbook_path)
+                except OSError:
+                    # 缓存文件被外部删除，视为未命中
+                    self.remove(key)
+                    self.misses += 1
+                    return None
+            else:
+                workbook, dashboard_json, _ = self.entries[key]
+            self.hits += 1
+        return workbook, json.loads(dashboard_json)
+
+    def put(self, key, workbook, dashboard_data):
+        """保存结果，超过容量时淘汰最久未使用的结果；单个结果超过容量时不保存"""
+        dashboard_json = json.dumps(dashboard_data, ensure_ascii=False).encode("utf-8")
+        size = len(workbook) + len(dashboard_json)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if self.directory:
+                workbook_path, dashboard_path = self.entry_paths(key)
+                try:
+                    # 先写JSON再写Excel：索引以Excel文件为准，不会读到不完整的结果
+                    self.write_file(dashboard_path, dashboard_json)
+                    self.write_file(workbook_path, workbook)
+                except OSError as e:
+                    print(f"写入结果缓存失败: {str(e)}")
+                    return
+                self.entries[key] = size
+            else:
+                self.entries[key] = (workbook, dashboard_json, size)
+            self.total_bytes += size
+            self.evict()
+
+    def write_file(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def entry_size(self, key):
+        entry = self.entries[key]
+        return entry if self.directory else entry[2]
+
+    def remove(self, key):
+        """删除一个结果（调用方需持有锁）"""
+        self.total_bytes -= self.entry_size(key)
+        del self.entries[key]
+        if self.directory:
+            for path in self.entry_paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def evict(self):
+        """淘汰最久未使用的结果直到总大小不超过上限（调用方需持有锁）"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "storage": "disk" if self.directory else "memory",
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
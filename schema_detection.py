@@ -0,0 +1,289 @@
+"""表头识别：解析前只读取上传文件的前几行，找到表头行并把列名的不同写法对应到标准列名
+
+列名比较前做NFKC规范化（全角括号、字母转半角）、去掉所有空白并转为小写，
+例如“所涉项目(企业)”“所涉项目（企业） ”都对应“所涉项目（企业）”；规范化后仍不相同的列名
+再去掉括号中的内容比较（“涉及金额（元）”对应“涉及金额”），最后按相似度匹配。
+缺少关键列时拒绝处理，缺少其他列或按相似度匹配时给出提示；xlsx文件直接读取压缩包中的XML，
+只解析前几行和它们用到的共享字符串，耗时与文件大小无关
+"""
+import difflib
+import io
+import posixpath
+import re
+import time
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+# 在前多少行中查找表头行
+header_search_rows = 10
+# 检查表头行之后的多少行数据
+sample_rows = 5
+# 表头行至少要包含多少个已知的列名
+min_header_matches = 3
+# 按相似度匹配列名的最低相似度
+fuzzy_cutoff = 0.8
+
+# 读取共享字符串表时每次解压的字节数
+read_block_bytes = 1024 * 1024
+
+cell_reference_pattern = re.compile(r"([A-Z]+)")
+
+
+class SchemaError(ValueError):
+    """上传文件的表头不符合要求，异常信息直接返回给前端"""
+
+
+def normalize_header(name):
+    """列名比较用的规范形式：NFKC规范化、去掉所有空白、转为小写"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(name))).lower()
+
+
+def strip_brackets(name):
+    """去掉规范形式中括号及括号中的内容"""
+    return re.sub(r"[(\[【][^)\]】]*[)\]】]", "", name)
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def column_index(reference):
+    """单元格引用（如“AB12”）的列号，从0开始"""
+    index = 0
+    for char in cell_reference_pattern.match(reference).group(1):
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
+
+
+def first_sheet_path(archive):
+    """第一个工作表在压缩包中的路径"""
+    try:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        sheet = next(element for element in workbook.iter() if local_name(element.tag) == "sheet")
+        relation_id = next(value for key, value in sheet.attrib.items() if local_name(key) == "id")
+        relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        target = next(element.get("Target") for element in relations.iter()
+                      if local_name(element.tag) == "Relationship" and element.get("Id") == relation_id)
+    except (KeyError, StopIteration):
+        return "xl/worksheets/sheet1.xml"
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+
+def cell_text(element):
+    """<si>或<is>中的文本（含富文本的各段，不含注音）"""
+    parts = []
+    for child in element:
+        name = local_name(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(grandchild.text or "" for grandchild in child if local_name(grandchild.tag) == "t")
+    return "".join(parts)
+
+
+def shared_strings(archive, indexes):
+    """读取编号在indexes中的共享字符串，返回编号 -> 文本
+
+    pandas按列写入单元格，第一行的字符串编号可能接近共享字符串表的末尾；表中的条目按“<si”计数定位，
+    只解析需要的条目，不为其余几十万个条目建立XML元素
+    """
+    strings = {}
+    remaining = sorted(set(indexes))
+    if not remaining or "xl/sharedStrings.xml" not in archive.namelist():
+        return strings
+    next_index = 0
+    buffer = b""
+    with archive.open("xl/sharedStrings.xml") as f:
+        while remaining:
+            block = f.read(read_block_bytes)
+            buffer += block
+            # 最后一个条目可能不完整，留到下一块
+            cut = buffer.rfind(b"<si") if block else len(buffer)
+            if cut <= 0:
+                if not block:
+                    break
+                continue
+            complete, buffer = buffer[:cut], buffer[cut:]
+            count = complete.count(b"<si")
+            if remaining[0] < next_index + count:
+                starts = [match.start() for match in re.finditer(b"<si", complete)] + [len(complete)]
+                while remaining and remaining[0] < next_index + count:
+                    offset = remaining[0] - next_index
+                    entry = complete[starts[offset]:starts[offset + 1]].split(b"</sst", 1)[0]
+                    strings[remaining.pop(0)] = cell_text(ET.fromstring(entry))
+            next_index += count
+            if not block:
+                break
+    return strings
+
+
+def cell_value(cell):
+    """单元格的值：共享字符串返回("s", 编号)，其余返回文本、数值或布尔值"""
+    kind = cell.get("t")
+    value = None
+    for child in cell:
+        name = local_name(child.tag)
+        if name == "v":
+            value = child.text
+        elif name == "is":
+            return cell_text(child)
+    if value is None:
+        return None
+    if kind == "s":
+        return ("s", int(value))
+    if kind == "b":
+        return value == "1"
+    if kind in ("str", "e", "inlineStr"):
+        return value
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def xlsx_head_rows(source, max_rows):
+    """读取xlsx文件第一个工作表的前max_rows行（含空行），返回各行的值列表；source为文件路径或内容"""
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source) as archive:
+        rows = {}
+        with archive.open(first_sheet_path(archive)) as f:
+            next_index = 0
+            for _, element in ET.iterparse(f, events=("end",)):
+                if local_name(element.tag) != "row":
+                    continue
+                index = int(element.get("r")) - 1 if element.get("r") else next_index
+                if index >= max_rows:
+                    break
+                cells = {}
+                for position, cell in enumerate(child for child in element if local_name(child.tag) == "c"):
+                    reference = cell.get("r")
+                    cells[column_index(reference) if reference else position] = cell_value(cell)
+                rows[index] = cells
+                next_index = index + 1
+                element.clear()
+        strings = shared_strings(archive, [value[1] for cells in rows.values() for value in cells.values()
+                                           if isinstance(value, tuple)])
+
+    def resolve(value):
+        if isinstance(value, tuple):
+            return strings.get(value[1])
+        return value
+
+    result = []
+    for index in range(max(rows) + 1 if rows else 0):
+        cells = rows.get(index, {})
+        width = max(cells) + 1 if cells else 0
+        result.append([resolve(cells.get(position)) for position in range(width)])
+    return result
+
+
+def head_rows(source, max_rows):
+    """读取前max_rows行；xls等非zip格式的文件交给pandas读取"""
+    if isinstance(source, bytes):
+        is_zip = source.startswith(b"PK")
+    else:
+        with open(source, "rb") as f:
+            is_zip = f.read(2) == b"PK"
+    if is_zip:
+        try:
+            return xlsx_head_rows(source, max_rows)
+        except (zipfile.BadZipFile, ET.ParseError, KeyError) as e:
+            raise SchemaError(f"无法读取Excel文件: {e}")
+    df = pd.read_excel(io.BytesIO(source) if isinstance(source, bytes) else source, header=None, nrows=max_rows)
+    return [[None if pd.isna(value) else value for value in row] for row in df.itertuples(index=False, name=None)]
+
+
+class SchemaReport:
+    """表头识别的结果
+
+    header_row为表头所在行（从0开始，即pandas.read_excel的header参数），columns为文件中的列名 -> 标准列名，
+    missing为缺少的列，warnings为需要提示用户的问题
+    """
+
+    def __init__(self, header_row, columns, missing, warnings, elapsed):
+        self.header_row = header_row
+        self.columns = columns
+        self.missing = missing
+        self.warnings = warnings
+        self.elapsed = elapsed
+
+    @property
+    def renamed(self):
+        """列名与标准列名不同的列"""
+        return {name: canonical for name, canonical in self.columns.items() if name != canonical}
+
+
+def match_header(header, columns):
+    """把表头行中的列名对应到标准列名，返回(文件中的列名 -> 标准列名, 按相似度匹配的说明)"""
+    canonical = {normalize_header(column): column for column in columns}
+    mapping = {}
+    unmatched = []
+    for name in header:
+        if not isinstance(name, str) or not name.strip() or name in mapping:
+            continue
+        column = canonical.get(normalize_header(name))
+        if column is not None and column not in mapping.values():
+            mapping[name] = column
+        else:
+            unmatched.append(name)
+
+    notes = []
+    for column in columns:
+        if column in mapping.values() or not unmatched:
+            continue
+        stripped = strip_brackets(normalize_header(column))
+        name = next((name for name in unmatched if strip_brackets(normalize_header(name)) == stripped), None)
+        if name is not None:
+            mapping[name] = column
+            unmatched.remove(name)
+            notes.append(f"列“{name}”读取为“{column}”")
+            continue
+        scores = [(difflib.SequenceMatcher(None, normalize_header(column), normalize_header(name)).ratio(), name)
+                  for name in unmatched]
+        score, name = max(scores)
+        if score >= fuzzy_cutoff:
+            mapping[name] = column
+            unmatched.remove(name)
+            notes.append(f"列“{name}”按相近的列名读取为“{column}”")
+    return mapping, notes
+
+
+def detect_schema(source, columns, required_columns=(), label="文件"):
+    """识别source（文件路径或内容）的表头行和列名
+
+    columns为需要读取的标准列名，required_columns中的列缺失时抛出SchemaError，其余列缺失时只提示
+    """
+    started_at = time.perf_counter()
+    rows = head_rows(source, header_search_rows + sample_rows)
+    best_row, best_mapping, best_notes = None, {}, []
+    for index, row in enumerate(rows[:header_search_rows]):
+        mapping, notes = match_header(row, columns)
+        if len(mapping) > len(best_mapping):
+            best_row, best_mapping, best_notes = index, mapping, notes
+    if best_row is None or len(best_mapping) < min(min_header_matches, len(columns)):
+        raise SchemaError(f"{label}的前{header_search_rows}行中找不到表头行（需要包含{'、'.join(columns[:5])}等列），"
+                          f"请确认上传的是正确的文件")
+
+    warnings = list(best_notes)
+    if best_row > 0:
+        warnings.append(f"表头在第{best_row + 1}行，跳过前{best_row}行")
+    missing = [column for column in columns if column not in best_mapping.values()]
+    missing_required = [column for column in missing if column in required_columns]
+    if missing_required:
+        raise SchemaError(f"{label}缺少必需的列: {'、'.join(missing_required)}，"
+                          f"文件中的列为: {'、'.join(str(name) for name in rows[best_row] if name is not None)}")
+    if missing:
+        warnings.append(f"缺少列{'、'.join(missing)}，按空值处理")
+
+    data_rows = [row for row in rows[best_row + 1:] if any(value is not None and value != "" for value in row)]
+    if not data_rows:
+        warnings.append("表头之后没有数据行")
+    else:
+        positions = {column: rows[best_row].index(name) for name, column in best_mapping.items()}
+        for column in required_columns:
+            position = positions[column]
+            if all(position >= len(row) or row[position] in (None, "") for row in data_rows):
+                warnings.append(f"前{len(data_rows)}行数据的“{column}”均为空")
+
+    return SchemaReport(best_row, best_mapping, missing, [f"{label}: {warning}" for warning in warnings],
+                        time.perf_counter() - started_at)
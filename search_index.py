@@ -0,0 +1,303 @@
+"""全文检索：对诉求标题、诉求内容、预警原因建立倒排索引，按相关度排序并返回带高亮的摘要
+
+文本先做NFKC规范化（全角字母数字转半角）并转为小写，汉字和字母数字按单字和相邻两字（二元组）切分，
+其他字符（标点、空格等）作为分隔；查询词同样切分后取各词的全部二元组（单字词取单字），
+包含全部二元组的线索为候选，按BM25（标题、预警原因的权重高于诉求内容）排序，返回前确认查询词确实出现。
+索引在保留汇总表时随汇总表逐批建立（流式处理时每批一次），与汇总表一起保存；
+加载时以内存映射方式打开索引文件中的数组，占用的是可以回收的页缓存，不计入进程的堆内存
+"""
+import html
+import math
+import os
+import re
+import struct
+import unicodedata
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# 检索的列 -> 权重（词频乘以权重计入相关度）
+search_fields = {"诉求标题": 3, "诉求内容": 1, "预警原因": 2}
+# BM25参数
+bm25_k1 = 1.2
+bm25_b = 0.75
+# 参与切分的字符：汉字（含扩展A区）和字母数字，其余字符作为分隔
+word_pattern = re.compile(r"[0-9a-z㐀-䶿一-鿿]+")
+# 摘要长度（字符数）
+snippet_chars = 60
+
+
+def normalize_text(text):
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def word_mask(codes):
+    """码位数组中参与切分的字符"""
+    return (((codes >= 0x4E00) & (codes <= 0x9FFF)) | ((codes >= 0x3400) & (codes <= 0x4DBF))
+            | ((codes >= 0x30) & (codes <= 0x39)) | ((codes >= 0x61) & (codes <= 0x7A)))
+
+
+def text_terms(series):
+    """把一列文本切分为词：返回(词, 所在行)两个数组
+
+    单字的词为其码位，二元组的词为前一字码位左移21位加后一字码位（码位小于2^21，两类词不会重复）
+    """
+    texts = series.astype("string").fillna("").str.normalize("NFKC").str.lower()
+    # 各行用\x00连接后一次转换为码位数组，分隔符不是可切分字符，二元组不会跨行
+    joined = "\x00".join(texts.tolist()) + "\x00"
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    rows = np.concatenate(([0], np.cumsum(codes[:-1] == 0)))
+    words = word_mask(codes)
+    unigram = np.flatnonzero(words)
+    bigram = np.flatnonzero(words[:-1] & words[1:])
+    terms = np.concatenate((codes[unigram], (codes[bigram] << np.uint64(21)) | codes[bigram + 1]))
+    return terms, np.concatenate((rows[unigram], rows[bigram]))
+
+
+def query_terms(word):
+    """查询词的检索词：两个字以上时为全部二元组，否则为单字"""
+    codes = [ord(char) for char in word]
+    if len(codes) == 1:
+        return [codes[0]]
+    return list(dict.fromkeys((first << 21) | second for first, second in zip(codes, codes[1:])))
+
+
+class SearchIndexBuilder:
+    """逐批加入汇总表的行，最后生成按词排序的倒排表；文档编号为行在汇总表中的位置
+
+    每批按(词, 行, 字段)打包为一个64位整数排序后合并同一行同一词的加权词频（词42位、批内行号16位、字段2位），
+    因此每次最多切分block_rows（不超过65536）行；各批的结果最后按词分组拼接，不需要再次排序
+    """
+
+    block_rows = 65536
+
+    def __init__(self):
+        self.parts = []
+        self.lengths = []
+        self.rows = 0
+
+    def add(self, df):
+        for start in range(0, len(df), self.block_rows):
+            self.add_block(df.iloc[start:start + self.block_rows])
+
+    def add_block(self, df):
+        keys = []
+        weights = np.array(list(search_fields.values()), dtype=np.int64)
+        for field_id, column in enumerate(search_fields):
+            if column in df.columns:
+                terms, rows = text_terms(df[column])
+                keys.append((terms << np.uint64(18)) | (rows.astype(np.uint64) << np.uint64(2)) | np.uint64(field_id))
+        keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, dtype=np.uint64)
+        field_weights = weights[(keys & np.uint64(3)).astype(np.int64)]
+        pairs = keys >> np.uint64(2)
+        starts = np.flatnonzero(np.concatenate(([True], pairs[1:] != pairs[:-1]))) if len(pairs) else np.empty(0, dtype=np.int64)
+        frequencies = np.add.reduceat(field_weights, starts) if len(starts) else np.empty(0, dtype=np.int64)
+        pairs = pairs[starts]
+        rows = (pairs & np.uint64(0xFFFF)).astype(np.int64)
+        terms = pairs >> np.uint64(16)
+        term_starts = np.flatnonzero(np.concatenate(([True], terms[1:] != terms[:-1]))) if len(terms) else np.empty(0, dtype=np.int64)
+        self.parts.append({
+            "terms": terms[term_starts],
+            "counts": np.diff(np.append(term_starts, len(terms))),
+            "docs": (rows + self.rows).astype(np.int32),
+            "frequencies": np.minimum(frequencies, 65535).astype(np.uint16),
+        })
+        self.lengths.append(np.bincount(rows, weights=frequencies, minlength=len(df)).astype(np.float32))
+        self.rows += len(df)
+
+    def arrays(self):
+        """合并各批：按全部批的词表计算每个词的起始位置，各批按顺序填入，同一词的行号保持从小到大"""
+        vocabulary = np.unique(np.concatenate([part["terms"] for part in self.parts])) if self.parts else np.empty(0, dtype=np.uint64)
+        counts = np.zeros(len(vocabulary), dtype=np.int64)
+        for part in self.parts:
+            part["ids"] = np.searchsorted(vocabulary, part["terms"])
+            counts[part["ids"]] += part["counts"]
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        docs = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.uint16)
+        cursor = offsets[:-1].copy()
+        for part in self.parts:
+            run_starts = np.concatenate(([0], np.cumsum(part["counts"])[:-1]))
+            destination = np.repeat(cursor[part["ids"]] - run_starts, part["counts"]) + np.arange(len(part["docs"]))
+            docs[destination] = part["docs"]
+            frequencies[destination] = part["frequencies"]
+            cursor[part["ids"]] += part["counts"]
+        return {
+            "terms": vocabulary,
+            "offsets": offsets,
+            "docs": docs,
+            "frequencies": frequencies,
+            "lengths": np.concatenate(self.lengths) if self.lengths else np.empty(0, dtype=np.float32),
+        }
+
+    def save(self, path):
+        """写入临时文件后改名，读取方不会读到写了一半的文件"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **self.arrays())
+        os.replace(tmp_path, path)
+
+
+def load_npz_arrays(path):
+    """打开np.savez写入的npz文件中的数组：未压缩的成员直接内存映射（只读），压缩的成员整体读入"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # 本地文件头：30字节的固定部分，之后是文件名和扩展字段，再之后是.npy文件的内容
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if math.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+class SearchIndex:
+    """加载后的倒排索引；text_rows(行号数组)返回这些行的{列: 文本}，用于确认匹配和生成摘要"""
+
+    def __init__(self, arrays, text_rows):
+        self.terms = arrays["terms"]
+        self.offsets = arrays["offsets"]
+        self.docs = arrays["docs"]
+        self.frequencies = arrays["frequencies"]
+        self.lengths = arrays["lengths"]
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        self.text_rows = text_rows
+
+    @classmethod
+    def load(cls, path, text_rows):
+        return cls(load_npz_arrays(path), text_rows)
+
+    def postings(self, term):
+        """词的(行号数组, 词频数组)，词不存在时返回None"""
+        position = np.searchsorted(self.terms, term)
+        if position == len(self.terms) or self.terms[position] != term:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.docs[start:end], self.frequencies[start:end]
+
+    def candidates(self, terms):
+        """包含全部词的行号及BM25相关度，从最短的倒排表开始求交集"""
+        postings = [self.postings(term) for term in terms]
+        if not postings or any(posting is None for posting in postings):
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        postings.sort(key=lambda posting: len(posting[0]))
+        docs = postings[0][0]
+        for posting_docs, _ in postings[1:]:
+            docs = docs[np.isin(docs, posting_docs, assume_unique=True)]
+        scores = np.zeros(len(docs))
+        length_norm = bm25_k1 * (1 - bm25_b + bm25_b * self.lengths[docs] / max(self.average_length, 1e-9))
+        for posting_docs, frequencies in postings:
+            tf = frequencies[np.searchsorted(posting_docs, docs)].astype(np.float64)
+            idf = math.log(1 + (len(self.lengths) - len(posting_docs) + 0.5) / (len(posting_docs) + 0.5))
+            scores += idf * tf * (bm25_k1 + 1) / (tf + length_norm)
+        return docs, scores
+
+    def search(self, query, offset=0, limit=20):
+        """检索query（空格分隔的多个词需要同时出现），返回匹配总数和按相关度排列的第offset条起的limit条结果
+
+        total为包含查询词全部单字或二元组的行数；返回的结果已确认每个查询词都完整出现
+        """
+        words = list(dict.fromkeys(word_pattern.findall(normalize_text(query))))
+        terms = list(dict.fromkeys(term for word in words for term in query_terms(word)))
+        docs, scores = self.candidates(terms)
+        results = []
+        needed = offset + limit
+        ranked = 0
+        # 先取相关度最高的一部分候选确认匹配，不够时再扩大范围
+        batch = max(needed * 2, 64)
+        while len(results) < needed and ranked < len(docs):
+            order = ranked_order(docs, scores, ranked + batch)[ranked:ranked + batch]
+            texts = self.text_rows(docs[order])
+            for position, doc_texts in zip(order, texts):
+                snippet = best_snippet(doc_texts, words)
+                if snippet is not None:
+                    results.append({"row": int(docs[position]), "score": round(float(scores[position]), 4), **snippet})
+            ranked += len(order)
+            batch *= 4
+        return {"total": int(len(docs)), "words": words, "results": results[offset:needed]}
+
+
+def ranked_order(docs, scores, count):
+    """按相关度从高到低（相同时按行号）排列的前count个候选的下标，只对相关度不低于第count名的候选排序"""
+    if count < len(scores):
+        threshold = np.partition(scores, len(scores) - count)[len(scores) - count]
+        selected = np.flatnonzero(scores >= threshold)
+    else:
+        selected = np.arange(len(scores))
+    return selected[np.lexsort((docs[selected], -scores[selected]))]
+
+
+def best_snippet(texts, words):
+    """所有查询词都出现时返回第一个包含查询词的字段（按search_fields的顺序）中首次匹配附近的高亮摘要，否则返回None"""
+    normalized = {column: normalize_text(text) for column, text in texts.items() if text}
+    if not all(any(word in text for text in normalized.values()) for word in words):
+        return None
+    for column in search_fields:
+        text = normalized.get(column)
+        if not text:
+            continue
+        spans = match_spans(text, words)
+        if spans:
+            return {"field": column, "snippet": highlight(text, spans)}
+    return {"field": None, "snippet": ""}
+
+
+def match_spans(text, words):
+    """查询词在文本中出现的位置[(开始, 结束)]，重叠的位置合并"""
+    spans = []
+    for word in words:
+        start = text.find(word)
+        while start != -1:
+            spans.append((start, start + len(word)))
+            start = text.find(word, start + 1)
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def highlight(text, spans):
+    """以第一个匹配为中心截取摘要，转义HTML后用<mark>标记匹配位置"""
+    start = max(0, spans[0][0] - snippet_chars // 3)
+    end = min(len(text), start + snippet_chars)
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for span_start, span_end in spans:
+        if span_end <= start or span_start >= end:
+            continue
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        parts.append(html.escape(text[position:span_start]))
+        parts.append(f"<mark>{html.escape(text[span_start:span_end])}</mark>")
+        position = span_end
+    parts.append(html.escape(text[position:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+
+def frame_text_rows(df):
+    """返回text_rows函数：按行号读取汇总表中检索列的文本"""
+    columns = [column for column in search_fields if column in df.columns]
+
+    def text_rows(rows):
+        frame = df.iloc[rows][columns]
+        return [{column: value for column, value in zip(columns, values) if isinstance(value, str)}
+                for values in frame.itertuples(index=False, name=None)]
+    return text_rows
@@ -48,6 +48,37 @@ function generateDistrictRanking(data, containerId, isWarning = false) {
 }
 
 // 渲染数据看板
+// 散点图数据按列传输，转换为[序号, 人数, 金额]数据点
+function scatterPoints(columns) {
+    return columns.id.map((id, i) => [id, columns.people[i], columns.amount[i]]);
+}
+
+// 数据立方体查询：按groupBy中的维度上卷，filters为{维度: 取值或取值数组}的切片条件
+// 维度：district、field、source、industry、nature、warning_type；结果中的dimensions为各维度的全部取值
+function queryCube(cubeUrl, groupBy, filters, limit) {
+    const params = new URLSearchParams();
+    if (groupBy && groupBy.length) {
+        params.set('group_by', groupBy.join(','));
+    }
+    Object.entries(filters || {}).forEach(([dimension, values]) => {
+        [].concat(values).forEach(value => params.append(dimension, value));
+    });
+    if (limit) {
+        params.set('limit', limit);
+    }
+    return fetch(`${cubeUrl}?${params}`).then(response => {
+        if (!response.ok) {
+            throw new Error(`数据立方体查询失败: ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+// 把按一个维度汇总的查询结果转换为ECharts使用的[{name, value}]数据
+function cubeChartData(result, dimension, measure = 'count') {
+    return result.rows.map(row => ({ name: row[dimension] || '未填写', value: row[measure] }));
+}
+
 function renderDashboard(data) {
     console.log('渲染数据看板:', data);
     
@@ -73,6 +104,13 @@ function renderDashboard(data) {
     // 显示详细信息
     document.getElementById('yirenduosu').textContent = data.yirenduosu;
     document.getElementById('duorenyisu').textContent = data.duorenyisu;
+    
+    // 显示线索库中的跨期重复投诉情况
+    const repeatStats = data.repeat_stats;
+    document.getElementById('yirenduosu-history').textContent = repeatStats
+        ? `历史累计${repeatStats.phone_repeat_count}人，跨期重复${repeatStats.phone_cross_period_count}人` : '';
+    document.getElementById('duorenyisu-history').textContent = repeatStats
+        ? `历史累计${repeatStats.project_repeat_count}个，跨期重复${repeatStats.project_cross_period_count}个` : '';
     document.getElementById('jianshe-renshu').textContent = data.jianshe_renshu + ' 人';
     document.getElementById('jianshe-jine').textContent = data.jianshe_jine + ' 万元';
     document.getElementById('feijian-renshu').textContent = data.feijian_renshu + ' 人';
@@ -129,6 +167,19 @@ function renderDashboard(data) {
     renderDistrictPieChart(sortedWarningDistricts, 'warning-district-pie-chart');
     renderDistrictChart(sortedWarningDistricts, 'warning-district-chart', '#FF6384', '预警数量');
     
+    // 点击县市区柱状图时从数据立方体下钻，显示该县市区的细分情况
+    if (data.cube_url) {
+        queryCube(data.cube_url, [], {})
+            .then(meta => {
+                const clueSources = meta.dimensions.source.filter(source => source !== '安薪在线');
+                enableDistrictDrillDown('district-chart', { source: clueSources }, 'field', '所涉领域');
+                enableDistrictDrillDown('jianshe-district-chart', { source: clueSources, field: '建筑' }, 'industry', '所涉行业');
+                enableDistrictDrillDown('feijian-district-chart', { source: clueSources, field: '非建' }, 'industry', '所涉行业');
+                enableDistrictDrillDown('warning-district-chart', { source: '安薪在线' }, 'warning_type', '预警类型');
+            })
+            .catch(error => console.error('获取数据立方体失败:', error));
+    }
+    
     // 渲染预警类统计数据卡片
     document.getElementById('warning-case-total').textContent = data.warning_case_total || 0;
     document.getElementById('unique-construction-units').textContent = data.unique_construction_units || 0;
@@ -672,7 +723,7 @@ function renderDashboard(data) {
     }
     
     // 4. 建筑类人数金额散点图
-    if (data.jianshe_scatter_data && data.jianshe_scatter_data.length > 0) {
+    if (data.jianshe_scatter_data && data.jianshe_scatter_data.id.length > 0) {
         const jiansheScatterContainer = document.getElementById('jianshe-scatter-chart');
         if (jiansheScatterContainer) {
             jiansheScatterContainer.style.height = '400px';
@@ -682,7 +733,7 @@ function renderDashboard(data) {
             try {
                 jiansheScatterChart = echarts.init(jiansheScatterContainer);
                 
-                const scatterData = data.jianshe_scatter_data.map(item => [item.id, item.people, item.amount]);
+                const scatterData = scatterPoints(data.jianshe_scatter_data);
                 
                 const option = {
                     title: {
@@ -986,7 +1037,7 @@ function renderDashboard(data) {
     }
     
     // 3. 非建类人数金额散点图
-    if (data.feijian_scatter_data && data.feijian_scatter_data.length > 0) {
+    if (data.feijian_scatter_data && data.feijian_scatter_data.id.length > 0) {
         const feijianScatterContainer = document.getElementById('feijian-scatter-chart');
         if (feijianScatterContainer) {
             feijianScatterContainer.style.height = '400px';
@@ -996,7 +1047,7 @@ function renderDashboard(data) {
             try {
                 feijianScatterChart = echarts.init(feijianScatterContainer);
                 
-                const scatterData = data.feijian_scatter_data.map(item => [item.id, item.people, item.amount]);
+                const scatterData = scatterPoints(data.feijian_scatter_data);
                 
                 const option = {
                     title: {
@@ -1416,10 +1467,10 @@ window.addEventListener('resize', function() {
 
     
     // 渲染建筑类涉及人数较多的项目表格
-    renderLargeProjectsTable('jianshe-large-projects-table', data.jianshe_large_projects || []);
+    initLargeProjectsTable('jianshe-large-projects-table', 'jianshe');
     
     // 渲染非建类涉及人数较多的项目表格
-    renderLargeProjectsTable('feijian-large-projects-table', data.feijian_large_projects || []);
+    initLargeProjectsTable('feijian-large-projects-table', 'feijian');
     
     // 初始化表格排序功能
     initTableSorting();
@@ -1444,63 +1495,53 @@ window.addEventListener('resize', function() {
         dashboardElement.scrollIntoView({ behavior: 'smooth' });
     }
     
-    // 渲染涉及人数较多的项目表格
-    function renderLargeProjectsTable(tableId, projectsData) {
+    // 初始化涉及人数较多的项目表格：记录分页接口并重置分页、排序状态
+    function initLargeProjectsTable(tableId, field) {
         const tableBody = document.getElementById(tableId);
         if (!tableBody) return;
         
-        // 获取表格容器
         const tableContainer = tableBody.closest('.table-responsive');
+        tableContainer.dataset.projectsUrl = `${data.large_projects_url}/${field}`;
+        tableContainer.dataset.currentPage = '1';
+        tableContainer.dataset.sortField = '';
+        tableContainer.dataset.sortOrder = 'asc';
+        renderLargeProjectsTable(tableId);
+    }
+    
+    // 渲染涉及人数较多的项目表格，分页和排序在服务端完成
+    function renderLargeProjectsTable(tableId) {
+        const tableBody = document.getElementById(tableId);
+        if (!tableBody) return;
         
-        // 保存原始数据
-        if (!tableContainer.dataset.projectsData) {
-            tableContainer.dataset.projectsData = JSON.stringify(projectsData);
-        }
-        
-        // 初始化分页状态
-        if (!tableContainer.dataset.currentPage) {
-            tableContainer.dataset.currentPage = '1';
-        }
-        
-        if (!tableContainer.dataset.sortField) {
-            tableContainer.dataset.sortField = '';
-            tableContainer.dataset.sortOrder = 'asc';
-        }
+        // 获取表格容器
+        const tableContainer = tableBody.closest('.table-responsive');
         
         // 每页显示的行数
         const pageSize = 10;
         const currentPage = parseInt(tableContainer.dataset.currentPage);
+        const params = new URLSearchParams({
+            page: currentPage,
+            page_size: pageSize,
+            sort: tableContainer.dataset.sortField,
+            order: tableContainer.dataset.sortOrder
+        });
         
-        // 排序逻辑
-        let sortedData = [...projectsData];
-        const sortField = tableContainer.dataset.sortField;
-        const sortOrder = tableContainer.dataset.sortOrder;
-        
-        if (sortField) {
-            sortedData.sort((a, b) => {
-                let aVal = a[sortField] || '';
-                let bVal = b[sortField] || '';
-                
-                // 数值比较
-                if (sortField === 'people_count' || sortField === 'amount') {
-                    aVal = parseFloat(aVal) || 0;
-                    bVal = parseFloat(bVal) || 0;
-                    return sortOrder === 'asc' ? aVal - bVal : bVal - aVal;
-                }
-                
-                // 字符串比较
-                aVal = String(aVal).toLowerCase();
-                bVal = String(bVal).toLowerCase();
-                return sortOrder === 'asc' ? aVal.localeCompare(bVal) : bVal.localeCompare(aVal);
+        fetch(`${tableContainer.dataset.projectsUrl}?${params}`)
+            .then(response => response.ok ? response.json() : { items: [], total: 0 })
+            .catch(error => {
+                console.error('获取项目明细失败:', error);
+                return { items: [], total: 0 };
+            })
+            .then(result => {
+                const totalPages = Math.max(1, Math.ceil(result.total / pageSize));
+                fillLargeProjectsTable(tableBody, result.items);
+                // 渲染分页控件
+                renderPaginationControls(tableContainer, currentPage, totalPages, tableId);
             });
-        }
-        
-        // 分页逻辑
-        const totalPages = Math.ceil(sortedData.length / pageSize);
-        const startIndex = (currentPage - 1) * pageSize;
-        const endIndex = startIndex + pageSize;
-        const paginatedData = sortedData.slice(startIndex, endIndex);
-        
+    }
+    
+    // 填充一页项目明细
+    function fillLargeProjectsTable(tableBody, paginatedData) {
         // 清空表格
         tableBody.innerHTML = '';
         
@@ -1569,9 +1610,6 @@ window.addEventListener('resize', function() {
                 tableBody.appendChild(row);
             });
         }
-        
-        // 渲染分页控件
-        renderPaginationControls(tableContainer, currentPage, totalPages, tableId);
     }
     
     // 渲染分页控件
@@ -1607,8 +1645,7 @@ window.addEventListener('resize', function() {
             e.preventDefault();
             if (currentPage > 1) {
                 tableContainer.dataset.currentPage = (currentPage - 1).toString();
-                const projectsData = JSON.parse(tableContainer.dataset.projectsData);
-                renderLargeProjectsTable(tableId, projectsData);
+                renderLargeProjectsTable(tableId);
             }
         });
         prevLi.appendChild(prevButton);
@@ -1637,8 +1674,7 @@ window.addEventListener('resize', function() {
             pageButton.addEventListener('click', (e) => {
                 e.preventDefault();
                 tableContainer.dataset.currentPage = i.toString();
-                const projectsData = JSON.parse(tableContainer.dataset.projectsData);
-                renderLargeProjectsTable(tableId, projectsData);
+                renderLargeProjectsTable(tableId);
             });
             pageLi.appendChild(pageButton);
             paginationList.appendChild(pageLi);
@@ -1654,8 +1690,7 @@ window.addEventListener('resize', function() {
             e.preventDefault();
             if (currentPage < totalPages) {
                 tableContainer.dataset.currentPage = (currentPage + 1).toString();
-                const projectsData = JSON.parse(tableContainer.dataset.projectsData);
-                renderLargeProjectsTable(tableId, projectsData);
+                renderLargeProjectsTable(tableId);
             }
         });
         nextLi.appendChild(nextButton);
@@ -1696,7 +1731,7 @@ window.addEventListener('resize', function() {
                         // 添加排序点击事件
                         th.addEventListener('click', () => {
                             const tableContainer = table.closest('.table-responsive');
-                            if (!tableContainer) return;
+                            if (!tableContainer || !tableContainer.dataset.projectsUrl) return;
                             
                             // 切换排序方向
                             const currentField = tableContainer.dataset.sortField;
@@ -1716,9 +1751,8 @@ window.addEventListener('resize', function() {
                             
                             // 重新渲染表格
                             const tableId = table.querySelector('tbody').id;
-                            const projectsData = JSON.parse(tableContainer.dataset.projectsData);
                             tableContainer.dataset.currentPage = '1'; // 重置到第一页
-                            renderLargeProjectsTable(tableId, projectsData);
+                            renderLargeProjectsTable(tableId);
                         });
                     }
                 });
@@ -1746,6 +1780,21 @@ window.addEventListener('resize', function() {
         });
     }
     
+    // 为县市区柱状图绑定下钻：按filters切片并限定所点击的县市区，按dimension汇总后在弹窗中显示
+    function enableDistrictDrillDown(chartId, filters, dimension, label) {
+        const chart = window[chartId];
+        if (!chart) return;
+        chart.off('click');
+        chart.on('click', function(params) {
+            queryCube(data.cube_url, [dimension], { ...filters, district: params.name })
+                .then(result => {
+                    const lines = cubeChartData(result, dimension).map(item => `${item.name}：${item.value}条`);
+                    showContentModal(`${params.name}按${label}分布（共${result.total.count}条）：\n${lines.join('\n') || '暂无数据'}`);
+                })
+                .catch(error => console.error('数据立方体下钻失败:', error));
+        });
+    }
+    
     // 初始化模态框事件
     function initModalEvents() {
         // 使用事件委托处理所有查看按钮的点击事件
@@ -2077,45 +2126,119 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('file_12345', file12345);
         formData.append('file_anxin', fileAnxin);
         
-        // 创建XMLHttpRequest对象
+        // 创建XMLHttpRequest对象，提交处理任务
         const xhr = new XMLHttpRequest();
         
-        // 上传进度事件
+        // 上传进度事件（上传占进度条的0-30%）
         xhr.upload.addEventListener('progress', function(event) {
             if (event.lengthComputable) {
-                const percentComplete = Math.round((event.loaded / event.total) * 100);
-                progressBar.style.width = percentComplete + '%';
-                progressBar.setAttribute('aria-valuenow', percentComplete);
-                progressBar.textContent = percentComplete + '%';
+                setProgress(Math.round((event.loaded / event.total) * 30));
             }
         });
         
         // 请求完成事件
         xhr.addEventListener('load', function() {
-            // 模拟处理进度
-            simulateProcessingProgress();
-            
-            // 检查请求状态
-            if (xhr.status === 200) {
-                // 获取数据看板数据
-                let dashboardData = null;
+            if (xhr.status === 202) {
+                let job = null;
                 try {
-                    const dashboardDataHeader = xhr.getResponseHeader('X-Dashboard-Data');
-                    if (dashboardDataHeader) {
-                        dashboardData = JSON.parse(dashboardDataHeader);
-                    }
+                    job = JSON.parse(xhr.responseText);
                 } catch (e) {
-                    console.error('解析数据看板数据失败:', e);
+                    console.error('解析任务信息失败:', e);
+                }
+                if (job && job.job_id) {
+                    setProgress(30);
+                    pollJob(job);
+                    return;
+                }
+            }
+            showMessage('error', parseErrorMessage(xhr.responseText));
+            resetUI();
+        });
+        
+        // 请求错误事件
+        xhr.addEventListener('error', function() {
+            showMessage('error', '网络错误，请检查您的连接后重试。');
+            resetUI();
+        });
+        
+        // 请求超时事件
+        xhr.addEventListener('timeout', function() {
+            showMessage('error', '请求超时，请稍后重试。');
+            resetUI();
+        });
+        
+        // 发送请求
+        xhr.open('POST', '/jobs/');
+        xhr.send(formData);
+    });
+    
+    // 设置进度条
+    function setProgress(progress) {
+        progressBar.style.width = progress + '%';
+        progressBar.setAttribute('aria-valuenow', progress);
+        progressBar.textContent = progress + '%';
+    }
+    
+    // 从错误响应中取出错误信息
+    function parseErrorMessage(responseText) {
+        try {
+            const errorData = JSON.parse(responseText);
+            if (errorData.detail) {
+                return errorData.detail;
+            }
+        } catch (e) {
+            // 解析JSON失败，使用默认错误消息
+        }
+        return '处理文件时发生错误。';
+    }
+    
+    // 每秒查询一次任务状态，处理阶段占进度条的30-100%
+    function pollJob(job) {
+        fetch(job.status_url)
+            .then(function(response) {
+                if (!response.ok) {
+                    return response.text().then(function(text) {
+                        throw new Error(parseErrorMessage(text));
+                    });
+                }
+                return response.json();
+            })
+            .then(function(status) {
+                if (status.status === 'failed') {
+                    throw new Error(status.error || '处理文件时发生错误。');
+                }
+                if (status.status === 'done') {
+                    setProgress(99);
+                    return downloadResult(job);
+                }
+                const running = status.stages.find(function(stage) { return stage.status === 'running'; });
+                setProgress(30 + Math.round(status.progress * 69));
+                if (running) {
+                    progressBar.textContent = progressBar.textContent + ' ' + running.label;
+                }
+                setTimeout(function() { pollJob(job); }, 1000);
+            })
+            .catch(function(error) {
+                showMessage('error', error.message);
+                resetUI();
+            });
+    }
+    
+    // 任务完成后下载Excel文件并获取数据看板数据
+    function downloadResult(job) {
+        return Promise.all([fetch(job.result_url), fetch(job.dashboard_url)])
+            .then(function(responses) {
+                const resultResponse = responses[0];
+                const dashboardResponse = responses[1];
+                if (!resultResponse.ok) {
+                    return resultResponse.text().then(function(text) {
+                        throw new Error(parseErrorMessage(text));
+                    });
                 }
-                
-                // 创建下载链接
-                const blob = new Blob([xhr.response], { type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' });
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
                 
                 // 获取文件名
                 let filename = '';
-                const contentDisposition = xhr.getResponseHeader('Content-Disposition');
+                const contentDisposition = resultResponse.headers.get('Content-Disposition');
                 if (contentDisposition && contentDisposition.includes('filename=')) {
                     filename = decodeURIComponent(contentDisposition.split('filename=')[1].replace(/['"]/g, ''));
                 } else {
@@ -2127,8 +2250,21 @@ document.addEventListener('DOMContentLoaded', function() {
                     filename = `${year}${month}${day}劳动监察线索汇总和统计.xlsx`;
                 }
                 
+                const dashboardPromise = dashboardResponse.ok ? dashboardResponse.json().catch(function(e) {
+                    console.error('解析数据看板数据失败:', e);
+                    return null;
+                }) : Promise.resolve(null);
+                return Promise.all([resultResponse.blob(), dashboardPromise, filename]);
+            })
+            .then(function(results) {
+                const blob = results[0];
+                const dashboardData = results[1];
+                
+                // 创建下载链接
+                const url = URL.createObjectURL(blob);
+                const a = document.createElement('a');
                 a.href = url;
-                a.download = filename;
+                a.download = results[2];
                 document.body.appendChild(a);
                 a.click();
                 
@@ -2136,6 +2272,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 document.body.removeChild(a);
                 URL.revokeObjectURL(url);
                 
+                setProgress(100);
+                
                 // 显示成功消息
                 showMessage('success', '处理成功！文件已开始下载。');
                 
@@ -2143,56 +2281,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (dashboardData) {
                     renderDashboard(dashboardData);
                 }
-            } else {
-                // 显示错误消息
-                let errorMessage = '处理文件时发生错误。';
-                try {
-                    const errorData = JSON.parse(xhr.responseText);
-                    if (errorData.detail) {
-                        errorMessage = errorData.detail;
-                    }
-                } catch (e) {
-                    // 解析JSON失败，使用默认错误消息
-                }
-                showMessage('error', errorMessage);
-            }
-            
-            // 重置界面
-            resetUI();
-        });
-        
-        // 请求错误事件
-        xhr.addEventListener('error', function() {
-            showMessage('error', '网络错误，请检查您的连接后重试。');
-            resetUI();
-        });
-        
-        // 请求超时事件
-        xhr.addEventListener('timeout', function() {
-            showMessage('error', '请求超时，请稍后重试。');
-            resetUI();
-        });
-        
-        // 设置响应类型
-        xhr.responseType = 'blob';
-        
-        // 发送请求
-        xhr.open('POST', '/process_files/');
-        xhr.send(formData);
-    });
-    
-    // 模拟处理进度（从50%到99%）
-    function simulateProcessingProgress() {
-        let progress = 50;
-        const interval = setInterval(function() {
-            progress += 1;
-            if (progress >= 99) {
-                clearInterval(interval);
-            }
-            progressBar.style.width = progress + '%';
-            progressBar.setAttribute('aria-valuenow', progress);
-            progressBar.textContent = progress + '%';
-        }, 50);
+                resetUI();
+            });
     }
     
     // 显示消息
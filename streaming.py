@@ -0,0 +1,103 @@
+"""流式读取：上传文件分块写入临时文件，再以openpyxl只读模式分批读取行
+
+读取时内存里只保留一批行，读取本身的占用不随文件大小增长；只支持xlsx文件
+"""
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+# 复制上传文件时每次读取的字节数
+spool_block_bytes = 1024 * 1024
+
+
+def spool_upload(source, suffix=".xlsx", directory=None):
+    """把上传的文件对象分块复制到临时文件，返回(路径, 字节数, 内容的SHA-256摘要)
+
+    临时文件由调用方在处理结束后删除
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = source.read(spool_block_bytes)
+                if not block:
+                    break
+                digest.update(block)
+                size += len(block)
+                f.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size, digest.digest()
+
+
+def remove_files(paths):
+    """删除临时文件，文件不存在时忽略"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def convert_cell(value):
+    """与pandas的openpyxl读取引擎一致：空单元格为空字符串，整数值的浮点数转换为整数"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def rows_to_frame(rows, names, dtypes):
+    """用pandas.read_excel内部使用的TextParser把一批行转换为数据框，列类型的推断与整体读取一致"""
+    # TextParser不能解析没有列或没有行的数据
+    if not names:
+        return pd.DataFrame(index=range(len(rows)))
+    if not rows:
+        return pd.DataFrame(columns=names)
+    return TextParser(rows, names=names, dtype=dtypes).read()
+
+
+def iter_excel_chunks(path, columns, dtypes=None, chunk_rows=20000, header_row=0, column_names=None):
+    """按批读取xlsx文件第一个工作表中需要的列，每批最多chunk_rows行
+
+    第header_row行（从0开始）为表头，之前的行跳过；column_names为文件中的列名 -> 标准列名，返回的列使用标准列名。
+    整行为空的行跳过（与pandas.read_excel一致），重复的列名只读取第一列；
+    文件没有数据行时返回一个只有表头的空数据框，调用方据此确定汇总表的列
+    """
+    wanted = set(columns)
+    column_names = column_names or {}
+    dtypes = {name: dtype for name, dtype in (dtypes or {}).items() if name in wanted}
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(min_row=header_row + 1, values_only=True)
+        header = next(rows, None) or ()
+        positions = {}
+        for index, name in enumerate(header):
+            name = column_names.get(name, name)
+            if name in wanted and name not in positions:
+                positions[name] = index
+        names = list(positions)
+        indexes = list(positions.values())
+
+        batch = []
+        yielded = False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append([convert_cell(row[index]) if index < len(row) else "" for index in indexes])
+            if len(batch) >= chunk_rows:
+                yield rows_to_frame(batch, names, dtypes)
+                yielded = True
+                batch = []
+        if batch or not yielded:
+            yield rows_to_frame(batch, names, dtypes)
+    finally:
+        workbook.close()
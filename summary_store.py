@@ -0,0 +1,301 @@
+"""保留的汇总表：工作进程把类型化的汇总表写入Parquet文件，主进程按需加载并建立列索引，
+供查询接口按列投影、按条件过滤并按序号分页读取，不需要下载整个Excel文件；
+写入的同时逐批建立诉求标题、诉求内容、预警原因的全文检索索引（见search_index.py），与汇总表一起保存
+
+分类列（区域、来源等）的索引为每个取值对应的行号数组，数值列的索引为按值排序的行号，
+过滤时先用索引求出候选行号，再按序号做键集分页；未安装pyarrow时不保留汇总表。
+查询和检索的范围是一次处理保留的汇总表，不跨多次上传
+"""
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from search_index import SearchIndex, SearchIndexBuilder, frame_text_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 保存时保持数值类型的列，其余列一律保存为字符串，流式处理的各批数据类型一致；读回后由调用方恢复类型
+numeric_storage_columns = {"序号": "Int64", "_涉及人数": "Int64", "_涉及金额": "float64"}
+
+
+def storage_frame(df, columns=None):
+    """转换为保存格式：数值列保持类型，其余列转换为字符串（缺失值保持为空）"""
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    converted = {}
+    for column in df.columns:
+        if column in numeric_storage_columns:
+            converted[column] = df[column].astype(numeric_storage_columns[column])
+        else:
+            converted[column] = df[column].astype(pd.StringDtype("pyarrow"))
+    return pd.DataFrame(converted)
+
+
+class SummaryWriter:
+    """逐批写入汇总表的Parquet文件，全部写完后commit；各批的列以第一批为准"""
+
+    def __init__(self, store):
+        self.store = store
+        self.summary_id = uuid.uuid4().hex
+        os.makedirs(store.directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=store.directory, suffix=".tmp")
+        os.close(fd)
+        self.writer = None
+        self.columns = None
+        self.rows = 0
+        self.search = SearchIndexBuilder()
+
+    def write(self, df):
+        if self.writer is None:
+            self.columns = list(df.columns)
+            table = pa.Table.from_pandas(storage_frame(df), preserve_index=False)
+            self.writer = pq.ParquetWriter(self.tmp_path, table.schema)
+        else:
+            table = pa.Table.from_pandas(storage_frame(df, self.columns), schema=self.writer.schema,
+                                         preserve_index=False)
+        self.writer.write_table(table)
+        self.search.add(df)
+        self.rows += len(df)
+
+    def commit(self):
+        """写完后保存检索索引，再把临时文件改为正式文件，返回汇总表id"""
+        if self.writer is not None:
+            self.writer.close()
+        self.search.save(self.store.search_path(self.summary_id))
+        os.replace(self.tmp_path, self.store.path(self.summary_id))
+        self.store.prune()
+        return self.summary_id
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class SummaryStore:
+    """保存在目录中的汇总表文件，超过max_files个时删除最早的文件"""
+
+    def __init__(self, directory, max_files=32):
+        self.directory = directory
+        self.max_files = max_files
+
+    @property
+    def enabled(self):
+        return pa is not None and bool(self.directory) and self.max_files > 0
+
+    def path(self, summary_id):
+        return os.path.join(self.directory, f"{summary_id}.parquet")
+
+    def search_path(self, summary_id):
+        return os.path.join(self.directory, f"{summary_id}.search.npz")
+
+    def writer(self):
+        return SummaryWriter(self)
+
+    def save(self, df):
+        """一次写入整个汇总表，返回汇总表id"""
+        writer = self.writer()
+        try:
+            writer.write(df)
+            return writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+
+    def prune(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        for _, path in sorted(entries, reverse=True)[self.max_files:]:
+            for stale in (path, path[:-len(".parquet")] + ".search.npz"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def load(self, summary_id, restore=None):
+        """读回汇总表，文件不存在（已被清理）时返回None；restore用于恢复列类型"""
+        if not summary_id or not all(char in "0123456789abcdef" for char in summary_id):
+            return None
+        path = self.path(summary_id)
+        if not os.path.exists(path):
+            return None
+        df = pq.read_table(path, memory_map=True).to_pandas()
+        return restore(df) if restore is not None else df
+
+
+# 区间过滤的列 -> 实际比较的类型化列
+range_columns = {"序号": "序号", "预警天数": "预警天数", "涉及人数": "_涉及人数", "涉及金额": "_涉及金额"}
+# 区间过滤的运算符
+range_operators = {"gt", "gte", "lt", "lte"}
+
+
+class SummaryIndex:
+    """一个汇总表及其列索引，索引在第一次按该列过滤时建立"""
+
+    def __init__(self, df, search_path=None):
+        self.df = df
+        self.search_path = search_path
+        self.search_index = None
+        self.sequence = df["序号"].to_numpy(dtype="int64", na_value=0)
+        self.postings = {}
+        self.sorted_values = {}
+        self.lock = threading.Lock()
+        self.frame_bytes = int(df.memory_usage(index=False, deep=True).sum())
+
+    def memory_bytes(self):
+        """占用的堆内存：汇总表和已建立的列索引（检索索引以内存映射方式打开，不计入）"""
+        with self.lock:
+            postings = sum(rows.nbytes for column in self.postings.values() for rows in column.values())
+            values = sum(values.nbytes + positions.nbytes for values, positions in self.sorted_values.values())
+        return self.frame_bytes + self.sequence.nbytes + postings + values
+
+    @property
+    def columns(self):
+        """可以查询和投影的列（不含内部缓存列）"""
+        return [column for column in self.df.columns if not str(column).startswith("_")]
+
+    def search(self, query, offset=0, limit=20):
+        """全文检索，索引在第一次检索时加载；保留汇总表时没有建立索引（旧文件）则返回None"""
+        with self.lock:
+            if self.search_index is None:
+                if not self.search_path or not os.path.exists(self.search_path):
+                    return None
+                self.search_index = SearchIndex.load(self.search_path, frame_text_rows(self.df))
+        return self.search_index.search(query, offset, limit)
+
+    def category_postings(self, column):
+        """分类列的倒排索引：取值 -> 按行号排序的行号数组，缺失值的键为空字符串"""
+        with self.lock:
+            if column not in self.postings:
+                series = self.df[column]
+                codes = series.cat.codes.to_numpy()
+                order = np.argsort(codes, kind="stable")
+                sorted_codes = codes[order]
+                labels = [""] + [str(category) for category in series.cat.categories]
+                bounds = np.searchsorted(sorted_codes, np.arange(-1, len(series.cat.categories) + 1))
+                postings = {}
+                for label, start, end in zip(labels, bounds[:-1], bounds[1:]):
+                    if end > start:
+                        postings.setdefault(label, []).append(order[start:end])
+                self.postings[column] = {label: np.sort(np.concatenate(parts)) for label, parts in postings.items()}
+            return self.postings[column]
+
+    def value_index(self, column):
+        """数值列的排序索引：(按值排序的非空值, 对应的行号)"""
+        with self.lock:
+            if column not in self.sorted_values:
+                values = pd.to_numeric(self.df[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                positions = np.flatnonzero(~np.isnan(values))
+                order = np.argsort(values[positions], kind="stable")
+                self.sorted_values[column] = (values[positions][order], positions[order])
+            return self.sorted_values[column]
+
+    def equal_rows(self, column, values):
+        """取值等于values之一的行号（已排序）；空字符串匹配缺失值"""
+        series = self.df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            postings = self.category_postings(column)
+            parts = [postings[value] for value in values if value in postings]
+            return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        text = series.astype("string").fillna("")
+        return np.flatnonzero(text.isin(values).to_numpy())
+
+    def range_rows(self, column, operator, bound):
+        """数值列满足区间条件的行号（已排序）"""
+        values, positions = self.value_index(range_columns[column])
+        if operator == "gt":
+            selected = positions[np.searchsorted(values, bound, side="right"):]
+        elif operator == "gte":
+            selected = positions[np.searchsorted(values, bound, side="left"):]
+        elif operator == "lt":
+            selected = positions[:np.searchsorted(values, bound, side="left")]
+        else:
+            selected = positions[:np.searchsorted(values, bound, side="right")]
+        return np.sort(selected)
+
+    def query(self, columns=None, equals=None, ranges=None, after=0, limit=50):
+        """按条件过滤，返回序号大于after的前limit行
+
+        equals为{列: [取值]}，ranges为[(列, 运算符, 数值)]；返回匹配总数、各行的值和下一页的after
+        """
+        candidates = None
+        for column, values in (equals or {}).items():
+            rows = self.equal_rows(column, values)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        for column, operator, bound in ranges or []:
+            rows = self.range_rows(column, operator, bound)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        if candidates is None:
+            candidates = np.arange(len(self.df))
+
+        # 行号与序号同序，按序号做键集分页
+        start = np.searchsorted(self.sequence[candidates], after, side="right")
+        page = candidates[start:start + limit]
+        columns = columns or self.columns
+        frame = self.df.iloc[page][columns]
+        rows = frame.astype(object).where(frame.notna(), None).values.tolist()
+        has_more = start + limit < len(candidates)
+        return {
+            "total": int(len(candidates)),
+            "columns": columns,
+            "rows": rows,
+            "next_after": int(self.sequence[page[-1]]) if has_more and len(page) else None,
+        }
+
+
+class SummaryIndexCache:
+    """主进程中最近查询过的汇总表，按最近最少使用淘汰
+
+    超过max_entries个或占用的内存超过max_bytes时淘汰最早使用的汇总表；最近使用的一个总是保留
+    """
+
+    def __init__(self, store, restore=None, max_entries=4, max_bytes=1024 * 1024 * 1024):
+        self.store = store
+        self.restore = restore
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def evict(self):
+        """按最近最少使用淘汰，调用方持有锁"""
+        while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries
+                or sum(index.memory_bytes() for index in self.entries.values()) > self.max_bytes):
+            self.entries.popitem(last=False)
+
+    def get(self, summary_id):
+        """返回汇总表的索引，文件已被清理时返回None"""
+        with self.lock:
+            if summary_id in self.entries:
+                self.entries.move_to_end(summary_id)
+                # 列索引在查询时逐步建立，占用的内存随之增长
+                self.evict()
+                return self.entries[summary_id]
+        df = self.store.load(summary_id, self.restore)
+        if df is None:
+            return None
+        index = SummaryIndex(df, self.store.search_path(summary_id))
+        with self.lock:
+            self.entries[summary_id] = index
+            self.evict()
+        return index
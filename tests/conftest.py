@@ -0,0 +1,30 @@
+"""测试配置：关闭线索库和各种缓存，处理流程在线程池中执行；main在导入时挂载static目录，因此以仓库根目录为工作目录"""
+import io
+import os
+import sys
+
+import pytest
+from openpyxl import Workbook
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.update(CLUE_STORE_PATH="", RESULT_CACHE_MAX_BYTES="0", FRAME_CACHE_MAX_BYTES="0",
+                  SUMMARY_STORE_MAX_FILES="0", PIPELINE_EXECUTOR="thread")
+sys.path.insert(0, root)
+os.chdir(root)
+
+
+def xlsx_bytes(columns, rows):
+    """用openpyxl写入只有一个工作表的xlsx文件（与Excel一样，只含空格的单元格按原文本保存）"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+@pytest.fixture
+def make_xlsx():
+    return xlsx_bytes
@@ -0,0 +1,20 @@
+"""数据看板接口按Accept-Encoding的q值决定是否返回gzip压缩内容"""
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", True),
+    ("GZIP", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000, *", False),
+    ("deflate, br", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("", False),
+    ("identity", False),
+])
+def test_accepts_gzip(header, expected):
+    assert main.accepts_gzip(header) is expected
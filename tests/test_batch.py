@@ -0,0 +1,65 @@
+"""批量处理：各期的处理流程并行执行，上一期数量和跨期重复投诉仍按日期顺序取得"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from clue_store import ClueStore
+
+dates = ["20260101", "20260102", "20260103"]
+
+
+def row_12345(serial, phone):
+    return [1, serial, "一般", "12345热线", "张三", phone, "讨薪", "拖欠工资", "宜都", "建筑", "否",
+            "房屋建筑", "某项目", "政府投资", "是", "在建", "某建设单位", "某总包单位", 5, 30000, "否"]
+
+
+rows_anxin = [
+    ["项目甲", "房屋建筑", "建设单位甲", "施工单位甲", "王五", "13900000001", "宜都市", "工资未按时发放",
+     "超过发薪日", "2026-01-01", "未处理", 3],
+]
+
+
+def test_periods_overlap_and_keep_cross_period_order(make_xlsx, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "clue_store", ClueStore(str(tmp_path / "clues.db")))
+    executor = ThreadPoolExecutor(max_workers=3)
+    monkeypatch.setattr(main, "pipeline_executor", executor)
+
+    # 第一期读取最慢，后面的期先读完，只能等第一期写入线索库
+    read_source_frame = main.read_source_frame
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow_read(content, source):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            time.sleep(0.6 if content == first_12345 else 0.2)
+            return read_source_frame(content, source)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(main, "read_source_frame", slow_read)
+    # 每期两条线索，其中一条的诉求人电话在各期相同
+    files_12345 = [make_xlsx(main.required_columns_12345,
+                             [row_12345(f"P{index}01", "13800000001"), row_12345(f"P{index}02", f"1380000010{index}")])
+                   for index in range(len(dates))]
+    first_12345 = files_12345[0]
+    content_anxin = make_xlsx(main.required_columns_anxin, rows_anxin)
+    pairs = [{"date": date, "name_12345": f"{date}12345.xlsx", "name_anxin": "安薪.xlsx",
+              "content_12345": content, "content_anxin": content_anxin}
+             for date, content in zip(dates, files_12345)]
+    try:
+        results = asyncio.run(main.run_batch(pairs, 3))
+    finally:
+        executor.shutdown()
+
+    assert [result["error"] for result in results] == [None, None, None]
+    assert peak[0] >= 2, "各期的读取应当并行"
+    dashboards = [result["dashboard"] for result in results]
+    assert [dashboard["previous_period"] for dashboard in dashboards] == [None, "20260101", "20260102"]
+    assert [dashboard["repeat_stats"]["phone_cross_period_count"] for dashboard in dashboards] == [0, 1, 1]
+    assert [dashboard["repeat_stats"]["phone_repeat_count"] for dashboard in dashboards] == [0, 0, 1]
+    assert [period["period"] for period in main.clue_store.periods()] == dates
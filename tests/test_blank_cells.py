@@ -0,0 +1,82 @@
+"""只含空白的单元格：calamine、openpyxl和流式读取的处理结果一致"""
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import main
+from streaming import iter_excel_chunks
+
+rows_12345 = [
+    [1, "A001", "一般", "12345热线", "张三", "13800000001", "讨薪", "拖欠工资", "宜都", "建筑", "否",
+     "房屋建筑", "某项目", "政府投资", "是", "在建", "某建设单位", "某总包单位", 5, 30000, "否"],
+    [2, "A002", "一般", "部平台", "李四", "13800000002", "讨薪", "拖欠工资", "枝江", "非建", "否",
+     "餐饮", "某餐馆", "  ", "否", "  ", "  ", "  ", 4, "  ", "　"],
+    [3, "A003", "  ", "12345热线", " ", "  ", "  ", "  ", "当阳", "建筑", "  ",
+     "  ", "  ", "国企投资", "  ", "  ", "  ", "  ", 3, 1000, "是"],
+]
+
+rows_anxin = [
+    ["项目甲", "房屋建筑", "建设单位甲", "施工单位甲", "王五", "13900000001", "宜都市", "工资未按时发放",
+     "超过发薪日", "2026-01-01", "未处理", 3],
+    ["项目乙", "房屋建筑", "建设单位乙", "施工单位乙", "赵六", "13900000002", "枝江市", "  ",
+     "  ", "2026-01-02", "已处理", 5],
+    ["项目丙", "市政工程", "建设单位丙", "  ", "  ", "  ", "当阳市", "　",
+     "  ", "2026-01-03", "  ", 1],
+]
+
+
+@pytest.fixture
+def uploads(make_xlsx):
+    return make_xlsx(main.required_columns_12345, rows_12345), make_xlsx(main.required_columns_anxin, rows_anxin)
+
+
+def processed_frames(content, columns, dtypes, process, tmp_path):
+    """分别用calamine、openpyxl和流式读取后处理，返回三个数据框"""
+    frames = []
+    for engine in ("calamine", "openpyxl"):
+        df, _ = main.read_upload_excel(content, columns, dtypes, engine)
+        frames.append(process(df))
+    path = tmp_path / "upload.xlsx"
+    path.write_bytes(content)
+    chunks = [process(chunk) for chunk in iter_excel_chunks(str(path), columns, dtypes)]
+    frames.append(pd.concat(chunks, ignore_index=True))
+    return frames
+
+
+def test_blank_text_is_missing_for_every_reader(uploads, tmp_path):
+    pytest.importorskip("python_calamine")
+    content_12345, content_anxin = uploads
+    for content, source in ((content_12345, "12345"), (content_anxin, "安薪")):
+        columns, dtypes, process = main.source_readers[source]
+        frames = processed_frames(content, columns, dtypes, process, tmp_path)
+        for frame in frames[1:]:
+            for column in frames[0].columns:
+                assert frame[column].isna().tolist() == frames[0][column].isna().tolist(), (source, column)
+    anxin = frames[0]
+    assert anxin["预警类型"].isna().tolist() == [False, True, True]
+    assert anxin["状态"].isna().tolist() == [False, False, True]
+
+
+def workbook_values(content, sheet_index):
+    sheet = load_workbook(io.BytesIO(content), read_only=True).worksheets[sheet_index]
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_full_and_streaming_statistics_match(uploads, tmp_path, monkeypatch):
+    pytest.importorskip("python_calamine")
+    monkeypatch.setattr(main, "excel_read_engine", "calamine")
+    content_12345, content_anxin = uploads
+    path_12345, path_anxin = tmp_path / "12345.xlsx", tmp_path / "anxin.xlsx"
+    path_12345.write_bytes(content_12345)
+    path_anxin.write_bytes(content_anxin)
+
+    full_workbook, full_dashboard, _ = main.run_pipeline(content_12345, content_anxin, "20260101")
+    stream_workbook, stream_dashboard, _ = main.run_streaming_pipeline(str(path_12345), str(path_anxin), "20260101")
+
+    assert workbook_values(full_workbook, 1) == workbook_values(stream_workbook, 1)
+    assert full_dashboard["basic_info"] == stream_dashboard["basic_info"]
+    for key in ("warning_types", "warning_status_counts", "warning_district_counts", "xiansuo_count"):
+        assert full_dashboard[key] == stream_dashboard[key], key
+    assert full_dashboard["warning_types"] == {"工资未按时发放": 1}
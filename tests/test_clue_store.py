@@ -0,0 +1,98 @@
+"""线索库：缺少流水号的12345线索的去重键、结果缓存键中的历史摘要、旧版本线索库的升级"""
+import json
+import sqlite3
+import threading
+
+import pandas as pd
+
+import main
+from clue_store import ClueStore, dedup_keys, schema
+from streaming import iter_excel_chunks
+
+rows_12345 = [
+    [1, None, "一般", "12345热线", "张三", "13800000001", "讨薪", "拖欠工资", "宜都", "建筑", "否",
+     "房屋建筑", "某项目", "政府投资", "是", "在建", "某建设单位", "某总包单位", 5, 30000, "否"],
+    [2, "", "一般", "部平台", "李四", "13800000002", "讨薪", "拖欠工资", "枝江", "非建", "否",
+     "餐饮", "某餐馆", None, "否", None, None, None, 4, 1500.5, None],
+    [3, "A003", "一般", "12345热线", "王五", "13800000003", "讨薪", "拖欠工资", "当阳", "建筑", "否",
+     "房屋建筑", "某项目", "国企投资", "是", "在建", "某建设单位", "某总包单位", 3, 1000, "是"],
+]
+rows_anxin = [
+    ["项目甲", "房屋建筑", "建设单位甲", "施工单位甲", "王五", "13900000001", "宜都市", "工资未按时发放",
+     "超过发薪日", "2026-01-01", "未处理", 3],
+]
+
+
+def complaint_keys(summary_df):
+    complaints = summary_df[summary_df["事件来源"] != "安薪在线"]
+    return sorted(dedup_keys(complaints, False))
+
+
+def test_keys_ignore_order_processing_mode_and_linking(make_xlsx, tmp_path, monkeypatch):
+    content_12345 = make_xlsx(main.required_columns_12345, rows_12345)
+    content_anxin = make_xlsx(main.required_columns_anxin, rows_anxin)
+    reordered_12345 = make_xlsx(main.required_columns_12345, [rows_12345[2], rows_12345[1], rows_12345[0]])
+
+    def full_summary(content, linked):
+        frames = [main.read_source_frame(content, "12345")[0], main.read_source_frame(content_anxin, "安薪")[0]]
+        summary_df = main.normalize_numeric_columns(main.combine_summary_frames(*frames))
+        if linked:
+            summary_df["关联编号"] = range(len(summary_df))
+        return summary_df
+
+    path = tmp_path / "12345.xlsx"
+    path.write_bytes(content_12345)
+    columns, dtypes, process = main.source_readers["12345"]
+    streamed = pd.concat([main.normalize_numeric_columns(process(chunk))
+                          for chunk in iter_excel_chunks(str(path), columns, dtypes, chunk_rows=2)],
+                         ignore_index=True)
+
+    expected = complaint_keys(full_summary(content_12345, linked=False))
+    assert expected[0] == "A003" and all(key.startswith("row:") for key in expected[1:])
+    assert complaint_keys(full_summary(content_12345, linked=True)) == expected
+    assert complaint_keys(full_summary(reordered_12345, linked=False)) == expected
+    assert complaint_keys(streamed) == expected
+
+
+def test_history_revision_tracks_earlier_periods(tmp_path):
+    store = ClueStore(str(tmp_path / "clues.db"))
+    counts = dict(xiansuo_count=3, xiansuo_bupingtai_count=1, xiansuo_12345_count=2, anxin_count=1)
+    initial = store.history_revision("20260110")
+    # 本期的写入来自上传本身，写入本期和晚于本期的数据后缓存键不变
+    store.record_period("20260110", counts)
+    store.record_period("20260120", counts)
+    assert store.history_revision("20260110") == initial
+    # 补录较早一期后跨期重复投诉可能变化，缓存键随之变化
+    store.record_period("20260101", counts)
+    assert store.history_revision("20260110") != initial
+
+
+def test_concurrent_first_open_migrates_old_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    # 旧版本的线索库没有电话、项目名称键列
+    conn.executescript(schema.replace("    phone_key TEXT,\n    project_key TEXT,\n", ""))
+    conn.execute("INSERT INTO clues (source, dedup_key, first_period, last_period, data) VALUES (?, ?, ?, ?, ?)",
+                 ("12345", "A001", "20260101", "20260101",
+                  json.dumps({"诉求人电话": "13800000001", "所涉项目（企业）": "某项目"})))
+    conn.commit()
+    conn.close()
+
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def open_store():
+        barrier.wait()
+        try:
+            ClueStore(path).connect()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_store) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    row = sqlite3.connect(path).execute("SELECT phone_key, project_key FROM clues").fetchone()
+    assert row == ("13800000001", "某项目")
@@ -0,0 +1,15 @@
+"""导出的列宽：空值、空文本和0不计入列宽"""
+import numpy as np
+import pandas as pd
+
+import main
+
+
+def test_column_widths_ignore_missing_values():
+    df = pd.DataFrame({
+        "a": [np.nan, np.nan],
+        "文本": pd.Series([None, "abcdef"], dtype="string"),
+        "b": pd.Series([None, ""], dtype=object),
+        "c": [0, 12],
+    })
+    assert main.excel_column_widths(df) == [3, 8, 3, 4]
@@ -0,0 +1,38 @@
+"""阶段指标：峰值内存增量按阶段单独计算，不受进程此前峰值的影响；/metrics输出完整精度的数值"""
+import time
+
+import numpy as np
+import pytest
+
+from instrumentation import PipelineMetrics, StageRecorder, current_rss_bytes
+
+
+def test_repeated_stage_reports_its_own_peak():
+    if current_rss_bytes() is None:
+        pytest.skip("无法读取/proc/self/statm")
+    recorder = StageRecorder("test")
+    for _ in range(2):
+        recorder.start("allocate")
+        block = np.ones(64 * 1024 * 1024 // 8)
+        time.sleep(0.05)
+        del block
+        recorder.done("allocate")
+    # 第二次运行时进程峰值已经包含这块内存，仍应记录本阶段的增长
+    assert all(record["peak_rss_delta_bytes"] >= 48 * 1024 * 1024 for record in recorder.records)
+
+
+def test_memory_not_recorded_without_tracking():
+    recorder = StageRecorder("test", track_memory=False)
+    recorder.start("stage")
+    assert recorder.done("stage")["peak_rss_delta_bytes"] is None
+
+
+def test_metrics_keep_full_precision():
+    metrics = PipelineMetrics()
+    metrics.observe_stages([{"pipeline": "full", "stage": "read_12345", "input_bytes": 52428801}])
+    metrics.runs.inc("full", "done", amount=1234567)
+    text = metrics.render()
+    assert 'jiancha_stage_input_bytes_sum{pipeline="full",stage="read_12345"} 52428801.0' in text
+    assert 'jiancha_pipeline_runs_total{pipeline="full",status="done"} 1234567.0' in text
+    # 桶上限仍使用简短的格式
+    assert 'jiancha_stage_input_bytes_bucket{pipeline="full",stage="read_12345",le="6.71089e+07"} 1' in text
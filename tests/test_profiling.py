@@ -0,0 +1,41 @@
+"""性能剖析：同一进程中同时收到多个剖析请求时，后到的请求不剖析但照常返回结果"""
+import threading
+
+import profiling
+
+
+def test_concurrent_profiled_calls_both_return(tmp_path):
+    entered = threading.Event()
+    release = threading.Event()
+    results = {}
+
+    def slow(value):
+        entered.set()
+        release.wait(5)
+        return value
+
+    first_id, second_id = profiling.new_profile_id(), profiling.new_profile_id()
+    thread = threading.Thread(target=lambda: results.update(
+        first=profiling.profiled_call(first_id, str(tmp_path), 10, slow, "first")))
+    thread.start()
+    assert entered.wait(5)
+    # 第一个剖析仍在进行，第二个请求不剖析，直接执行
+    results["second"] = profiling.profiled_call(second_id, str(tmp_path), 10, lambda value: value, "second")
+    release.set()
+    thread.join()
+
+    assert results == {"first": "first", "second": "second"}
+    assert (tmp_path / f"{first_id}.pstats").exists()
+    assert not (tmp_path / f"{second_id}.pstats").exists()
+
+
+def test_profiler_that_cannot_start_falls_back(tmp_path, monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    profile_id = profiling.new_profile_id()
+    assert profiling.profiled_call(profile_id, str(tmp_path), 10, sum, [1, 2, 3]) == 6
+    assert list(tmp_path.iterdir()) == []
+    assert not profiling.profile_lock.locked()
@@ -0,0 +1,34 @@
+"""结果缓存：打开线索库时，同一天再次上传相同的两个文件直接返回缓存的结果"""
+from fastapi.testclient import TestClient
+
+import main
+from clue_store import ClueStore
+from result_cache import ResultCache
+
+rows_12345 = [
+    [1, "A001", "一般", "12345热线", "张三", "13800000001", "讨薪", "拖欠工资", "宜都", "建筑", "否",
+     "房屋建筑", "某项目", "政府投资", "是", "在建", "某建设单位", "某总包单位", 5, 30000, "否"],
+    [2, "A002", "一般", "部平台", "李四", "13800000002", "讨薪", "拖欠工资", "枝江", "非建", "否",
+     "餐饮", "某餐馆", None, "否", None, None, None, 4, 1500, None],
+]
+rows_anxin = [
+    ["项目甲", "房屋建筑", "建设单位甲", "施工单位甲", "王五", "13900000001", "宜都市", "工资未按时发放",
+     "超过发薪日", "2026-01-01", "未处理", 3],
+]
+xlsx_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def test_second_upload_hits_with_clue_store(make_xlsx, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "clue_store", ClueStore(str(tmp_path / "clues.db")))
+    monkeypatch.setattr(main, "result_cache", ResultCache(max_bytes=64 * 1024 * 1024))
+    files = {"file_12345": ("12345.xlsx", make_xlsx(main.required_columns_12345, rows_12345), xlsx_type),
+             "file_anxin": ("anxin.xlsx", make_xlsx(main.required_columns_anxin, rows_anxin), xlsx_type)}
+    with TestClient(main.app) as client:
+        first = client.post("/process_files/", files=files)
+        assert first.status_code == 200
+        assert main.clue_store.periods(), "第一次上传应写入线索库"
+        second = client.post("/process_files/", files=files)
+        assert second.status_code == 200
+        stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert second.content == first.content
@@ -0,0 +1,150 @@
+"""数据情况统计表：一次分组的统计结果与原来逐个区域筛选的实现逐行一致"""
+import math
+import unicodedata
+
+import pandas as pd
+import pytest
+
+import main
+
+columns_12345 = main.required_columns_12345
+columns_anxin = main.required_columns_anxin
+
+
+def row_12345(serial, district, field, people, amount, project="某项目"):
+    values = dict.fromkeys(columns_12345)
+    values.update({"序号": serial, "流水号": f"A{serial:03d}", "事件来源": "12345热线", "所属区域": district,
+                   "所涉领域": field, "所涉项目（企业）": project, "涉及人数": people, "涉及金额": amount})
+    return [values[column] for column in columns_12345]
+
+
+def row_anxin(project, district, warning_type, reason):
+    values = dict.fromkeys(columns_anxin)
+    values.update({"项目名称": project, "行业": "房屋建筑", "区域": district, "预警类型": warning_type,
+                   "预警原因": reason, "预警时间": "2026-01-01", "状态": "未处理", "预警天数": 3})
+    return [values[column] for column in columns_anxin]
+
+
+raw_12345 = pd.DataFrame([
+    row_12345(1, "宜都", "建筑", 5, 30000),
+    row_12345(2, "宜都市", "非建", "3", "约5万"),
+    row_12345(3, "枝江市", "建筑", None, "abc", project=None),
+    row_12345(4, "外省某市", "建筑", 2, 1000),
+    row_12345(5, None, "非建", 4, 2000),
+    row_12345(6, "当阳市", None, 6.0, 1500.5),
+    row_12345(7, "当阳市", "建筑", "六人", None),
+    row_12345(8, "夷陵区", "非建", " ", "  "),
+    row_12345(9, "夷陵区", "建筑", "２", "1,200"),
+], columns=columns_12345, dtype=object)
+
+raw_anxin = pd.DataFrame([
+    row_anxin("项目甲", "宜都市", "工资未按时发放", "超过发薪日"),
+    row_anxin("项目乙", "宜都市", None, None),
+    row_anxin("项目丙", "枝江", "专户余额不足", None),
+    row_anxin(None, "外地", "工资未按时发放", "超过发薪日"),
+    row_anxin("项目丁", "当阳市", "  ", "只有空格的预警类型"),
+], columns=columns_anxin, dtype=object)
+
+
+def reference_number(value, integer):
+    """人数、金额的文本，按normalize_numeric_columns的规则逐个解析：允许空白、全角数字和千分位逗号，
+    人数截断取整，金额保留小数，无法解析时为0"""
+    if value is None or pd.isna(value):
+        return "0"
+    try:
+        number = float(unicodedata.normalize("NFKC", str(value)).strip().replace(",", ""))
+    except ValueError:
+        return "0"
+    if not math.isfinite(number):
+        return "0"
+    return str(int(number)) if integer or number.is_integer() else str(number)
+
+
+def reference_statistics_table(summary_df, basic_info):
+    """原来的实现：对每个有效区域分别筛选汇总表，逐行拼接欠薪点位"""
+    mappings = main.mapping_config.tables
+    stats_data = []
+    for row_number, district in enumerate(mappings.valid_districts):
+        construction_data = summary_df[(summary_df['所属区域'] == district) & (summary_df['所涉领域'] == '建筑')]
+        non_construction_data = summary_df[(summary_df['所属区域'] == district) & (summary_df['所涉领域'] != '建筑')]
+
+        def empty_warning(data):
+            return data[data['预警类型'].apply(lambda x: isinstance(x, str) and len(x.strip()) == 0 or pd.isna(x))]
+
+        construction_count = len(empty_warning(construction_data))
+        non_construction_count = len(empty_warning(non_construction_data))
+        warning_count = len(construction_data[construction_data['预警类型'].notna()])
+        boss_name = mappings.district_boss_mapping.get(district, "")
+
+        def arrears(data):
+            text = ""
+            for _, row in data.iterrows():
+                project = str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) else ""
+                people = reference_number(row['涉及人数'], integer=True)
+                amount = reference_number(row['涉及金额'], integer=False)
+                text += f"{project}（{people}人{amount}元）；"
+            return text
+
+        wage_arrears_construction = arrears(construction_data[construction_data['预警类型'].isna()])
+        for _, row in construction_data[construction_data['预警类型'].notna()].iterrows():
+            project = str(row['所涉项目（企业）']) if pd.notna(row['所涉项目（企业）']) else ""
+            reason = str(row['预警原因']) if pd.notna(row['预警原因']) else ""
+            wage_arrears_construction += f"{project}因{reason}预警；"
+
+        stats_data.append({'基本情况': basic_info if row_number == 0 else "", '区域': district,
+                           '专班包保（后续有调整）': boss_name, '领域': '建设', '线索数量': construction_count,
+                           '涉稳': '无', '预警': warning_count, '欠薪点位': wage_arrears_construction})
+        stats_data.append({'基本情况': '', '区域': '', '专班包保（后续有调整）': boss_name, '领域': '非建',
+                           '线索数量': non_construction_count, '涉稳': '无', '预警': 0,
+                           '欠薪点位': arrears(non_construction_data)})
+    return pd.DataFrame(stats_data)
+
+
+def build_summary():
+    """与run_pipeline相同的步骤生成汇总表"""
+    summary_df = main.combine_summary_frames(main.process_12345_data(raw_12345.copy()),
+                                             main.process_anxin_data(raw_anxin.copy()))
+    return main.normalize_numeric_columns(summary_df)
+
+
+def with_blank_warning_types(summary_df):
+    """预警类型中保留空字符串和只含空白的文本（例如解析缓存中的旧数据）"""
+    summary_df = summary_df.copy()
+    warning_type = summary_df['预警类型'].astype(object)
+    warning_type.iloc[[1, 4]] = ["", "  "]
+    warning_type.iloc[-1] = "　"
+    summary_df['预警类型'] = warning_type
+    return summary_df
+
+
+@pytest.mark.parametrize("prepare", [lambda df: df, with_blank_warning_types], ids=["processed", "blank_warning_types"])
+def test_statistics_table_matches_per_district_loop(prepare):
+    summary_df = prepare(build_summary())
+    expected = reference_statistics_table(summary_df, "基本情况文本")
+    actual = main.generate_statistics_table(summary_df, "基本情况文本")
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_statistics_cover_edge_cases():
+    stats_df = main.generate_statistics_table(build_summary(), "")
+    # 非建行的区域列为空，取上一行（建设行）的区域
+    districts = stats_df['区域'].replace("", pd.NA).ffill()
+    rows = {(district, row.领域): row for district, row in zip(districts, stats_df.itertuples(index=False))}
+    # 无法解析的人数、金额按0输出，全角数字和千分位逗号可以解析
+    assert rows[("宜都市", "非建")].欠薪点位 == "某项目（3人0元）；"
+    assert rows[("枝江市", "建设")].欠薪点位 == "（0人0元）；项目丙因预警；"
+    assert rows[("夷陵区", "建设")].欠薪点位 == "某项目（2人1200元）；"
+    # 预警类型只含空白的安薪在线记录不计入预警
+    assert rows[("当阳市", "建设")].预警 == 0
+    # 有效区域以外（外省某市、外地）和没有区域的记录不计入统计表
+    assert set(districts) == set(main.mapping_config.tables.valid_districts)
+    assert stats_df['线索数量'].sum() + stats_df['预警'].sum() == 11
+
+
+def test_streaming_batches_match_whole_table():
+    summary_df = build_summary()
+    parts = {}
+    for start in range(0, len(summary_df), 3):
+        main.merge_district_statistics(parts, main.district_statistic_parts(summary_df.iloc[start:start + 3]))
+    streamed = main.generate_statistics_table(None, "", main.finish_district_statistics(parts))
+    pd.testing.assert_frame_equal(streamed, main.generate_statistics_table(summary_df, ""))